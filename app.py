@@ -1,4 +1,4 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, g
 from flask_cors import CORS
 from backend.config import Config
 from backend.routes.auth_routes import auth_bp
@@ -10,36 +10,200 @@ from backend.routes.ai_service import ai_service_bp
 from backend.routes.pilot_routes import pilot_bp
 from backend.routes.analytics_routes import analytics_bp
 from backend.routes.notification_routes import notification_bp
-from backend.ml_service import get_ml_service
+from backend.batch_routes import batch_bp
+from backend.ml_service import MLService, get_ml_service
+from backend.model_reload import ModelReloader, list_bundles, newest_bundle, reject_bundle
+from backend.train_models import MODELS_DIR
+from backend.weather_cache import weather_cache
+from backend.weather_client import weather_client, WeatherPrefetcher
+from backend.metrics import metrics, install_sqlalchemy_metrics
+from backend.db_tuning import install_sqlite_pragmas
+from backend.rollups import install_rollup_maintenance
+from backend.rollup_routes import rollup_bp
+from backend.matching import matching_index, install_matching_maintenance
+from backend.matching_routes import matching_bp
+from backend.market_series import market_series, install_market_series_maintenance
+from backend.crop_ranking import crop_ranker
+from backend.notification_dispatcher import create_notification_dispatcher
+from backend.price_scanner import create_price_scanner
+from backend.history_routes import history_bp
+from backend.market_series_routes import market_series_bp
+from backend.background_routes import background_bp
+from backend.write_behind import create_write_behind, install_write_behind
+import logging
 import os
+import time
 
 from backend import db
 
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.config.from_object(Config)
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{Config.DB_PATH}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+if Config.SQLITE_TUNED:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': Config.SQLITE_POOL_SIZE, 'pool_pre_ping': True}
 
 CORS(app)
 db.init_app(app)
+with app.app_context():
+    install_sqlalchemy_metrics(db.engine)
+if Config.SQLITE_TUNED:
+    install_sqlite_pragmas()
+if Config.ROLLUPS_ON_COMMIT:
+    install_rollup_maintenance()
+if Config.MATCHING_INDEX_ENABLED:
+    install_matching_maintenance()
+    with app.app_context():
+        try:
+            matching_index.load(db.session.connection())
+        except Exception as e:
+            logger.error(f"Matching index not loaded: {e}")
+        finally:
+            db.session.remove()
+if Config.MARKET_SERIES_ENABLED:
+    install_market_series_maintenance()
+    with app.app_context():
+        try:
+            market_series.load(db.session.connection())
+        except Exception as e:
+            logger.error(f"Market series not loaded: {e}")
+        finally:
+            db.session.remove()
+
+# Yield and margin tables for crop recommendations; without them only the CSV candidate sets apply
+if Config.CROP_RANKING_HISTORY:
+    with app.app_context():
+        try:
+            crop_ranker.load(db.session.connection())
+        except Exception as e:
+            logger.error(f"Crop ranking history not loaded: {e}")
+        finally:
+            db.session.remove()
+
+# Activity logs are inserted in batches by a background thread after the request commits
+if Config.WRITE_BEHIND_ENABLED:
+    with app.app_context():
+        create_write_behind(db.engine)
+    install_write_behind()
 
-# Initialize ML Service (loads models at startup)
+# Fan-out notification delivery (price crash alerts etc.)
+notification_dispatcher = None
+if Config.NOTIFY_DISPATCHER_ENABLED:
+    with app.app_context():
+        notification_dispatcher = create_notification_dispatcher(db.engine)
+
+# Initialize ML Service (loads models at startup unless ML_LOAD_MODE is lazy/background)
 ml_service = get_ml_service()
+# Price crash and forecast inputs a request leaves out come from the market series
+# (in-process service only; pool workers keep the defaults)
+if Config.MARKET_SERIES_ENABLED and isinstance(ml_service, MLService):
+    ml_service.market_series = market_series
+
+# Hot reload of versioned bundles; with ML_WORKERS > 0 each pool worker runs its own watcher
+model_reloader = None
+if Config.MODEL_RELOAD_ENABLED and isinstance(ml_service, MLService):
+    model_reloader = ModelReloader(ml_service, Config.MODEL_RELOAD_INTERVAL_SECONDS).start()
+
+# Keeps the weather of every encoder district fresh; pool workers run their own
+weather_prefetcher = None
+if Config.WEATHER_CLIENT_ENABLED and Config.WEATHER_PREFETCH_ENABLED and isinstance(ml_service, MLService):
+    weather_prefetcher = WeatherPrefetcher(weather_cache, ml_service.known_districts,
+                                           Config.WEATHER_PREFETCH_INTERVAL_SECONDS, Config.WEATHER_POOL_SIZE).start()
+
+# Background price crash scan: full every PRICE_SCAN_FULL_INTERVAL_SECONDS, incremental in between
+if Config.PRICE_SCAN_ENABLED:
+    with app.app_context():
+        try:
+            create_price_scanner(db.engine, ml_service, notification_dispatcher)
+        except Exception as e:
+            logger.error(f"Price crash scanner not started: {e}")
 
 # Register Blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(farmer_bp, url_prefix='/api/farmer')
 app.register_blueprint(shop_bp, url_prefix='/api/shop')
 app.register_blueprint(predict_bp, url_prefix='/api/predict')
+app.register_blueprint(batch_bp, url_prefix='/api/predict')
 app.register_blueprint(market_bp, url_prefix='/api/market')
+app.register_blueprint(matching_bp, url_prefix='/api/market')
 app.register_blueprint(ai_service_bp)
 app.register_blueprint(pilot_bp, url_prefix='/api/pilot')
 app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+app.register_blueprint(rollup_bp, url_prefix='/api/analytics')
 app.register_blueprint(notification_bp, url_prefix='/api/notifications')
+app.register_blueprint(history_bp, url_prefix='/api/history')
+app.register_blueprint(market_series_bp, url_prefix='/api/analytics')
+app.register_blueprint(background_bp, url_prefix='/api')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if 'request_started' in g:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request_seconds', time.perf_counter() - g.request_started,
+                        endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    return metrics.render(ml_service.metrics_snapshots()), 200, {'Content-Type': 'text/plain; version=0.0.4'}
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "HarvestLink API"})
+    models = ml_service.health()
+    failed = 'error' in models or any(status['state'] == 'error' for status in models.get('models', {}).values())
+    return jsonify({
+        "status": "degraded" if failed else "healthy",
+        "service": "HarvestLink API",
+        **models
+    })
+
+@app.route('/api/weather/cache', methods=['GET'])
+def weather_cache_stats():
+    return jsonify({
+        **weather_cache.stats(),
+        "client": weather_client.stats() if Config.WEATHER_CLIENT_ENABLED else None,
+        "prefetch": weather_prefetcher.stats() if weather_prefetcher is not None else None
+    })
+
+@app.route('/api/model/cache', methods=['GET'])
+def prediction_cache_stats():
+    return jsonify(ml_service.cache_stats())
+
+@app.route('/api/model/bundles', methods=['GET'])
+def model_bundles():
+    if model_reloader is None:
+        return jsonify({"reloader": False, "serving": ml_service.health().get('bundle'),
+                        "available": list_bundles(MODELS_DIR)})
+    return jsonify({"reloader": True, **model_reloader.stats()})
+
+@app.route('/api/model/reload', methods=['POST'])
+def model_reload():
+    if model_reloader is None:
+        return jsonify({"success": True, "message": "Pool workers pick up new bundles on their next check"}), 202
+    event = model_reloader.check()
+    return jsonify({"success": event is None or event['action'] != 'rejected', "event": event,
+                    "serving": ml_service.bundle})
+
+@app.route('/api/model/rollback', methods=['POST'])
+def model_rollback():
+    reason = (request.get_json(silent=True) or {}).get('reason', 'rollback requested')
+    if model_reloader is None:
+        current = newest_bundle(MODELS_DIR)
+        if current is None:
+            return jsonify({"success": False, "error": "No versioned bundle is serving"}), 409
+        reject_bundle(MODELS_DIR, current, reason)
+        return jsonify({"success": True, "rejected": current, "serving": newest_bundle(MODELS_DIR)}), 202
+    try:
+        event = model_reloader.rollback(reason)
+    except LookupError as e:
+        return jsonify({"success": False, "error": str(e)}), 409
+    return jsonify({"success": True, "event": event, "serving": ml_service.bundle})
 
 @app.route('/api/model/info', methods=['GET'])
 def model_info():
@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify, request
+from backend import notification_dispatcher, price_scanner, write_behind
+from backend.config import Config
+from backend.crop_ranking import crop_ranker
+from backend.market_series import market_series
+
+# Stats and controls of the in-process background components; each reports enabled: false when off
+background_bp = Blueprint('background', __name__)
+
+@background_bp.route('/notifications/dispatcher/stats', methods=['GET'])
+def notification_dispatcher_stats():
+    dispatcher = notification_dispatcher.notification_dispatcher
+    if dispatcher is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **dispatcher.stats()})
+
+@background_bp.route('/write-behind/stats', methods=['GET'])
+def write_behind_stats():
+    buffer = write_behind.write_behind
+    if buffer is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **buffer.stats()})
+
+@background_bp.route('/price-scan/stats', methods=['GET'])
+def price_scan_stats():
+    scanner = price_scanner.price_scanner
+    if scanner is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **scanner.stats()})
+
+@background_bp.route('/price-scan/run', methods=['POST'])
+def price_scan_run():
+    scanner = price_scanner.price_scanner
+    if scanner is None:
+        return jsonify({"success": False, "error": "Price crash scanner is disabled"}), 503
+    full = (request.get_json(silent=True) or {}).get('mode', 'full') == 'full'
+    return jsonify({"success": True, **scanner.scan(full=full)})
+
+@background_bp.route('/market-series/stats', methods=['GET'])
+def market_series_stats():
+    if not Config.MARKET_SERIES_ENABLED:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **market_series.stats()})
+
+@background_bp.route('/crop-ranking/stats', methods=['GET'])
+def crop_ranking_stats():
+    return jsonify(crop_ranker.stats())
@@ -0,0 +1,62 @@
+from flask import Blueprint, jsonify, request, current_app
+from backend.ml_service import get_ml_service
+
+batch_bp = Blueprint('batch', __name__)
+
+def _batch_items():
+    """Accepts either a bare JSON list or {"items": [...]}"""
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('items')
+    if not isinstance(payload, list) or not all(isinstance(item, dict) for item in payload):
+        return None, (jsonify({"success": False, "error": "Expected a JSON list of objects or {\"items\": [...]}"}), 400)
+
+    max_items = current_app.config.get('ML_BATCH_MAX_ITEMS', 5000)
+    if len(payload) > max_items:
+        return None, (jsonify({"success": False, "error": f"Batch too large ({len(payload)} > {max_items} items)"}), 413)
+    return payload, None
+
+def _batch_response(results):
+    return jsonify({
+        "success": True,
+        "count": len(results),
+        "failed": sum(1 for r in results if not r.get('success')),
+        "results": results
+    })
+
+@batch_bp.route('/crop/batch', methods=['POST'])
+def crop_batch():
+    items, error = _batch_items()
+    if error:
+        return error
+    return _batch_response(get_ml_service().get_crop_recommendations_batch(items))
+
+@batch_bp.route('/demand/batch', methods=['POST'])
+def demand_batch():
+    items, error = _batch_items()
+    if error:
+        return error
+    return _batch_response(get_ml_service().forecast_demand_batch(items))
+
+@batch_bp.route('/price-crash/batch', methods=['POST'])
+def price_crash_batch():
+    items, error = _batch_items()
+    if error:
+        return error
+    return _batch_response(get_ml_service().detect_price_crash_risk_batch(items))
+
+@batch_bp.route('/spoilage/batch', methods=['POST'])
+def spoilage_batch():
+    items, error = _batch_items()
+    if error:
+        return error
+    return _batch_response(get_ml_service().predict_spoilage_risk_batch(items))
+
+@batch_bp.route('/spoilage/plan', methods=['POST'])
+def spoilage_plan():
+    """Best (storage, destination, transport hours) per lot; see MLService.plan_spoilage_routes"""
+    plan = request.get_json(silent=True)
+    if not isinstance(plan, dict):
+        return jsonify({"success": False, "error": "Expected a JSON object with lots and destinations"}), 400
+    result = get_ml_service().plan_spoilage_routes(plan)
+    return jsonify(result), 200 if result.get('success') else 400
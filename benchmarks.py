@@ -0,0 +1,264 @@
+"""
+Reproducible benchmarks for the prediction layer and the batch API routes.
+
+    python -m backend.benchmarks --data-dir <dir with the CSVs> --out bench.json
+    python -m backend.benchmarks --data-dir <dir> --out new.json --compare bench.json
+
+Workloads are sampled (with a fixed seed) from the bundled training CSVs, so two runs
+on the same commit and machine score the same requests.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Model -> (CSV, MLService method, batch route)
+WORKLOADS = {
+    'crop': ('crops_dataset.csv', 'get_crop_recommendations', '/api/predict/crop/batch'),
+    'demand': ('market_demand.csv', 'forecast_demand', '/api/predict/demand/batch'),
+    'price_crash': ('price_crash.csv', 'detect_price_crash_risk', '/api/predict/price-crash/batch'),
+    'spoilage': ('spoilage_data.csv', 'predict_spoilage_risk', '/api/predict/spoilage/batch')
+}
+
+def _crop_request(row):
+    return {
+        'land_size_acres': row['land_area'],
+        'soil_type': row['soil_type'],
+        'water_availability': row['water_availability'],
+        'irrigation_type': row['irrigation_type'],
+        'rainfall_mm': row['rainfall_mm'],
+        'temperature_avg': row['temperature_celsius'],
+        'humidity': row['humidity_percent'],
+        'season': row['season'],
+        'previous_crop': row['previous_crop'],
+        'market_demand_level': row['market_demand_level'],
+        'district': row['district']
+    }
+
+def _demand_request(row):
+    return {
+        'crop_name': row['vegetable_name'],
+        'market_location': row['city'],
+        'supply': row['supply_volume_kg'],
+        'current_price': row['prev_price_rs']
+    }
+
+def _price_crash_request(row):
+    return {
+        'crop_name': row['vegetable_name'],
+        'current_price': row['current_price_rs'],
+        'prev_week_price': row['prev_week_price_rs'],
+        'supply': row['current_supply_kg'],
+        'demand': row['current_demand_kg'],
+        'district': row['district']
+    }
+
+def _spoilage_request(row):
+    return {
+        'crop_name': row['vegetable_type'],
+        'transport_hours': row['transport_time_hours'],
+        'days_since_harvest': int(row['days_since_harvest']),
+        'storage_method': row['storage_type'],
+        'district': row['district']
+    }
+
+REQUEST_BUILDERS = {
+    'crop': _crop_request,
+    'demand': _demand_request,
+    'price_crash': _price_crash_request,
+    'spoilage': _spoilage_request
+}
+
+def build_workload(data_dir, model, size, seed):
+    """Samples `size` API request dicts for one model from its training CSV"""
+    df = pd.read_csv(os.path.join(data_dir, WORKLOADS[model][0]), keep_default_na=False)
+    rows = df.sample(n=size, replace=size > len(df), random_state=seed).to_dict('records')
+    # Plain Python scalars, as a JSON request body would produce
+    return [json.loads(json.dumps(REQUEST_BUILDERS[model](row), default=float)) for row in rows]
+
+def _percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        'n': len(samples),
+        'mean_ms': round(float(samples.mean()), 3),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p90_ms': round(float(np.percentile(samples, 90)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+        'max_ms': round(float(samples.max()), 3)
+    }
+
+def bench_startup():
+    """Times `import backend.app` (which loads the models) in a fresh interpreter"""
+    code = (
+        "import time, resource, json\n"
+        "started = time.perf_counter()\n"
+        "import backend.app\n"
+        "elapsed = time.perf_counter() - started\n"
+        "print(json.dumps({'import_seconds': round(elapsed, 3),\n"
+        "                  'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def bench_latency(service, workloads, calls):
+    """Single-call latency of each MLService method over its workload"""
+    results = {}
+    for model, requests in workloads.items():
+        method = getattr(service, WORKLOADS[model][1])
+        method(requests[0])  # warm-up
+        samples = []
+        for request in requests[:calls]:
+            started = time.perf_counter()
+            method(request)
+            samples.append((time.perf_counter() - started) * 1000)
+        results[model] = _percentiles(samples)
+    return results
+
+def bench_throughput(app, workloads, concurrency_levels, duration):
+    """Requests/second through the Flask test client with N threads posting one-item batches"""
+    results = {}
+    for model, requests in workloads.items():
+        route = WORKLOADS[model][2]
+        results[model] = {}
+        for concurrency in concurrency_levels:
+            latencies, errors = [], [0]
+            lock = threading.Lock()
+            deadline = time.perf_counter() + duration
+
+            def run(offset):
+                client = app.test_client()
+                i = offset
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    response = client.post(route, json=[requests[i % len(requests)]])
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        if response.status_code != 200 or response.get_json().get('failed'):
+                            errors[0] += 1
+                    i += concurrency
+
+            threads = [threading.Thread(target=run, args=(n,)) for n in range(concurrency)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - started
+
+            results[model][str(concurrency)] = {
+                'requests_per_second': round(len(latencies) / wall, 1),
+                'errors': errors[0],
+                **_percentiles(latencies)
+            }
+    return results
+
+def build_spoilage_plan(data_dir, seed, lots=104, destinations=8, hours=(4, 12, 24, 40)):
+    """A truckload plan of `lots` lots sampled from the spoilage CSV, routed to the first CSV cities"""
+    df = pd.read_csv(os.path.join(data_dir, WORKLOADS['spoilage'][0]), keep_default_na=False)
+    rows = df.sample(n=lots, replace=lots > len(df), random_state=seed).to_dict('records')
+    cities = pd.read_csv(os.path.join(data_dir, WORKLOADS['demand'][0]), usecols=['city'])['city'].unique()
+    plan = {
+        'lots': [{'lot_id': i, 'crop_name': row['vegetable_type'], 'quantity_kg': 500, 'district': row['district'],
+                  'days_since_harvest': int(row['days_since_harvest']), 'packaging_type': row['packaging_type'],
+                  'bruising_level': int(row['bruising_level']), 'season': row['season']}
+                 for i, row in enumerate(rows)],
+        'destinations': [{'market': city, 'transport_hours': list(hours)} for city in sorted(cities)[:destinations]],
+        'storage_cost_per_kg': {'Cold Storage': 1.5, 'Warehouse': 0.5},
+        'transport_cost_per_kg_hour': 0.05
+    }
+    return json.loads(json.dumps(plan, default=float))
+
+def bench_spoilage_plan(service, data_dir, seed, calls):
+    """Latency of plan_spoilage_routes on ~10k combinations, each call with different lots"""
+    plans = [build_spoilage_plan(data_dir, seed + i) for i in range(calls + 1)]
+    service.plan_spoilage_routes(plans[0])  # warm-up
+    samples, within, combinations = [], 0, 0
+    for plan in plans[1:]:
+        started = time.perf_counter()
+        result = service.plan_spoilage_routes(plan)
+        samples.append((time.perf_counter() - started) * 1000)
+        within += bool(result.get('within_target'))
+        combinations = result.get('combinations', 0)
+    return {'combinations': combinations, 'within_target_rate': round(within / calls, 3), **_percentiles(samples)}
+
+def compare(current, baseline):
+    """Prints the relative change of every numeric leaf present in both runs"""
+    def leaves(node, path=()):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                yield from leaves(value, path + (key,))
+        elif isinstance(node, (int, float)) and not isinstance(node, bool):
+            yield path, node
+
+    old = dict(leaves({k: v for k, v in baseline.items() if k != 'meta'}))
+    for path, value in leaves({k: v for k, v in current.items() if k != 'meta'}):
+        if path in old and old[path]:
+            change = (value - old[path]) / old[path] * 100
+            print(f"{'.'.join(path):60s} {old[path]:>12} -> {value:>12}  ({change:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='.', help='directory holding the four training CSVs')
+    parser.add_argument('--out', default='bench.json', help='where to write the JSON results')
+    parser.add_argument('--compare', help='previous results JSON to diff against')
+    parser.add_argument('--models', default=','.join(WORKLOADS), help='comma-separated subset of models')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--calls', type=int, default=200, help='single-call latency samples per model')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated thread counts')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per throughput run')
+    parser.add_argument('--plan-calls', type=int, default=20, help='spoilage route plans timed (0 skips)')
+    parser.add_argument('--skip-startup', action='store_true')
+    args = parser.parse_args(argv)
+
+    # Per-call INFO logging would dominate the timings
+    logging.getLogger('backend').setLevel(logging.WARNING)
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    models = [m for m in args.models.split(',') if m]
+    workloads = {model: build_workload(args.data_dir, model, args.calls, args.seed) for model in models}
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'calls': args.calls,
+            'duration_seconds': args.duration,
+            'env': {k: v for k, v in os.environ.items() if k.startswith(('ML_', 'PREDICTION_', 'WEATHER_CACHE_'))}
+        }
+    }
+    if not args.skip_startup:
+        results['startup'] = bench_startup()
+
+    from backend.app import app
+    from backend.ml_service import get_ml_service
+    results['latency'] = bench_latency(get_ml_service(), workloads, args.calls)
+    if 'spoilage' in models and args.plan_calls:
+        results['spoilage_plan'] = bench_spoilage_plan(get_ml_service(), args.data_dir, args.seed, args.plan_calls)
+    results['throughput'] = bench_throughput(app, workloads, [int(c) for c in args.concurrency.split(',')],
+                                             args.duration)
+    results['memory'] = {'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
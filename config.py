@@ -8,3 +8,70 @@ class Config:
     DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'harvestlink.db')
     WEATHER_API_KEY = os.environ.get('WEATHER_API_KEY', 'YOUR_API_KEY')
     JWT_EXPIRATION_HOURS = 24
+    WEATHER_CACHE_TTL_SECONDS = int(os.environ.get('WEATHER_CACHE_TTL_SECONDS', 600))
+    WEATHER_CACHE_STALE_SECONDS = int(os.environ.get('WEATHER_CACHE_STALE_SECONDS', 3600))
+    WEATHER_CACHE_MAX_ENTRIES = int(os.environ.get('WEATHER_CACHE_MAX_ENTRIES', 64))
+    WEATHER_CLIENT_ENABLED = os.environ.get('WEATHER_CLIENT_ENABLED', '0') == '1'  # pooled HTTP client instead of weather_service (opt-in)
+    WEATHER_API_URL = os.environ.get('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/weather')
+    WEATHER_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('WEATHER_CONNECT_TIMEOUT_SECONDS', 2.0))
+    WEATHER_READ_TIMEOUT_SECONDS = float(os.environ.get('WEATHER_READ_TIMEOUT_SECONDS', 3.0))
+    WEATHER_RETRIES = int(os.environ.get('WEATHER_RETRIES', 2))  # extra attempts after timeouts, 429 and 5xx
+    WEATHER_POOL_SIZE = int(os.environ.get('WEATHER_POOL_SIZE', 8))  # keep-alive connections and parallel fetches
+    WEATHER_BREAKER_FAILURES = int(os.environ.get('WEATHER_BREAKER_FAILURES', 5))  # failed calls before the circuit opens
+    WEATHER_BREAKER_RESET_SECONDS = float(os.environ.get('WEATHER_BREAKER_RESET_SECONDS', 30))
+    WEATHER_PREFETCH_ENABLED = os.environ.get('WEATHER_PREFETCH_ENABLED', '0') == '1'  # needs WEATHER_CLIENT_ENABLED and a real WEATHER_API_KEY
+    WEATHER_PREFETCH_INTERVAL_SECONDS = float(os.environ.get('WEATHER_PREFETCH_INTERVAL_SECONDS', 480))  # under the cache TTL
+    ML_LOAD_MODE = os.environ.get('ML_LOAD_MODE', 'eager')  # eager | background | lazy
+    ML_MMAP_MODE = os.environ.get('ML_MMAP_MODE') or None  # e.g. 'r' to share model arrays across workers
+    ML_INFERENCE_BACKEND = os.environ.get('ML_INFERENCE_BACKEND', 'sklearn')  # sklearn | flat
+    ML_FLAT_MAX_ROWS = int(os.environ.get('ML_FLAT_MAX_ROWS', 256))  # larger batches go to sklearn
+    ML_WORKERS = int(os.environ.get('ML_WORKERS', 0))  # > 0 serves predictions from a process pool
+    ML_POOL_QUEUE_SIZE = int(os.environ.get('ML_POOL_QUEUE_SIZE', 1000))
+    ML_POOL_MAX_BATCH = int(os.environ.get('ML_POOL_MAX_BATCH', 64))
+    ML_POOL_BATCH_WAIT_MS = float(os.environ.get('ML_POOL_BATCH_WAIT_MS', 2))
+    ML_POOL_TIMEOUT_SECONDS = float(os.environ.get('ML_POOL_TIMEOUT_SECONDS', 10))
+    PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', 10000))  # 0 disables
+    ML_BATCH_MAX_ITEMS = int(os.environ.get('ML_BATCH_MAX_ITEMS', 5000))
+    SPOILAGE_PLAN_MAX_COMBINATIONS = int(os.environ.get('SPOILAGE_PLAN_MAX_COMBINATIONS', 10000))  # lots x storage x routes
+    SPOILAGE_PLAN_TARGET_MS = float(os.environ.get('SPOILAGE_PLAN_TARGET_MS', 250))  # latency target, reported as within_target; not enforced
+    MODEL_RELOAD_ENABLED = os.environ.get('MODEL_RELOAD_ENABLED', '0') == '1'  # hot-swap new bundles under models/ (opt-in)
+    MODEL_RELOAD_INTERVAL_SECONDS = float(os.environ.get('MODEL_RELOAD_INTERVAL_SECONDS', 10))
+    SQLITE_TUNED = os.environ.get('SQLITE_TUNED', '0') == '1'  # WAL + pragmas and a SQLITE_POOL_SIZE pool (opt-in)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64000))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 10))
+    ROLLUPS_ON_COMMIT = os.environ.get('ROLLUPS_ON_COMMIT', '1') == '1'  # fold new transactions into rollups on commit
+    MATCHING_INDEX_ENABLED = os.environ.get('MATCHING_INDEX_ENABLED', '0') == '1'  # in-memory listing/demand index (opt-in)
+    MATCH_PRICE_BAND = float(os.environ.get('MATCH_PRICE_BAND', 5.0))  # rupees per price band
+    MATCH_PRICE_TOLERANCE = float(os.environ.get('MATCH_PRICE_TOLERANCE', 0.1))  # listings up to 10% above target
+    MARKET_SERIES_ENABLED = os.environ.get('MARKET_SERIES_ENABLED', '0') == '1'  # in-memory price/demand history for ML features (opt-in)
+    MARKET_SERIES_DAYS = int(os.environ.get('MARKET_SERIES_DAYS', 400))  # days of transactions kept per series
+    CROP_RANKING_HISTORY = os.environ.get('CROP_RANKING_HISTORY', '0') == '1'  # yields and prices from the database at startup (opt-in)
+    CROP_RANKING_PRICE_DAYS = int(os.environ.get('CROP_RANKING_PRICE_DAYS', 90))  # days of transactions behind the margin prices
+    WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '0') == '1'  # buffer activity log inserts (opt-in)
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 500))  # rows per insert transaction
+    WRITE_BEHIND_FLUSH_SECONDS = float(os.environ.get('WRITE_BEHIND_FLUSH_SECONDS', 1.0))  # longest a row waits in memory
+    WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 10000))  # beyond this, requests insert synchronously
+    NOTIFY_DISPATCHER_ENABLED = os.environ.get('NOTIFY_DISPATCHER_ENABLED', '0') == '1'  # queue consumer and channel workers (opt-in)
+    NOTIFY_BROKER = os.environ.get('NOTIFY_BROKER', 'inprocess')  # inprocess | redis
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE', 500))  # users per insert/preference query
+    NOTIFY_CHANNEL_OPTIONS = {
+        'email': {'concurrency': int(os.environ.get('NOTIFY_EMAIL_CONCURRENCY', 8)),
+                  'rate_per_second': float(os.environ.get('NOTIFY_EMAIL_RATE', 50))},
+        'sms': {'concurrency': int(os.environ.get('NOTIFY_SMS_CONCURRENCY', 4)),
+                'rate_per_second': float(os.environ.get('NOTIFY_SMS_RATE', 10))},
+        'push': {'concurrency': int(os.environ.get('NOTIFY_PUSH_CONCURRENCY', 16)),
+                 'rate_per_second': float(os.environ.get('NOTIFY_PUSH_RATE', 200))}
+    }
+    SMTP_HOST = os.environ.get('SMTP_HOST')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+    SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
+    SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+    TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
+    TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
+    TWILIO_FROM_NUMBER = os.environ.get('TWILIO_FROM_NUMBER')
+    PRICE_SCAN_ENABLED = os.environ.get('PRICE_SCAN_ENABLED', '0') == '1'  # background price crash scanner (opt-in: writes price_alerts)
+    PRICE_SCAN_FULL_INTERVAL_SECONDS = int(os.environ.get('PRICE_SCAN_FULL_INTERVAL_SECONDS', 3600))
+    PRICE_SCAN_INCREMENTAL_INTERVAL_SECONDS = int(os.environ.get('PRICE_SCAN_INCREMENTAL_INTERVAL_SECONDS', 300))
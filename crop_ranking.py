@@ -0,0 +1,330 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from backend.config import Config
+from backend.train_models import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 3
+
+# Rough cultivation cost per acre in rupees (seed, fertiliser, labour, irrigation), used for the margin
+CULTIVATION_COST_PER_ACRE = {
+    'Rice': 30000, 'Maize': 25000, 'Onion': 60000, 'Tomato': 70000, 'Brinjal': 50000,
+    'Beans': 40000, 'Ladies Finger': 45000, 'Banana': 90000
+}
+DEFAULT_COST_PER_ACRE = 50000
+
+# Fewer plantings or trades than this at a level fall through to the coarser level
+MIN_SAMPLES = 5
+
+# Added to a candidate's probability for ordering only: a crop typical for the area wins
+# ties and near-ties, but never beats a crop the model rates this much higher
+CANDIDATE_PRIOR = 0.05
+
+# Harvest per planting over the farmer's land, by district and season
+YIELD_SQL = text("""
+    SELECT f.district, c.season, c.crop_name, SUM(c.quantity_kg), SUM(f.land_area), COUNT(*)
+    FROM crops c JOIN farmers f ON f.id = c.farmer_id
+    WHERE c.quantity_kg > 0 AND f.land_area > 0
+    GROUP BY f.district, c.season, c.crop_name
+""")
+
+# Quantity-weighted selling price, located by the seller's district
+PRICE_SQL = text("""
+    SELECT f.district, t.crop_name, SUM(t.price_per_unit * t.quantity), SUM(t.quantity), COUNT(*)
+    FROM transactions t JOIN farmers f ON f.id = t.seller_id
+    WHERE t.transaction_date >= :since AND t.quantity > 0
+    GROUP BY f.district, t.crop_name
+""")
+
+def _normalize(value):
+    """Key part as matched: case and surrounding whitespace don't matter"""
+    return str(value).strip().casefold() if value is not None else None
+
+class _Tables:
+    """
+    One immutable build of the ranking tables. Row r of each array is one
+    (district, season, soil_type) key, column c one crop of `crops`.
+    """
+
+    def __init__(self, crops, index, candidates, yield_kg, margin, sources):
+        self.crops = crops
+        self.index = index  # key -> row; keys are (district, season, soil), (None, season, None) and (None, None, None)
+        self.candidates = candidates  # bool, crop seen in the training data for the key
+        self.yield_kg = yield_kg  # kg per acre, NaN when unknown
+        self.margin = margin  # percent of revenue per acre, NaN without a price
+        self.sources = sources
+        self._views = {}
+
+    def lookup(self, district, season, soil_type):
+        """Returns: (row, exact), exact False when the key fell back to its season or to every crop"""
+        district, season, soil_type = _normalize(district), _normalize(season), _normalize(soil_type)
+        for level, key in enumerate(((district, season, soil_type), (None, season, None), (None, None, None))):
+            row = self.index.get(key)
+            if row is not None:
+                return row, level == 0
+
+    def row(self, district, season, soil_type):
+        return self.lookup(district, season, soil_type)[0]
+
+    def view(self, classes):
+        """The three tables with columns in the order of a model's class encoder"""
+        key = tuple(classes)
+        view = self._views.get(key)
+        if view is None:
+            position = {crop: c for c, crop in enumerate(self.crops)}
+            columns = np.array([position.get(crop, -1) for crop in key], dtype=np.int64)
+            known = columns >= 0
+            columns = np.where(known, columns, 0)
+            view = (self.candidates[:, columns] & known,
+                    np.where(known, self.yield_kg[:, columns], np.nan),
+                    np.where(known, self.margin[:, columns], np.nan))
+            self._views[key] = view
+        return view
+
+def _weighted(groups, keys, numerator, denominator, count):
+    """{key: numerator / denominator} over the groups rolled up to `keys`, where enough samples exist"""
+    rolled = groups.groupby(keys if len(keys) > 1 else keys[0])[[numerator, denominator, count]].sum()
+    rolled = rolled[(rolled[count] >= MIN_SAMPLES) & (rolled[denominator] > 0)]
+    return (rolled[numerator] / rolled[denominator]).to_dict()
+
+class CropRanker:
+    """
+    Ranks crop classifier probabilities against per-(district, season, soil_type) tables
+    precomputed from crops_dataset.csv and the database:
+    - candidate sets: the crops recommended for the key in the training data, which win over
+      other crops the model rates less than CANDIDATE_PRIOR higher
+    - expected yield (kg/acre) from plantings, with district/season -> season -> crop fallback
+    - profit margin from that yield, the recent selling price and CULTIVATION_COST_PER_ACRE
+    Results depend only on the probabilities and the loaded tables, so they are deterministic.
+    """
+
+    def __init__(self, price_days=90):
+        self.price_days = price_days
+        self.tables = None
+        self.loaded_at = None
+        self.counters = {'loads': 0, 'ranked': 0, 'unmatched_keys': 0, 'load_seconds': 0.0}
+        self._lock = threading.Lock()
+
+    def load(self, connection=None, data_dir=DATA_DIR):
+        """
+        Builds the tables; without a connection (or when its tables are missing) yields are
+        unknown and prices come from market_demand.csv only.
+        Returns: stats()
+        """
+        started = time.perf_counter()
+        dataset = pd.read_csv(os.path.join(data_dir, 'crops_dataset.csv'), keep_default_na=False)
+        plantings = pd.DataFrame(columns=['district', 'season', 'crop', 'kg', 'acres', 'n'])
+        trades = pd.DataFrame(columns=['district', 'crop', 'value', 'kg', 'n'])
+        if connection is not None:
+            try:
+                plantings = pd.DataFrame(connection.execute(YIELD_SQL).fetchall(), columns=plantings.columns)
+                since = (datetime.now() - timedelta(days=self.price_days)).strftime('%Y-%m-%d')
+                trades = pd.DataFrame(connection.execute(PRICE_SQL, {'since': since}).fetchall(), columns=trades.columns)
+            except OperationalError as e:
+                logger.warning(f"Crop ranking history not loaded: {e}")
+        market = pd.read_csv(os.path.join(data_dir, 'market_demand.csv'), keep_default_na=False)
+
+        tables = self._build(dataset, plantings, trades, market)
+        with self._lock:
+            self.tables = tables
+            self.loaded_at = datetime.utcnow().isoformat()
+            self.counters['loads'] += 1
+            self.counters['load_seconds'] = round(time.perf_counter() - started, 3)
+        return self.stats()
+
+    def _build(self, dataset, plantings, trades, market):
+        # Keys are matched normalized, whatever the case in the CSV, the database or the request
+        dataset = dataset.assign(**{column: dataset[column].map(_normalize) for column in ('district', 'season', 'soil_type')})
+        plantings = plantings.assign(district=plantings['district'].map(_normalize), season=plantings['season'].map(_normalize))
+        trades = trades.assign(district=trades['district'].map(_normalize))
+        crops = sorted(dataset['recommended_crop'].unique().tolist())
+        position = {crop: c for c, crop in enumerate(crops)}
+        districts = sorted(dataset['district'].unique().tolist())
+        seasons = sorted(dataset['season'].unique().tolist())
+        soils = sorted(dataset['soil_type'].unique().tolist())
+
+        keys = [(d, s, soil) for d in districts for s in seasons for soil in soils]
+        keys += [(None, s, None) for s in seasons] + [(None, None, None)]
+        index = {key: row for row, key in enumerate(keys)}
+
+        # Candidate sets, each key falling back to its district/season, then season, then every crop
+        seen = {}
+        for level in (['district', 'season', 'soil_type'], ['district', 'season'], ['season']):
+            for group, names in dataset.groupby(level)['recommended_crop']:
+                seen[tuple(group) if isinstance(group, tuple) else (group,)] = names.unique()
+        candidates = np.zeros((len(keys), len(crops)), dtype=bool)
+        for row, (district, season, soil) in enumerate(keys):
+            chain = [(district, season, soil), (district, season), (season,)] if district else [(season,)]
+            names = next((seen[key] for key in chain if key in seen), crops)
+            candidates[row, [position[name] for name in names]] = True
+
+        # Yields (kg/acre) and prices (Rs/kg) with their fallbacks
+        plantings = plantings.astype({'kg': float, 'acres': float, 'n': int})
+        trades = trades.astype({'value': float, 'kg': float, 'n': int})
+        yield_levels = [_weighted(plantings, ['district', 'season', 'crop'], 'kg', 'acres', 'n'),
+                        _weighted(plantings, ['season', 'crop'], 'kg', 'acres', 'n'),
+                        _weighted(plantings, ['crop'], 'kg', 'acres', 'n')]
+        price_levels = [_weighted(trades, ['district', 'crop'], 'value', 'kg', 'n'),
+                        _weighted(trades, ['crop'], 'value', 'kg', 'n'),
+                        market.astype({'prev_price_rs': float}).groupby('vegetable_name')['prev_price_rs'].mean().to_dict()]
+
+        yield_kg = np.full((len(keys), len(crops)), np.nan)
+        price = np.full((len(keys), len(crops)), np.nan)
+        for row, (district, season, _) in enumerate(keys):
+            for c, crop in enumerate(crops):
+                for value in (yield_levels[0].get((district, season, crop)), yield_levels[1].get((season, crop)),
+                              yield_levels[2].get(crop)):
+                    if value is not None:
+                        yield_kg[row, c] = value
+                        break
+                for value in (price_levels[0].get((district, crop)), price_levels[1].get(crop), price_levels[2].get(crop)):
+                    if value is not None:
+                        price[row, c] = value
+                        break
+
+        cost = np.array([CULTIVATION_COST_PER_ACRE.get(crop, DEFAULT_COST_PER_ACRE) for crop in crops], dtype=np.float64)
+        revenue = yield_kg * price
+        with np.errstate(invalid='ignore', divide='ignore'):
+            margin = np.where(revenue > 0, (revenue - cost) / revenue * 100, np.nan)
+
+        sources = {
+            'keys': len(keys), 'crops': len(crops),
+            'plantings': int(plantings['n'].sum()), 'trades': int(trades['n'].sum()),
+            'yield_known': int(np.isfinite(yield_kg[index[(None, None, None)]]).sum()),
+            'price_known': int(np.isfinite(price[index[(None, None, None)]]).sum())
+        }
+        return _Tables(crops, index, candidates, yield_kg, margin, sources)
+
+    def rank(self, probs, classes, keys, top_ks):
+        """
+        Takes: (n, n_classes) probabilities, the classifier's class names, one (district, season,
+        soil_type) per row and one top_k per row
+        Returns: (top class indices (n, k), candidate flags, yield kg/acre, margin %), best first,
+        k = the largest top_k; callers slice each row to its own top_k
+        Keys without a table row of their own rank on their season's row and count as unmatched_keys.
+        """
+        if self.tables is None:
+            # Services that were never given a database (CLI, tests) rank on the CSV tables
+            self.load()
+        tables = self.tables
+        candidates, yield_kg, margin = tables.view(classes)
+        found = [tables.lookup(*key) for key in keys]
+        rows = np.fromiter((row for row, _ in found), dtype=np.int64, count=len(found))
+        unmatched = sum(not exact for _, exact in found)
+        if unmatched:
+            logger.debug(f"{unmatched} of {len(found)} crop ranking keys fell back to their season")
+        n_classes = probs.shape[1]
+        k = max(1, min(max(top_ks), n_classes))
+
+        # Ordered by probability, candidates the model gives any chance lifted by CANDIDATE_PRIOR
+        row_candidates = candidates[rows]
+        score = np.where(row_candidates & (probs > 0), probs + CANDIDATE_PRIOR, probs)
+        top = np.argpartition(-score, k - 1, axis=1)[:, :k] if k < n_classes else np.tile(np.arange(n_classes), (len(rows), 1))
+        order = np.argsort(-np.take_along_axis(score, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        self.counters['ranked'] += len(rows)
+        self.counters['unmatched_keys'] += unmatched
+        return (top, np.take_along_axis(row_candidates, top, axis=1),
+                np.take_along_axis(yield_kg[rows], top, axis=1), np.take_along_axis(margin[rows], top, axis=1))
+
+    def stats(self):
+        tables = self.tables
+        return {
+            'loaded_at': self.loaded_at,
+            'price_days': self.price_days,
+            **(tables.sources if tables is not None else {}),
+            **self.counters
+        }
+
+crop_ranker = CropRanker(Config.CROP_RANKING_PRICE_DAYS)
+
+def load_crop_ranker(db_path=None, ranker=None):
+    """Loads the ranker from a database file (pool workers have no Flask app); CSV-only when that fails"""
+    from sqlalchemy import create_engine
+    ranker = ranker or crop_ranker
+    engine = create_engine(f"sqlite:///{db_path or Config.DB_PATH}")
+    try:
+        with engine.connect() as connection:
+            return ranker.load(connection)
+    except Exception as e:
+        logger.warning(f"Crop ranking loaded without history: {e}")
+        return ranker.load()
+    finally:
+        engine.dispose()
+
+def benchmark(db_path=None, farms=1000, repeats=5):
+    """
+    Ranks the crops_dataset.csv farms through MLService twice (the second pass hits the
+    prediction cache) and times the ranking step against the previous full argsort.
+    Returns: load stats, batch and ranking times, and whether the two passes matched
+    """
+    from backend.ml_service import MLService
+    load = load_crop_ranker(db_path) if db_path else crop_ranker.load()
+    service = MLService(load_mode='lazy')
+    service.crop_ranker = crop_ranker
+    dataset = pd.read_csv(os.path.join(DATA_DIR, 'crops_dataset.csv'), keep_default_na=False)
+    batch = [{'district': row.district, 'season': row.season, 'soil_type': row.soil_type,
+              'water_availability': row.water_availability, 'irrigation_type': row.irrigation_type,
+              'land_size_acres': row.land_area, 'previous_crop': row.previous_crop,
+              'market_demand_level': row.market_demand_level, 'temperature_avg': row.temperature_celsius,
+              'humidity': row.humidity_percent, 'rainfall_mm': row.rainfall_mm}
+             for row in dataset.head(farms).itertuples()]
+    service.get_crop_recommendations_batch(batch[:1])  # loads the model
+    started = time.perf_counter()
+    first = service.get_crop_recommendations_batch(batch)
+    cold_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    second = service.get_crop_recommendations_batch(batch)
+    cached_ms = (time.perf_counter() - started) * 1000
+    # weather_context carries the provider's state, which may change between the passes
+    strip = lambda results: [r.get('recommendations') for r in results]
+
+    state = service._state('crop')
+    classes = state.tables['recommended_crop'].classes
+    probs = np.random.default_rng(0).dirichlet(np.ones(len(classes)), size=len(batch))
+    keys = [(farm['district'], farm['season'], farm['soil_type']) for farm in batch]
+    timings = {}
+    for name, run in (('argsort', lambda: np.argsort(probs, axis=1)[:, -DEFAULT_TOP_K:][:, ::-1]),
+                      ('ranker', lambda: crop_ranker.rank(probs, classes, keys, [DEFAULT_TOP_K] * len(keys)))):
+        run()
+        started = time.perf_counter()
+        for _ in range(repeats):
+            run()
+        timings[f"{name}_ms"] = round((time.perf_counter() - started) / repeats * 1000, 3)
+    return {'load': load, 'farms': len(batch), 'deterministic': strip(first) == strip(second),
+            'failed': sum(not r.get('success') for r in first), 'batch_ms': round(cold_ms, 1),
+            'cached_batch_ms': round(cached_ms, 1), **timings}
+
+if __name__ == '__main__':
+    # Usage: python -m backend.crop_ranking benchmark [db_path] [--farms 1000]
+    #        python -m backend.crop_ranking show <district> <season> <soil_type> [db_path]
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='Inspect and benchmark the crop ranking tables')
+    parser.add_argument('command', choices=['benchmark', 'show'])
+    parser.add_argument('args', nargs='*')
+    parser.add_argument('--farms', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        print(json.dumps(benchmark(args.args[0] if args.args else None, args.farms), indent=2))
+        sys.exit(0)
+    if len(args.args) < 3:
+        sys.exit("Usage: python -m backend.crop_ranking show <district> <season> <soil_type> [db_path]")
+    load_crop_ranker(args.args[3] if len(args.args) > 3 else None)
+    tables = crop_ranker.tables
+    row = tables.row(*args.args[:3])
+    print(json.dumps([{'crop': crop, 'candidate': bool(tables.candidates[row, c]),
+                       'yield_kg_per_acre': None if np.isnan(tables.yield_kg[row, c]) else round(float(tables.yield_kg[row, c])),
+                       'margin_percent': None if np.isnan(tables.margin[row, c]) else round(float(tables.margin[row, c]), 1)}
+                      for c, crop in enumerate(tables.crops)], indent=2))
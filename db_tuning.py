@@ -0,0 +1,214 @@
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Secondary indexes for the per-user feeds and the date-range analytics.
+# schema.sql creates the same indexes for new databases.
+INDEXES = [
+    ('ix_transactions_seller_date', 'transactions', ('seller_id', 'transaction_date')),
+    ('ix_transactions_buyer_date', 'transactions', ('buyer_id', 'transaction_date')),
+    ('ix_transactions_date_total', 'transactions', ('transaction_date', 'total_price')),
+    ('ix_notifications_user_created', 'notifications', ('user_id', 'created_at')),
+    ('ix_notifications_user_unread', 'notifications', ('user_id', 'is_read')),
+    ('ix_price_alerts_farmer_created', 'price_alerts', ('farmer_id', 'created_at')),
+    ('ix_activity_logs_user_created', 'activity_logs', ('user_id', 'created_at')),
+    ('ix_activity_logs_created_feature', 'activity_logs', ('created_at', 'feature')),
+    ('ix_ai_recommendations_farmer_created', 'ai_recommendations', ('farmer_id', 'created_at')),
+    ('ix_spoilage_checks_farmer_created', 'spoilage_checks', ('farmer_id', 'created_at')),
+    ('ix_crops_farmer', 'crops', ('farmer_id',))
+]
+
+def sqlite_pragmas():
+    """Pragmas applied to every new SQLite connection in tuned mode"""
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}',
+        f'PRAGMA cache_size=-{Config.SQLITE_CACHE_SIZE_KB}',
+        'PRAGMA temp_store=MEMORY',
+        f'PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}'
+    ]
+
+def apply_pragmas(conn):
+    cursor = conn.cursor()
+    for pragma in sqlite_pragmas():
+        cursor.execute(pragma)
+    cursor.close()
+
+def install_sqlite_pragmas(engine_class=None):
+    """Applies the tuned pragmas whenever the SQLAlchemy pool opens a SQLite connection"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(engine_class or Engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            apply_pragmas(dbapi_connection)
+
+def migrate(db_path):
+    """
+    Brings an existing database up to the tuned profile: switches it to WAL,
+    creates any missing indexes and refreshes the planner statistics.
+    Takes: path to the SQLite file
+    Returns: names of the indexes that were created
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        apply_pragmas(conn)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        created = []
+        for name, table, columns in INDEXES:
+            if table not in tables or name in existing:
+                continue
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+            created.append(name)
+            logger.info(f"Created index {name}")
+        conn.execute("ANALYZE")
+        conn.commit()
+        return created
+    finally:
+        conn.close()
+
+# Benchmark: the same read and write patterns against a default and a tuned copy of one generated database
+
+BENCH_DAYS = 365
+BENCH_END_DATE = '2026-01-01'
+
+# Query -> (SQL, arguments: which table the id is drawn from, and the date window)
+BENCH_QUERIES = {
+    'notification_feed': ("SELECT * FROM notifications WHERE user_id = ? ORDER BY created_at DESC LIMIT 20", 'user'),
+    'unread_count': ("SELECT COUNT(*) FROM notifications WHERE user_id = ? AND is_read = 0", 'user'),
+    'seller_history': ("SELECT * FROM transactions WHERE seller_id = ? AND transaction_date >= ? "
+                       "ORDER BY transaction_date DESC", 'farmer_since'),
+    'buyer_history': ("SELECT * FROM transactions WHERE buyer_id = ? AND transaction_date >= ? "
+                      "ORDER BY transaction_date DESC", 'shop_since'),
+    'daily_revenue_7d': ("SELECT date(transaction_date), SUM(total_price) FROM transactions "
+                         "WHERE transaction_date >= ? GROUP BY 1", 'since'),
+    'price_alert_feed': ("SELECT * FROM price_alerts WHERE farmer_id = ? ORDER BY created_at DESC LIMIT 20", 'farmer'),
+    'activity_feed': ("SELECT * FROM activity_logs WHERE user_id = ? ORDER BY created_at DESC LIMIT 50", 'user'),
+    'feature_usage_7d': ("SELECT feature, COUNT(*) FROM activity_logs WHERE created_at >= ? GROUP BY feature", 'since')
+}
+
+def seed_bench_db(db_path, rows, seed=42, schema_path=None):
+    """
+    Builds the database with init_db's generator from schema.sql, then drops the INDEXES and
+    leaves WAL, so the copy starts from the profile migrate() upgrades
+    """
+    from backend.init_db import generate
+    generate(db_path, rows, seed, BENCH_DAYS, BENCH_END_DATE, **({'schema_path': schema_path} if schema_path else {}))
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=DELETE')
+    for name, _, _ in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    conn.close()
+
+def _time_queries(conn, repeats, seed):
+    rng = random.Random(seed)
+    end = datetime.fromisoformat(BENCH_END_DATE)
+    since_30d = (end - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    since_7d = (end - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+    counts = {table: conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 1
+              for table in ('users', 'farmers', 'shops')}
+    results = {}
+    for name, (sql, params) in BENCH_QUERIES.items():
+        samples = []
+        for _ in range(repeats):
+            args = {
+                'user': (rng.randint(1, counts['users']),),
+                'farmer': (rng.randint(1, counts['farmers']),),
+                'farmer_since': (rng.randint(1, counts['farmers']), since_30d),
+                'shop_since': (rng.randint(1, counts['shops']), since_30d),
+                'since': (since_7d,)
+            }[params]
+            started = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = round(statistics.median(samples), 3)
+    return results
+
+def _time_writes(db_path, tuned, threads, inserts):
+    """Inserts per second with several threads each committing single-row activity log inserts"""
+    def writer():
+        conn = sqlite3.connect(db_path, timeout=30)
+        if tuned:
+            apply_pragmas(conn)
+        for _ in range(inserts):
+            conn.execute("INSERT INTO activity_logs (user_id, feature, action) VALUES (?, ?, ?)",
+                         (1, 'Crop Advisor', 'view'))
+            conn.commit()
+        conn.close()
+
+    workers = [threading.Thread(target=writer) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return round(threads * inserts / (time.perf_counter() - started), 1)
+
+def benchmark(db_path, rows=1000000, repeats=50, threads=4, inserts=250, schema_path=None):
+    """
+    Generates db_path (if missing), then times the query patterns and concurrent writes
+    on a default copy and on the same copy after migrate() with tuned pragmas.
+    """
+    from backend.init_db import GENERATED_TABLES
+    if not os.path.exists(db_path):
+        started = time.perf_counter()
+        seed_bench_db(db_path, rows, schema_path=schema_path)
+        logger.info(f"Seeded {rows} rows in {time.perf_counter() - started:.1f}s")
+
+    work_path = db_path + '.bench'
+    shutil.copyfile(db_path, work_path)
+    try:
+        conn = sqlite3.connect(work_path)
+        before = _time_queries(conn, repeats, seed=7)
+        conn.close()
+        before_writes = _time_writes(work_path, False, threads, inserts)
+
+        started = time.perf_counter()
+        created = migrate(work_path)
+        migrate_seconds = round(time.perf_counter() - started, 2)
+
+        conn = sqlite3.connect(work_path)
+        apply_pragmas(conn)
+        after = _time_queries(conn, repeats, seed=7)
+        conn.close()
+        after_writes = _time_writes(work_path, True, threads, inserts)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(work_path + suffix):
+                os.remove(work_path + suffix)
+
+    return {
+        'rows': sum(sqlite3.connect(db_path).execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in GENERATED_TABLES),
+        'migrate_seconds': migrate_seconds,
+        'indexes_created': created,
+        'query_median_ms': {name: {'before': before[name], 'after': after[name]} for name in BENCH_QUERIES},
+        'concurrent_inserts_per_second': {'before': before_writes, 'after': after_writes}
+    }
+
+if __name__ == '__main__':
+    # Usage: python -m backend.db_tuning migrate [db_path]
+    #        python -m backend.db_tuning bench <db_path> [rows]
+    import json
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    if command == 'migrate':
+        print(f"Created indexes: {migrate(sys.argv[2] if len(sys.argv) > 2 else Config.DB_PATH)}")
+    elif command == 'bench':
+        print(json.dumps(benchmark(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 1000000), indent=2))
+    else:
+        sys.exit(f"Unknown command: {command}")
@@ -0,0 +1,62 @@
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+# Unknown-category policies
+UNKNOWN_ERROR = 'error'        # the row is rejected with an "Unknown <col>" error
+UNKNOWN_FALLBACK = 'fallback'  # the value is replaced by a known fallback category
+
+class CategoryTable:
+    """
+    Plain dict/array lookup table compiled from a fitted LabelEncoder.
+    Encodes and decodes without LabelEncoder's per-call np.unique/searchsorted validation.
+    """
+
+    def __init__(self, classes, unknown=UNKNOWN_ERROR, fallback=None):
+        self.classes = np.asarray(classes)
+        self.index = {value: code for code, value in enumerate(self.classes.tolist())}
+        self.unknown = unknown
+        self.fallback_code = None
+        if unknown == UNKNOWN_FALLBACK:
+            # Prefer the configured fallback, otherwise the first known class
+            self.fallback_code = self.index.get(fallback, 0)
+
+    def __contains__(self, value):
+        return value in self.index
+
+    def encode(self, values):
+        """
+        Returns: (codes, unknown mask). Unknown values are mapped to the fallback
+        category under UNKNOWN_FALLBACK and to -1 under UNKNOWN_ERROR.
+        """
+        codes = np.fromiter((self.index.get(value, -1) for value in values), dtype=np.int64, count=len(values))
+        unknown = codes < 0
+        if self.fallback_code is not None and unknown.any():
+            codes[unknown] = self.fallback_code
+        return codes, unknown
+
+    def encode_one(self, value):
+        code = self.index.get(value)
+        if code is None:
+            if self.fallback_code is None:
+                raise ValueError(f"Unknown category: {value!r}")
+            return self.fallback_code
+        return code
+
+    def decode(self, codes):
+        return self.classes[np.asarray(codes, dtype=np.int64)]
+
+def compile_encoders(encoders, fallbacks=None):
+    """
+    Takes: {column: LabelEncoder, ...} as saved next to each model, and optional {column: fallback category}
+    Returns: {column: CategoryTable, ...}; columns listed in fallbacks use the fallback policy
+    """
+    fallbacks = fallbacks or {}
+    tables = {}
+    for col, encoder in encoders.items():
+        if not isinstance(encoder, LabelEncoder):
+            continue
+        if col in fallbacks:
+            tables[col] = CategoryTable(encoder.classes_, UNKNOWN_FALLBACK, fallbacks[col])
+        else:
+            tables[col] = CategoryTable(encoder.classes_)
+    return tables
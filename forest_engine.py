@@ -0,0 +1,221 @@
+import json
+import os
+import sys
+import time
+import warnings
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+@contextmanager
+def unnamed_features():
+    """
+    Models are fitted on DataFrames but scored with plain NumPy matrices in training column order;
+    silences sklearn's feature-name warning for the calls inside the block only
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+        yield
+
+class FlatForest:
+    """
+    A fitted sklearn random forest flattened into contiguous NumPy node arrays.
+    All trees are evaluated together with a vectorized level-by-level traversal,
+    reproducing sklearn's predict / predict_proba outputs exactly.
+
+    The traversal wins on the small inputs the API sends; batches larger than
+    max_rows are handed back to the sklearn forest, whose C loop is faster there.
+    """
+
+    def __init__(self, forest, max_rows=None):
+        if not isinstance(forest, (RandomForestClassifier, RandomForestRegressor)):
+            raise TypeError(f"Unsupported model type: {type(forest).__name__}")
+        if forest.n_outputs_ != 1:
+            raise ValueError("Only single-output forests are supported")
+
+        self.forest = forest
+        self.max_rows = max_rows
+        self.is_classifier = isinstance(forest, RandomForestClassifier)
+        self.classes_ = getattr(forest, 'classes_', None)
+        self.n_features_in_ = forest.n_features_in_
+        self.n_trees = len(forest.estimators_)
+
+        features, thresholds, lefts, rights, leaf_rows, leaf_values, roots = [], [], [], [], [], [], []
+        offset = n_leaves = max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            nodes = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so a fixed number of steps never walks off the tree
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+
+            values = tree.value[is_leaf, 0, :]
+            if self.is_classifier:
+                # Same per-leaf normalisation DecisionTreeClassifier.predict_proba applies
+                values = values / values.sum(axis=1, keepdims=True)
+            rows = np.full(n_nodes, -1)
+            rows[is_leaf] = np.arange(n_leaves, n_leaves + is_leaf.sum())
+            leaf_rows.append(rows)
+            leaf_values.append(values)
+
+            roots.append(offset)
+            offset += n_nodes
+            n_leaves += int(is_leaf.sum())
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.concatenate(features).astype(np.int32)
+        self.threshold = _floor_float32(np.concatenate(thresholds))
+        self.left = np.concatenate(lefts).astype(np.int32)
+        self.right = np.concatenate(rights).astype(np.int32)
+        self.leaf_row = np.concatenate(leaf_rows).astype(np.int32)
+        self.leaf_values = np.ascontiguousarray(np.concatenate(leaf_values))
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = max_depth
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.leaf_row, self.leaf_values, self.roots))
+
+    def _leaves(self, X):
+        """Returns the leaf row reached in every tree, shape (n_samples, n_trees)"""
+        # sklearn compares float32 features against the split thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            if np.array_equal(next_nodes, nodes):
+                break
+            nodes = next_nodes
+        return self.leaf_row[nodes]
+
+    def _mean_leaf_values(self, X):
+        leaves = self._leaves(X)
+        # Accumulate tree by tree in estimator order, as sklearn does, so sums round identically
+        total = np.zeros((len(leaves), self.leaf_values.shape[1]))
+        for t in range(self.n_trees):
+            total += self.leaf_values[leaves[:, t]]
+        return total / self.n_trees
+
+    def _use_sklearn(self, X):
+        return self.max_rows is not None and len(X) > self.max_rows
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        if self._use_sklearn(X):
+            return self.forest.predict_proba(X)
+        return self._mean_leaf_values(X)
+
+    def predict(self, X):
+        if self._use_sklearn(X):
+            return self.forest.predict(X)
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(self._mean_leaf_values(X), axis=1), axis=0)
+        return self._mean_leaf_values(X)[:, 0]
+
+def _floor_float32(thresholds):
+    """
+    Largest float32 not above each float64 threshold. For float32 inputs x,
+    x <= floor32(t) holds exactly when x <= t, so comparisons can stay in float32.
+    """
+    rounded = thresholds.astype(np.float32)
+    above = rounded.astype(np.float64) > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+def compile_model(model, max_rows=None):
+    """
+    Takes: a loaded model as stored in MLService.models (a forest, or a dict of forests)
+    Returns: the same structure with every forest replaced by a FlatForest
+    """
+    if isinstance(model, dict):
+        return {key: compile_model(value, max_rows) for key, value in model.items()}
+    return FlatForest(model, max_rows)
+
+def sklearn_nbytes(model):
+    """Bytes held by the node and value arrays of an sklearn forest (or dict of forests)"""
+    if isinstance(model, dict):
+        return sum(sklearn_nbytes(value) for value in model.values())
+    return sum(est.tree_.__getstate__()['nodes'].nbytes + est.tree_.value.nbytes for est in model.estimators_)
+
+def feature_columns(service, name):
+    """
+    Column order a model was fit on. Models from train_models are fit on arrays and carry no
+    feature_names_in_, so this reads the bundle manifest, else the TRAINING_SPECS order.
+    """
+    from backend.train_models import MANIFEST, TRAINING_SPECS
+    path = os.path.join(service.models_dir, MANIFEST)
+    if service.bundle and os.path.isfile(path):
+        with open(path) as f:
+            entry = json.load(f)['models'].get(name)
+        if entry is not None:
+            return list(entry['features'])
+    spec = TRAINING_SPECS[name]
+    targets = {target for target, _ in spec['targets'].values()}
+    return [col for col in spec['columns'] if col not in targets]
+
+def check_parity(service, data_dir, names=None):
+    """
+    Scores every row of each training CSV (of `names`, default all) with sklearn and with the flat engine.
+    Returns: {model: {sub_model: {rows, identical, sklearn_ms, flat_ms, sklearn_bytes, flat_bytes}}}
+    """
+    from backend.train_models import TRAINING_SPECS
+    report = {}
+    for name in names or TRAINING_SPECS:
+        service.load_model(name)
+        model = service.models[name]
+        compiled = compile_model(model)
+        df = pd.read_csv(os.path.join(data_dir, TRAINING_SPECS[name]['csv']), keep_default_na=False)
+        fitted_columns = feature_columns(service, name)
+
+        subs = model.items() if isinstance(model, dict) else [(name, model)]
+        flats = compiled if isinstance(compiled, dict) else {name: compiled}
+        report[name] = {}
+        for sub_name, forest in subs:
+            columns = list(getattr(forest, 'feature_names_in_', fitted_columns))
+            X = np.column_stack([
+                service.tables[name][col].encode(df[col].tolist())[0] if col in service.tables[name]
+                else df[col].astype(np.float64).to_numpy()
+                for col in columns
+            ]).astype(np.float64)
+            flat = flats[sub_name]
+
+            started = time.perf_counter()
+            with unnamed_features():
+                expected = forest.predict_proba(X) if flat.is_classifier else forest.predict(X)
+            sklearn_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            actual = flat.predict_proba(X) if flat.is_classifier else flat.predict(X)
+            flat_ms = (time.perf_counter() - started) * 1000
+
+            report[name][sub_name] = {
+                'rows': len(X),
+                'identical': bool(np.array_equal(expected, actual)),
+                'sklearn_ms': round(sklearn_ms, 2),
+                'flat_ms': round(flat_ms, 2),
+                'sklearn_bytes': sklearn_nbytes(forest),
+                'flat_bytes': flat.nbytes
+            }
+    return report
+
+if __name__ == '__main__':
+    # Usage: python -m backend.forest_engine [directory with the training CSVs]
+    from backend.ml_service import MLService
+    from backend.train_models import DATA_DIR
+    service = MLService(load_mode='lazy')
+    results = check_parity(service, sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)
+    failed = False
+    for name, subs in results.items():
+        for sub_name, result in subs.items():
+            failed |= not result['identical']
+            print(f"{name}.{sub_name}: {result}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,63 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from backend import db
+from backend.models import ActivityLog, Notification, Transaction
+from backend.pagination import decode_cursor, keyset_page, iter_rows, ndjson_lines, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+history_bp = Blueprint('history', __name__)
+
+# Resource -> (table, timestamp column the keyset is built on)
+RESOURCES = {
+    'notifications': (Notification.__table__, 'created_at'),
+    'activity': (ActivityLog.__table__, 'created_at'),
+    'transactions': (Transaction.__table__, 'transaction_date')
+}
+
+def _history(resource, filters):
+    """
+    JSON page by default: ?cursor=<next_cursor>&limit=50.
+    ?format=ndjson streams the whole history (from ?cursor= if given), one row per line.
+    """
+    table, sort_column = RESOURCES[resource]
+    cursor = request.args.get('cursor') or None
+
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            with db.engine.connect() as connection:
+                yield from ndjson_lines(iter_rows(connection, table, sort_column, filters, cursor))
+        # Validate the cursor before the response starts, errors can't be reported mid-stream
+        try:
+            if cursor:
+                decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                        headers={'Content-Disposition': f'attachment; filename={resource}.ndjson'})
+
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    try:
+        rows, next_cursor = keyset_page(db.session.connection(), table, sort_column, filters, cursor, limit)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({
+        "success": True,
+        resource: rows,
+        "count": len(rows),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    })
+
+@history_bp.route('/notifications/<int:user_id>', methods=['GET'])
+def notification_history(user_id):
+    return _history('notifications', {'user_id': user_id})
+
+@history_bp.route('/activity/<int:user_id>', methods=['GET'])
+def activity_history(user_id):
+    return _history('activity', {'user_id': user_id})
+
+@history_bp.route('/transactions/<int:user_id>', methods=['GET'])
+def transaction_history(user_id):
+    """?role=seller (default) or buyer"""
+    role = request.args.get('role', 'seller')
+    if role not in ('seller', 'buyer'):
+        return jsonify({"success": False, "error": "role must be 'seller' or 'buyer'"}), 400
+    return _history('transactions', {f'{role}_id': user_id})
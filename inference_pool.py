@@ -0,0 +1,400 @@
+import atexit
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Single-item methods and the batch method the workers actually run for them
+BATCHED_METHODS = {
+    'get_crop_recommendations': 'get_crop_recommendations_batch',
+    'forecast_demand': 'forecast_demand_batch',
+    'detect_price_crash_risk': 'detect_price_crash_risk_batch',
+    'predict_spoilage_risk': 'predict_spoilage_risk_batch'
+}
+WORKER_METHODS = set(BATCHED_METHODS.values()) | {'health', 'cache_stats', 'plan_spoilage_routes'}
+
+# Workers send their metrics snapshot to the parent at most this often
+METRICS_PUSH_SECONDS = 2.0
+
+class PoolBusyError(Exception):
+    pass
+
+# Worker processes are named WORKER_NAME-<n>; get_ml_service() checks it while a spawned worker imports __main__
+WORKER_NAME = 'inference-worker'
+
+def _worker_main(jobs, results, load_mode, mmap_mode, inference_backend):
+    """Worker process: owns one MLService, runs batch calls from its own job queue and sends results on its pipe"""
+    from backend.ml_service import MLService
+    from backend.metrics import metrics
+    from backend.config import Config
+    service = MLService(load_mode=load_mode, mmap_mode=mmap_mode, inference_backend=inference_backend)
+    if Config.MODEL_RELOAD_ENABLED:
+        # Each worker follows the models directory itself; a rollback's REJECTED marker reaches all of them
+        from backend.model_reload import ModelReloader
+        ModelReloader(service, Config.MODEL_RELOAD_INTERVAL_SECONDS).start()
+    if Config.CROP_RANKING_HISTORY:
+        # Yield and margin tables are per process too; the worker reads them from the database file
+        from backend.crop_ranking import load_crop_ranker
+        load_crop_ranker(Config.DB_PATH)
+    if Config.WEATHER_CLIENT_ENABLED and Config.WEATHER_PREFETCH_ENABLED:
+        # The weather cache is per process, so each worker keeps its own copy warm
+        from backend.weather_cache import weather_cache
+        from backend.weather_client import WeatherPrefetcher
+        WeatherPrefetcher(weather_cache, service.known_districts, Config.WEATHER_PREFETCH_INTERVAL_SECONDS,
+                          Config.WEATHER_POOL_SIZE).start()
+    last_push = 0.0
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, method, args = job
+        try:
+            if method not in WORKER_METHODS:
+                raise ValueError(f"Unsupported method: {method}")
+            message = (job_id, getattr(service, method)(*args), None)
+        except Exception as e:
+            message = (job_id, None, str(e))
+        try:
+            results.send(message)
+        except (BrokenPipeError, EOFError, OSError):
+            break
+        except Exception as e:
+            # The result could not be pickled
+            results.send((job_id, None, str(e)))
+
+        if time.monotonic() - last_push >= METRICS_PUSH_SECONDS:
+            last_push = time.monotonic()
+            results.send(('metrics', os.getpid(), metrics.snapshot()))
+
+class _Worker:
+    """One worker process with its own job queue and result pipe, so a dead worker can't hold a lock others need"""
+
+    def __init__(self, process, jobs, results):
+        self.process = process
+        self.jobs = jobs
+        self.results = results  # parent's read end
+        self.inflight = set()  # job ids sent to this worker and not answered yet
+
+    def close(self):
+        self.results.close()
+        self.jobs.cancel_join_thread()
+        self.jobs.close()
+
+class InferencePool:
+    """
+    Client facade over a pool of worker processes that own the loaded models.
+    It exposes the same prediction methods as MLService, so blueprints are unchanged.
+    - Concurrent single-item calls are micro-batched into one *_batch call per worker job.
+    - At most queue_size calls wait for dispatch; beyond that calls fail fast (backpressure).
+    - Callers wait at most timeout seconds and get {'success': False, 'error': ...} after that.
+    - A worker that dies fails its in-flight calls at once and is replaced; so does a worker
+      still busy with a job past timeout, which is killed so its slot can't stay taken.
+    """
+
+    def __init__(self, workers=2, queue_size=1000, max_batch=64, batch_wait_ms=2, timeout=10.0,
+                 load_mode='eager', mmap_mode=None, inference_backend=None):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.timeout = timeout
+        self.load_mode = load_mode
+        self._worker_args = (load_mode, mmap_mode, inference_backend)
+
+        # spawn, not fork: the app has background threads by the time a worker is (re)started,
+        # and a forked child would inherit whatever locks they held
+        self._ctx = multiprocessing.get_context('spawn')
+        self._requests = queue.Queue(maxsize=queue_size)
+        # Keep at most two jobs per worker in flight so waiting happens in the bounded queue
+        self._inflight = threading.BoundedSemaphore(workers * 2)
+        self._pending = {}  # job_id -> ([futures] or a single future for whole-batch jobs, worker, deadline)
+        self._pending_lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._worker_ids = itertools.count()
+        self._workers = []
+        self._worker_metrics = {}  # pid -> latest metrics snapshot
+        self._stopped = False
+        self._counters = {'submitted': 0, 'rejected': 0, 'timeouts': 0, 'jobs': 0, 'batched_items': 0,
+                          'worker_restarts': 0, 'failed_by_worker_exit': 0, 'hung_workers': 0}
+
+        for _ in range(workers):
+            self._workers.append(self._start_worker())
+        threading.Thread(target=self._dispatch_loop, name='inference-dispatch', daemon=True).start()
+        self._collector = threading.Thread(target=self._collect_loop, name='inference-collect', daemon=True)
+        self._collector.start()
+        atexit.register(self.shutdown)
+
+    def _start_worker(self):
+        jobs = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(target=_worker_main, args=(jobs, writer) + self._worker_args,
+                                    name=f"{WORKER_NAME}-{next(self._worker_ids)}", daemon=True)
+        process.start()
+        writer.close()  # the worker holds the only write end, so its exit shows up as EOF
+        return _Worker(process, jobs, reader)
+
+    # Prediction API (same signatures as MLService)
+
+    def get_crop_recommendations(self, farm_data):
+        return self._call('get_crop_recommendations', farm_data)
+
+    def forecast_demand(self, forecast_data):
+        return self._call('forecast_demand', forecast_data)
+
+    def detect_price_crash_risk(self, price_data):
+        return self._call('detect_price_crash_risk', price_data)
+
+    def predict_spoilage_risk(self, spoilage_data):
+        return self._call('predict_spoilage_risk', spoilage_data)
+
+    def get_crop_recommendations_batch(self, farms):
+        return self._call_batch('get_crop_recommendations_batch', farms)
+
+    def forecast_demand_batch(self, forecasts):
+        return self._call_batch('forecast_demand_batch', forecasts)
+
+    def detect_price_crash_risk_batch(self, prices):
+        return self._call_batch('detect_price_crash_risk_batch', prices)
+
+    def predict_spoilage_risk_batch(self, lots):
+        return self._call_batch('predict_spoilage_risk_batch', lots)
+
+    def plan_spoilage_routes(self, plan):
+        result = self._call_raw('plan_spoilage_routes', (plan,))
+        if 'success' not in result:
+            return {'success': False, **result}
+        return result
+
+    def health(self):
+        health = self._call_raw('health', ())
+        if isinstance(health, dict):
+            health['pool'] = self.stats()
+        return health
+
+    def cache_stats(self):
+        return self._call_raw('cache_stats', ())
+
+    def is_ready(self):
+        health = self.health()
+        return isinstance(health, dict) and health.get('models_ready', False)
+
+    @property
+    def model_status(self):
+        health = self.health()
+        return health.get('models', {}) if isinstance(health, dict) else {}
+
+    # Request plumbing
+
+    def _submit(self, kind, method, payload):
+        future = Future()
+        try:
+            self._requests.put_nowait((kind, method, payload, future))
+        except queue.Full:
+            self._counters['rejected'] += 1
+            raise PoolBusyError("Inference pool is busy, try again shortly")
+        self._counters['submitted'] += 1
+        return future
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._counters['timeouts'] += 1
+            raise
+
+    def _call(self, method, item):
+        try:
+            return self._wait(self._submit('item', method, item))
+        except PoolBusyError as e:
+            return {'success': False, 'error': str(e)}
+        except FutureTimeoutError:
+            return {'success': False, 'error': f"Prediction timed out after {self.timeout}s"}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def _call_batch(self, method, items):
+        try:
+            return self._wait(self._submit('batch', method, list(items)))
+        except PoolBusyError as e:
+            return [{'success': False, 'error': str(e)} for _ in items]
+        except FutureTimeoutError:
+            return [{'success': False, 'error': f"Prediction timed out after {self.timeout}s"} for _ in items]
+        except Exception as e:
+            return [{'success': False, 'error': str(e)} for _ in items]
+
+    def _call_raw(self, method, args):
+        try:
+            return self._wait(self._submit('raw', method, args))
+        except Exception as e:
+            return {'error': str(e) or type(e).__name__}
+
+    def _dispatch_loop(self):
+        """Groups queued single-item calls per method into micro-batches and hands them to workers"""
+        while not self._stopped:
+            first = self._requests.get()
+            if first is None:
+                break
+            requests = [first]
+            deadline = time.monotonic() + self.batch_wait
+            while len(requests) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._stopped = True
+                    break
+                requests.append(request)
+
+            groups = {}
+            for kind, method, payload, future in requests:
+                # Skip calls whose caller already gave up
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if kind == 'item':
+                    groups.setdefault(BATCHED_METHODS[method], []).append((payload, future))
+                else:
+                    self._send(method, payload if kind == 'batch' else tuple(payload), future)
+
+            for method, calls in groups.items():
+                self._send(method, [payload for payload, _ in calls], [future for _, future in calls])
+
+    def _send(self, method, payload, futures):
+        self._inflight.acquire()
+        job_id = next(self._job_ids)
+        with self._pending_lock:
+            # Least loaded live worker; a dead one is failed and replaced by the collector
+            live = [worker for worker in self._workers if worker.process.is_alive()] or self._workers
+            if not live:
+                self._inflight.release()
+                error = RuntimeError("Inference pool is shut down")
+                for future in futures if isinstance(futures, list) else [futures]:
+                    future.set_exception(error)
+                return
+            worker = min(live, key=lambda w: len(w.inflight))
+            worker.inflight.add(job_id)
+            # Callers have given up by then; the collector kills a worker still busy with it
+            self._pending[job_id] = (futures, worker, time.monotonic() + self.timeout)
+            # Under the lock, so the collector can't close this queue in between
+            worker.jobs.put((job_id, method, payload if isinstance(payload, tuple) else (payload,)))
+        self._counters['jobs'] += 1
+        if isinstance(futures, list):
+            self._counters['batched_items'] += len(futures)
+
+    def _collect_loop(self):
+        while not (self._stopped and not any(worker.process.is_alive() for worker in self._workers)):
+            by_pipe = {worker.results: worker for worker in self._workers}
+            with self._pending_lock:
+                next_deadline = min((deadline for _, _, deadline in self._pending.values()), default=None)
+            wait = 1.0 if next_deadline is None else min(1.0, max(0.01, next_deadline - time.monotonic()))
+            for pipe in multiprocessing.connection.wait(list(by_pipe), timeout=wait):
+                worker = by_pipe[pipe]
+                try:
+                    message = pipe.recv()
+                except Exception:
+                    # EOF or a message cut short: the worker is gone
+                    self._worker_exited(worker)
+                    continue
+                self._deliver(worker, *message)
+            for worker in list(self._workers):
+                if not worker.process.is_alive() and not worker.results.poll():
+                    self._worker_exited(worker)
+            self._kill_hung_workers()
+
+    def _kill_hung_workers(self):
+        """Kills and replaces workers holding a job past its deadline, failing their in-flight calls"""
+        now = time.monotonic()
+        with self._pending_lock:
+            hung = {id(worker): worker for _, worker, deadline in self._pending.values() if deadline <= now}
+        for worker in hung.values():
+            worker.process.kill()
+            self._counters['hung_workers'] += 1
+            self._worker_exited(worker, f"Inference worker timed out after {self.timeout}s")
+
+    def _deliver(self, worker, job_id, result, error):
+        if job_id == 'metrics':
+            self._worker_metrics[result] = error
+            return
+        with self._pending_lock:
+            futures, _, _ = self._pending.pop(job_id, (None, None, None))
+            worker.inflight.discard(job_id)
+        if futures is None:
+            return
+        self._inflight.release()
+
+        if isinstance(futures, list):
+            for i, future in enumerate(futures):
+                if error is not None:
+                    future.set_result({'success': False, 'error': error})
+                else:
+                    future.set_result(result[i])
+        elif error is not None:
+            futures.set_exception(RuntimeError(error))
+        else:
+            futures.set_result(result)
+
+    def _worker_exited(self, worker, error=None):
+        """Fails the dead worker's in-flight calls, releases their slots and starts a replacement"""
+        if worker not in self._workers:
+            return
+        # The replacement takes the dead worker's place in one step, so _send always has a worker
+        replacement = None if self._stopped else self._start_worker()
+        with self._pending_lock:
+            lost = [self._pending.pop(job_id)[0] for job_id in worker.inflight if job_id in self._pending]
+            worker.inflight.clear()
+            self._workers.remove(worker)
+            if replacement is not None:
+                self._workers.append(replacement)
+        worker.process.join(timeout=1)
+        worker.close()
+
+        error = error or f"Inference worker exited with {worker.process.exitcode}"
+        for futures in lost:
+            self._inflight.release()
+            self._counters['failed_by_worker_exit'] += 1
+            if isinstance(futures, list):
+                for future in futures:
+                    future.set_result({'success': False, 'error': error})
+            else:
+                futures.set_exception(RuntimeError(error))
+        if replacement is not None:
+            logger.error(f"{error} (pid {worker.process.pid}); restarted, {len(lost)} jobs failed")
+            self._counters['worker_restarts'] += 1
+
+    def metrics_snapshots(self):
+        return list(self._worker_metrics.values())
+
+    def stats(self):
+        return {
+            **self._counters,
+            'workers': sum(1 for worker in self._workers if worker.process.is_alive()),
+            'queued': self._requests.qsize(),
+            'inflight_jobs': len(self._pending)
+        }
+
+    def shutdown(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        try:
+            self._requests.put_nowait(None)
+        except queue.Full:
+            pass
+        workers = list(self._workers)
+        for worker in workers:
+            worker.jobs.put(None)
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self._collector.join(timeout=5)
@@ -1,7 +1,13 @@
 import sqlite3
 import os
+import sys
+import time
+import argparse
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
 
 def init_db():
     db_path = os.path.join('database', 'harvestlink.db')
@@ -23,6 +29,7 @@ def init_db():
         print("Seeding transaction data...")
         crops = ['Tomato', 'Onion', 'Potato', 'Carrot', 'Eggplant']
         # Assume some IDs exist for farmers (1-5) and shops (1-3)
+        rows = []
         for i in range(60): # 60 days of data
             date = datetime.now() - timedelta(days=i)
             # Add 2-5 transactions per day
@@ -33,13 +40,310 @@ def init_db():
                 qty = random.uniform(50, 500)
                 price = random.uniform(20, 60)
                 total = qty * price
-                cursor.execute('''INSERT INTO transactions (seller_id, buyer_id, crop_name, quantity, price_per_unit, total_price, transaction_date)
-                               VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                               (seller_id, buyer_id, crop, qty, price, total, date.strftime('%Y-%m-%d %H:%M:%S')))
+                rows.append((seller_id, buyer_id, crop, qty, price, total, date.strftime('%Y-%m-%d %H:%M:%S')))
+        cursor.executemany('''INSERT INTO transactions (seller_id, buyer_id, crop_name, quantity, price_per_unit, total_price, transaction_date)
+                           VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
         
     conn.commit()
     conn.close()
     print(f"Database initialized and seeded at {db_path}")
 
+# Synthetic load generator
+#
+# Row counts scale with the number of users; the rest are per-user (or per-farmer / per-shop) rates.
+# Categorical values and prices are resampled from the bundled training CSVs, so districts,
+# crops, soils and price levels follow the same distributions the models were trained on.
+
+FARMER_SHARE = 0.7
+SHOP_SHARE = 0.25  # the remaining users are admins
+
+PER_FARMER = {'crops': 1.5, 'crop_listings': 2, 'ai_recommendations': 3, 'price_alerts': 4, 'spoilage_checks': 2}
+PER_SHOP = {'demand_posts': 3}
+PER_USER = {'transactions': 20, 'notifications': 15, 'activity_logs': 12, 'pilot_feedback': 0.05,
+            'pilot_participants': 0.02}
+
+# werkzeug hash of "password", shared by every generated account so any user can log in
+PASSWORD_HASH = ('scrypt:32768:8:1$HnBzJZZSNEhBaovY$dc4a5fea1b878e65278af96fdf476199df804bedae1ef90c5c8f1cfd29d350'
+                 '465e338d83ff67521bfbba46b9ad31e6e18498af30442d1576d523374f7e5509f0')
+
+NOTIFICATION_TYPES = {
+    'price_alert': ('Price crash risk', 'Prices for your crop may fall in the coming week'),
+    'spoilage_warning': ('Spoilage warning', 'Your stored produce is at risk of spoiling'),
+    'demand_update': ('Demand update', 'New demand posted for crops you grow'),
+    'recommendation': ('New recommendation', 'We have a new crop suggestion for your farm')
+}
+FEATURES = ['Crop Advisor', 'Price Alerts', 'Spoilage Checker']
+ACTIONS = ['view', 'check', 'recommendation']
+CRASH_RISK_LEVELS = {'None': 'LOW', 'Low': 'LOW', 'Medium': 'MEDIUM', 'High': 'HIGH'}
+
+def plan_counts(rows):
+    """Per-table row counts that add up to roughly `rows`"""
+    per_user = (1 + 1 + FARMER_SHARE * (1 + sum(PER_FARMER.values())) + SHOP_SHARE * (1 + sum(PER_SHOP.values()))
+                + sum(PER_USER.values()))  # users + notification_preferences + entities + events
+    users = max(int(rows / per_user), 10)
+    farmers = int(users * FARMER_SHARE)
+    shops = int(users * SHOP_SHARE)
+    counts = {'users': users, 'notification_preferences': users, 'farmers': farmers, 'shops': shops}
+    counts.update({table: int(farmers * rate) for table, rate in PER_FARMER.items()})
+    counts.update({table: int(shops * rate) for table, rate in PER_SHOP.items()})
+    counts.update({table: int(users * rate) for table, rate in PER_USER.items()})
+    return counts
+
+class SyntheticData:
+    """
+    Column generators for every table, vectorized with NumPy. Each table draws from
+    its own seeded stream, so a table's contents depend only on the seed and its size.
+    """
+
+    def __init__(self, counts, seed, days, end_date, data_dir):
+        self.counts = counts
+        self.seed = seed
+        self.days = days
+        self.end = np.datetime64(end_date, 's')
+        self.crops = pd.read_csv(os.path.join(data_dir, 'crops_dataset.csv'), keep_default_na=False)
+        self.market = pd.read_csv(os.path.join(data_dir, 'market_demand.csv'), keep_default_na=False)
+        self.crash = pd.read_csv(os.path.join(data_dir, 'price_crash.csv'), keep_default_na=False)
+        self.spoilage = pd.read_csv(os.path.join(data_dir, 'spoilage_data.csv'), keep_default_na=False)
+
+    def rng(self, table):
+        return np.random.default_rng([self.seed, GENERATED_TABLES.index(table)])
+
+    def timestamps(self, rng, n):
+        """Sorted 'YYYY-MM-DD HH:MM:SS' strings over the window, so ids follow creation time"""
+        offsets = np.sort(rng.integers(0, self.days * 86400, n))[::-1]
+        return np.char.replace(np.datetime_as_string(self.end - offsets.astype('timedelta64[s]')), 'T', ' ')
+
+    def skewed_ids(self, rng, n, population):
+        """Ids 1..population with a heavy tail: a few accounts produce most of the activity"""
+        weights = 1.0 / np.arange(1, population + 1) ** 0.8
+        ranks = rng.choice(population, size=n, p=weights / weights.sum())
+        return rng.permutation(population)[ranks] + 1
+
+    def sample(self, rng, df, n, columns):
+        rows = rng.integers(0, len(df), n)
+        return [df[col].to_numpy()[rows] for col in columns]
+
+    def users(self, n):
+        rng = self.rng('users')
+        farmers, shops = self.counts['farmers'], self.counts['shops']
+        ids = np.arange(1, n + 1)
+        role = np.where(ids <= farmers, 'farmer', np.where(ids <= farmers + shops, 'shop', 'admin'))
+        names = np.char.add('User ', ids.astype(str))
+        emails = np.char.add(np.char.add('user', ids.astype(str)), '@harvestlink.test')
+        return ['id', 'name', 'email', 'password_hash', 'role', 'created_at'], \
+               [ids, names, emails, np.full(n, PASSWORD_HASH), role, self.timestamps(rng, n)]
+
+    def notification_preferences(self, n):
+        rng = self.rng('notification_preferences')
+        return ['user_id', 'in_app', 'email', 'sms', 'push'], \
+               [np.arange(1, n + 1), np.ones(n, dtype=int), rng.random(n) < 0.8, rng.random(n) < 0.2,
+                rng.random(n) < 0.7]
+
+    def farmers(self, n):
+        rng = self.rng('farmers')
+        district, land, soil, water, irrigation = self.sample(
+            rng, self.crops, n, ['district', 'land_area', 'soil_type', 'water_availability', 'irrigation_type'])
+        ids = np.arange(1, n + 1)
+        return ['id', 'user_id', 'name', 'phone', 'village', 'district', 'land_area', 'soil_type',
+                'water_availability', 'irrigation_type', 'created_at'], \
+               [ids, ids, np.char.add('Farmer ', ids.astype(str)), (9000000000 + ids).astype(str),
+                np.char.add(district.astype(str), np.char.add(' Village ', (ids % 40 + 1).astype(str))),
+                district, land, soil, water, irrigation, self.timestamps(rng, n)]
+
+    def shops(self, n):
+        rng = self.rng('shops')
+        ids = np.arange(1, n + 1)
+        (city,) = self.sample(rng, self.market, n, ['city'])
+        return ['id', 'user_id', 'owner_name', 'shop_name', 'location', 'phone', 'created_at'], \
+               [ids, ids + self.counts['farmers'], np.char.add('Owner ', ids.astype(str)),
+                np.char.add('Shop ', ids.astype(str)), city, (8000000000 + ids).astype(str),
+                self.timestamps(rng, n)]
+
+    def crops_table(self, n):
+        rng = self.rng('crops')
+        crop, season, land = self.sample(rng, self.crops, n, ['recommended_crop', 'season', 'land_area'])
+        planted = self.end - rng.integers(0, self.days, n).astype('timedelta64[D]')
+        harvest = planted + rng.integers(60, 150, n).astype('timedelta64[D]')
+        return ['farmer_id', 'crop_name', 'season', 'quantity_kg', 'planted_date', 'expected_harvest', 'status'], \
+               [rng.integers(1, self.counts['farmers'] + 1, n), crop, season,
+                np.round(land.astype(float) * rng.uniform(800, 2500, n), 1),
+                np.datetime_as_string(planted, unit='D'), np.datetime_as_string(harvest, unit='D'),
+                rng.choice(['planted', 'growing', 'harvested'], n, p=[0.4, 0.4, 0.2])]
+
+    def market_demand(self, n):
+        df = self.market
+        return ['vegetable_name', 'month', 'year', 'demand_volume', 'avg_price', 'festival_week', 'city'], \
+               [df[col].to_numpy() for col in ['vegetable_name', 'month', 'year', 'prev_demand_kg', 'prev_price_rs',
+                                               'festival_week', 'city']]
+
+    def crop_listings(self, n):
+        rng = self.rng('crop_listings')
+        crop, price, city = self.sample(rng, self.market, n, ['vegetable_name', 'prev_price_rs', 'city'])
+        return ['farmer_id', 'crop_name', 'quantity', 'price_per_unit', 'location', 'status', 'created_at'], \
+               [self.skewed_ids(rng, n, self.counts['farmers']), crop, np.round(rng.uniform(50, 2000, n), 1),
+                np.round(price.astype(float) * rng.uniform(0.9, 1.1, n), 2), city,
+                rng.choice(['available', 'sold'], n, p=[0.7, 0.3]), self.timestamps(rng, n)]
+
+    def demand_posts(self, n):
+        rng = self.rng('demand_posts')
+        crop, price, demand = self.sample(rng, self.market, n, ['vegetable_name', 'prev_price_rs', 'prev_demand_kg'])
+        return ['shop_id', 'vegetable_name', 'required_quantity', 'target_price', 'urgency', 'status', 'created_at'], \
+               [self.skewed_ids(rng, n, self.counts['shops']), crop, np.round(demand.astype(float), 1),
+                np.round(price.astype(float) * rng.uniform(0.85, 1.0, n), 2),
+                rng.choice(['Standard', 'Urgent'], n, p=[0.8, 0.2]),
+                rng.choice(['open', 'fulfilled'], n, p=[0.6, 0.4]), self.timestamps(rng, n)]
+
+    def ai_recommendations(self, n):
+        rng = self.rng('ai_recommendations')
+        (crop,) = self.sample(rng, self.crops, n, ['recommended_crop'])
+        return ['farmer_id', 'recommendation_type', 'crop_suggested', 'confidence_score', 'reasoning',
+                'action_taken', 'created_at'], \
+               [self.skewed_ids(rng, n, self.counts['farmers']), np.full(n, 'crop'), crop,
+                np.round(rng.uniform(0.55, 0.99, n), 3), np.char.add('Suited to your soil and season: ', crop.astype(str)),
+                rng.choice(np.array(['planted', 'ignored', None], dtype=object), n, p=[0.3, 0.3, 0.4]), self.timestamps(rng, n)]
+
+    def price_alerts(self, n):
+        rng = self.rng('price_alerts')
+        crop, current, predicted, severity = self.sample(
+            rng, self.crash, n, ['vegetable_name', 'current_price_rs', 'predicted_price', 'crash_severity'])
+        return ['farmer_id', 'crop_name', 'alert_type', 'current_price', 'predicted_crash_price', 'risk_level',
+                'created_at'], \
+               [self.skewed_ids(rng, n, self.counts['farmers']), crop, np.full(n, 'crash_risk'), current, predicted,
+                np.vectorize(CRASH_RISK_LEVELS.get)(severity), self.timestamps(rng, n)]
+
+    def spoilage_checks(self, n):
+        rng = self.rng('spoilage_checks')
+        crop, days_left, risk = self.sample(
+            rng, self.spoilage, n, ['vegetable_type', 'estimated_days_remaining', 'spoilage_risk_level'])
+        created = self.timestamps(rng, n)
+        harvest = np.datetime_as_string(created.astype('datetime64[D]') - rng.integers(0, 10, n).astype('timedelta64[D]'))
+        return ['farmer_id', 'crop_name', 'harvest_date', 'estimated_shelf_life_days', 'risk_level', 'created_at'], \
+               [self.skewed_ids(rng, n, self.counts['farmers']), crop, harvest,
+                np.round(days_left.astype(float)).astype(int), np.char.upper(risk.astype(str)), created]
+
+    def transactions(self, n):
+        rng = self.rng('transactions')
+        crop, price = self.sample(rng, self.market, n, ['vegetable_name', 'prev_price_rs'])
+        quantity = np.round(rng.uniform(50, 500, n), 2)
+        price = np.round(price.astype(float) * rng.uniform(0.9, 1.1, n), 2)
+        return ['seller_id', 'buyer_id', 'crop_name', 'quantity', 'price_per_unit', 'total_price', 'transaction_date'], \
+               [self.skewed_ids(rng, n, self.counts['farmers']), self.skewed_ids(rng, n, self.counts['shops']), crop,
+                quantity, price, np.round(quantity * price, 2), self.timestamps(rng, n)]
+
+    def notifications(self, n):
+        rng = self.rng('notifications')
+        types = np.array(list(NOTIFICATION_TYPES))
+        kind = rng.integers(0, len(types), n)
+        return ['user_id', 'title', 'message', 'notification_type', 'is_read', 'created_at'], \
+               [self.skewed_ids(rng, n, self.counts['users']),
+                np.array([title for title, _ in NOTIFICATION_TYPES.values()])[kind],
+                np.array([message for _, message in NOTIFICATION_TYPES.values()])[kind],
+                types[kind], rng.random(n) < 0.7, self.timestamps(rng, n)]
+
+    def activity_logs(self, n):
+        rng = self.rng('activity_logs')
+        return ['user_id', 'feature', 'action', 'created_at'], \
+               [self.skewed_ids(rng, n, self.counts['users']), rng.choice(FEATURES, n), rng.choice(ACTIONS, n),
+                self.timestamps(rng, n)]
+
+    def pilot_participants(self, n):
+        rng = self.rng('pilot_participants')
+        user_ids = rng.choice(self.counts['farmers'], n, replace=False) + 1
+        joined = self.timestamps(rng, n)
+        return ['user_id', 'name', 'location', 'crop_type', 'farm_size', 'phone_number', 'training_completed',
+                'joined_date', 'created_at'], \
+               [user_ids, np.char.add('Farmer ', user_ids.astype(str)), rng.choice(['Coimbatore', 'Salem'], n),
+                rng.choice(['tomato', 'onion', 'potato'], n), rng.choice(['Small', 'Medium', 'Large'], n),
+                (9000000000 + user_ids).astype(str), rng.random(n) < 0.6, joined, joined]
+
+    def pilot_feedback(self, n):
+        rng = self.rng('pilot_feedback')
+        return ['user_id', 'feedback_type', 'content', 'prediction_accurate', 'rating', 'created_at'], \
+               [rng.integers(1, self.counts['users'] + 1, n), rng.choice(['Survey', 'Bug', 'WhatsApp'], n),
+                np.full(n, 'Feedback from the pilot'), rng.random(n) < 0.8, rng.integers(1, 6, n),
+                self.timestamps(rng, n)]
+
+    def table(self, name):
+        generator = self.crops_table if name == 'crops' else getattr(self, name)
+        return generator(self.counts.get(name, 0))
+
+# Insert order: entities before the rows that reference them
+GENERATED_TABLES = ['users', 'notification_preferences', 'farmers', 'shops', 'crops', 'market_demand',
+                    'crop_listings', 'demand_posts', 'ai_recommendations', 'price_alerts', 'spoilage_checks',
+                    'transactions', 'notifications', 'activity_logs', 'pilot_participants', 'pilot_feedback']
+
+def _split_schema(schema):
+    """Separates CREATE INDEX statements so they can run after the bulk load"""
+    tables, indexes = [], []
+    # Drop comments first: they may contain semicolons
+    schema = '\n'.join(line.split('--', 1)[0] for line in schema.splitlines())
+    for statement in schema.split(';'):
+        body = statement.strip()
+        if body:
+            (indexes if body.upper().startswith('CREATE INDEX') else tables).append(body + ';')
+    return '\n'.join(tables), indexes
+
+def generate(db_path, rows, seed=42, days=365, end_date=None, batch_size=100000,
+             schema_path=os.path.join('database', 'schema.sql'), data_dir=os.path.dirname(os.path.abspath(__file__))):
+    """
+    Builds a fresh database of roughly `rows` rows across every table in schema.sql.
+    The same seed, rows and end_date always produce the same database.
+    Takes: target path (must not exist), total row count, seed, window length in days, last day
+    Returns: {table: rows inserted}
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(f"{db_path} already exists; generate only writes new databases")
+    end_date = end_date or date.today().isoformat()
+    data = SyntheticData(plan_counts(rows), seed, days, end_date, data_dir)
+
+    with open(schema_path, 'r') as f:
+        tables_sql, index_statements = _split_schema(f.read())
+
+    conn = sqlite3.connect(db_path)
+    # Bulk-load settings: a crash mid-build just means rerunning the build
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-256000')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.executescript(tables_sql)
+
+    inserted = {}
+    for table in GENERATED_TABLES:
+        started = time.perf_counter()
+        columns, values = data.table(table)
+        n = len(values[0])
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        for start in range(0, n, batch_size):
+            batch = [column[start:start + batch_size].tolist() for column in values]
+            conn.executemany(sql, zip(*batch))
+            conn.commit()
+        inserted[table] = n
+        print(f"{table}: {n} rows in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    for statement in index_statements:
+        conn.execute(statement)
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.commit()
+    conn.close()
+    print(f"indexes: {len(index_statements)} built in {time.perf_counter() - started:.1f}s")
+    return inserted
+
 if __name__ == "__main__":
-    init_db()
+    if len(sys.argv) > 1 and sys.argv[1] == 'generate':
+        parser = argparse.ArgumentParser(prog='init_db.py generate',
+                                         description='Build a synthetic database at production scale')
+        parser.add_argument('--db', default=os.path.join('database', 'harvestlink_synthetic.db'))
+        parser.add_argument('--rows', type=int, default=1000000, help='approximate total rows across all tables')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--days', type=int, default=365, help='length of the activity window')
+        parser.add_argument('--end-date', help='last day of the window (YYYY-MM-DD, default today)')
+        parser.add_argument('--batch-size', type=int, default=100000, help='rows per insert transaction')
+        parser.add_argument('--schema', default=os.path.join('database', 'schema.sql'))
+        args = parser.parse_args(sys.argv[2:])
+        started = time.perf_counter()
+        counts = generate(args.db, args.rows, args.seed, args.days, args.end_date, args.batch_size, args.schema)
+        print(f"Generated {sum(counts.values())} rows at {args.db} in {time.perf_counter() - started:.1f}s")
+    else:
+        init_db()
@@ -0,0 +1,387 @@
+import argparse
+import logging
+import sys
+import threading
+import time
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Location key of the series that sums every district/city of a crop
+ALL_LOCATIONS = '*'
+
+# Monthly demand records older than this many months are not used as features
+MAX_DEMAND_AGE_MONTHS = 12
+
+# Transactions after the watermark, per (crop, seller district, day), up to a fixed id
+DAILY_SQL = text("""
+    SELECT t.crop_name, f.district, date(t.transaction_date), COUNT(*),
+           SUM(COALESCE(t.quantity, 0)), SUM(COALESCE(t.price_per_unit, 0))
+    FROM transactions t LEFT JOIN farmers f ON f.id = t.seller_id
+    WHERE t.id > :low AND t.id <= :high AND t.transaction_date >= :since AND t.crop_name IS NOT NULL
+    GROUP BY 1, 2, 3
+""")
+MONTHLY_SQL = text("""
+    SELECT vegetable_name, city, year, month, SUM(demand_volume), AVG(avg_price)
+    FROM market_demand
+    WHERE vegetable_name IS NOT NULL AND year IS NOT NULL AND month BETWEEN 1 AND 12
+    GROUP BY 1, 2, 3, 4
+""")
+
+def _norm(value):
+    return (value or '').strip().lower()
+
+def _ordinal(day):
+    if day is None:
+        return date.today().toordinal()
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return day.toordinal()
+
+def _month(day):
+    day = date.fromordinal(_ordinal(day))
+    return day.year * 12 + day.month - 1
+
+class _Grid:
+    """
+    Dense columns: one row per (crop, location) series, one column per day since `origin`
+    (a date ordinal), plus a monthly demand grid on the same rows. Published grids are never
+    written to: writers change a copy and swap it in, so a reader sees whole catch-ups only.
+    """
+
+    def __init__(self, origin, days):
+        self.origin = origin
+        self.index = {}  # (crop, location) -> row
+        # [row, day, (trades, kg sold, sum of price_per_unit)]: prices are averaged per trade like the scanner's
+        self.daily = np.zeros((16, days, 3))
+        self.month_origin = 0
+        self.demand_volume = np.zeros((16, 0))
+        self.demand_price = np.zeros((16, 0))
+
+    def row(self, crop, location):
+        key = (crop, location)
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.index)
+            if row == len(self.daily):
+                self.daily, self.demand_volume, self.demand_price = [
+                    np.concatenate([values, np.zeros_like(values)])
+                    for values in (self.daily, self.demand_volume, self.demand_price)]
+            self.index[key] = row
+        return row
+
+    def copy(self, origin):
+        """A writable copy starting at `origin` (or the current origin, if later); earlier days are dropped"""
+        grid = _Grid.__new__(_Grid)
+        shift = max(origin - self.origin, 0)
+        grid.origin = self.origin + shift
+        grid.index = dict(self.index)
+        grid.daily = np.zeros_like(self.daily)
+        kept = self.daily[:, shift:]
+        grid.daily[:, :kept.shape[1]] = kept
+        # The demand grids are only replaced, never written to, after a load
+        grid.month_origin, grid.demand_volume, grid.demand_price = self.month_origin, self.demand_volume, self.demand_price
+        return grid
+
+    def ensure_day(self, column):
+        width = self.daily.shape[1]
+        if column >= width:
+            extra = max(column + 1 - width, width // 2)
+            self.daily = np.concatenate([self.daily, np.zeros((len(self.daily), extra, 3))], axis=1)
+
+class MarketSeries:
+    """
+    Daily market history per (crop, district/city): trades, kg sold and summed price from
+    `transactions` (located by the seller's district), plus the monthly `market_demand` records.
+    Every crop also has a state-wide series (location '*'). Windowed lookups are slices of
+    NumPy rows, so features are derived without touching the database.
+    """
+
+    def __init__(self, history_days=None):
+        self.history_days = history_days or Config.MARKET_SERIES_DAYS
+        self.last_id = 0
+        self.loaded_at = None
+        self.counters = {'catch_ups': 0, 'appended': 0, 'dropped': 0, 'errors': 0}
+        self._grid = _Grid(date.today().toordinal() - self.history_days + 1, self.history_days + 30)
+        self._lock = threading.Lock()  # one writer at a time; readers never wait
+
+    def load(self, connection, end=None):
+        """
+        Rebuilds the store from the last `history_days` days of transactions and all of
+        market_demand, then swaps it in. Takes: a connection. Returns: the stats dict
+        """
+        started = time.perf_counter()
+        grid = _Grid(_ordinal(end) - self.history_days + 1, self.history_days + 30)
+        high = connection.execute(text("SELECT MAX(id) FROM transactions")).scalar() or 0
+        rows = connection.execute(DAILY_SQL, {'low': 0, 'high': high,
+                                              'since': date.fromordinal(grid.origin).isoformat()}).fetchall()
+        self._add_rows(grid, rows)
+        try:
+            monthly = connection.execute(MONTHLY_SQL).fetchall()
+        except OperationalError as e:
+            # market_demand only exists where schema.sql was applied
+            logger.warning(f"market_demand not loaded: {e}")
+            monthly = []
+        self._add_months(grid, monthly)
+
+        with self._lock:
+            self._grid, self.last_id = grid, high
+            self.loaded_at = datetime.utcnow().isoformat()
+        logger.info(f"Market series loaded: {len(grid.index)} series, {len(rows)} daily rows, "
+                    f"{len(monthly)} monthly rows in {time.perf_counter() - started:.2f}s")
+        return self.stats()
+
+    def catch_up(self, connection, end=None):
+        """
+        Appends the transactions inserted since the last load/catch-up, on a copy of the store
+        that also drops the days older than `history_days` before `end` (default today), then
+        swaps it in. Takes: a connection. Returns: rows appended
+        """
+        with self._lock:
+            high = connection.execute(text("SELECT MAX(id) FROM transactions")).scalar() or 0
+            if high <= self.last_id:
+                return 0
+            grid = self._grid.copy(_ordinal(end) - self.history_days + 1)
+            rows = connection.execute(DAILY_SQL, {'low': self.last_id, 'high': high,
+                                                  'since': date.fromordinal(grid.origin).isoformat()}).fetchall()
+            self._add_rows(grid, rows)
+            self._grid, self.last_id = grid, high
+            self.counters['catch_ups'] += 1
+            return len(rows)
+
+    def append(self, crop, location, day, quantity, price, trades=1):
+        """Adds trades of one day to a series directly (e.g. from a feed that bypasses the transactions table)"""
+        with self._lock:
+            grid = self._grid.copy(self._grid.origin)
+            self._add_rows(grid, [(crop, location, day, trades, quantity, price * trades)])
+            self._grid = grid
+
+    def _add_rows(self, grid, rows):
+        """rows: (crop, location, 'YYYY-MM-DD', trades, quantity, price_sum), each also added state-wide"""
+        if not rows:
+            return
+        crops = [_norm(row[0]) for row in rows]
+        columns = np.array([_ordinal(row[2]) for row in rows]) - grid.origin
+        keep = columns >= 0
+        self.counters['dropped'] += int((~keep).sum())
+        grid.ensure_day(int(columns.max()))
+        local = np.array([grid.row(crop, _norm(row[1]) or ALL_LOCATIONS) for crop, row in zip(crops, rows)])
+        state = np.array([grid.row(crop, ALL_LOCATIONS) for crop in crops])
+        values = np.array([row[3:6] for row in rows], dtype=np.float64)
+        # Rows without a location already are the state-wide series; don't count them twice
+        for targets, mask in ((local, keep), (state, keep & (local != state))):
+            np.add.at(grid.daily, (targets[mask], columns[mask]), values[mask])
+        self.counters['appended'] += int(keep.sum())
+
+    def _add_months(self, grid, rows):
+        """rows: (crop, city, year, month, demand_volume, avg_price)"""
+        if not rows:
+            return
+        months = np.array([int(row[2]) * 12 + int(row[3]) - 1 for row in rows])
+        grid.month_origin = int(months.min())
+        width = int(months.max()) - grid.month_origin + 1
+        grid.demand_volume = np.zeros((len(grid.daily), width))
+        grid.demand_price = np.zeros((len(grid.daily), width))
+        for row, month in zip(rows, months - grid.month_origin):
+            target = grid.row(_norm(row[0]), _norm(row[1]) or ALL_LOCATIONS)
+            grid.demand_volume[target, month] = row[4] or 0
+            grid.demand_price[target, month] = row[5] or 0
+
+    def window(self, crop, location=None, days=7, end=None, offset=0):
+        """
+        Totals of the `days` days ending `offset` days before `end` (default today), inclusive.
+        Returns: {days, trades, quantity, avg_price (None without trades)}
+        """
+        grid = self._grid
+        row = grid.index.get((_norm(crop), _norm(location) or ALL_LOCATIONS))
+        stop = _ordinal(end) - offset - grid.origin + 1
+        start = max(stop - days, 0)
+        if row is None or stop <= start:
+            return {'days': days, 'trades': 0, 'quantity': 0.0, 'avg_price': None}
+        trades, quantity, price_sum = grid.daily[row, start:stop].sum(axis=0).tolist()
+        return {
+            'days': days,
+            'trades': int(trades),
+            'quantity': quantity,
+            'avg_price': price_sum / trades if trades else None
+        }
+
+    def rolling_average(self, crop, location=None, window=7, days=30, end=None):
+        """
+        Takes: the rolling window and the number of days to return, ending at `end` (default today)
+        Returns: {dates, avg_price, quantity}: per day, the trailing `window`-day average price per
+                 trade (None without trades) and the trailing average kg sold per day
+        """
+        grid = self._grid
+        row = grid.index.get((_norm(crop), _norm(location) or ALL_LOCATIONS))
+        last = _ordinal(end)
+        dates = [date.fromordinal(day).isoformat() for day in range(last - days + 1, last + 1)]
+        if row is None:
+            return {'dates': dates, 'avg_price': [None] * days, 'quantity': [0.0] * days}
+
+        # Pad the left edge (before origin) with zeros, then difference the cumulative sums
+        stop = last - grid.origin + 1
+        start = stop - days - window + 1
+        values = np.zeros((days + window - 1, 3))
+        lo, hi = max(start, 0), max(min(stop, grid.daily.shape[1]), 0)
+        if hi > lo:
+            values[lo - start:hi - start] = grid.daily[row, lo:hi]
+        cumulative = np.concatenate([np.zeros((1, 3)), np.cumsum(values, axis=0)])
+        trades, quantity, price_sum = (cumulative[window:] - cumulative[:-window]).T
+        prices = np.divide(price_sum, trades, out=np.full(days, np.nan), where=trades > 0.5)
+        return {
+            'dates': dates,
+            'avg_price': [None if np.isnan(price) else round(price, 2) for price in prices.tolist()],
+            'quantity': np.round(quantity / window, 2).tolist()
+        }
+
+    def last_month_demand(self, crop, location=None, end=None):
+        """Demand volume and price of the latest market_demand month before end's month, or None"""
+        grid = self._grid
+        row = grid.index.get((_norm(crop), _norm(location) or ALL_LOCATIONS))
+        if row is None or not grid.demand_volume.shape[1]:
+            return None
+        current = _month(end) - grid.month_origin
+        lo = max(current - MAX_DEMAND_AGE_MONTHS, 0)
+        recorded = np.flatnonzero(grid.demand_volume[row, lo:max(current, 0)])
+        if not len(recorded):
+            return None
+        month = lo + recorded[-1]
+        return {'demand_kg': float(grid.demand_volume[row, month]), 'avg_price': float(grid.demand_price[row, month]),
+                'month': f"{(grid.month_origin + month) // 12}-{(grid.month_origin + month) % 12 + 1:02d}"}
+
+    def features(self, crop, location=None, end=None):
+        """
+        ML inputs derivable from history for one crop and district/city: current_price and
+        prev_week_price (average price per trade over the last 7 days and the 7 before, falling
+        back to the state-wide series where the location had no trades) and prev_demand_kg
+        (latest market_demand month). Keys without history are left out so callers keep their defaults.
+        """
+        found = {}
+        for key, offset in (('current_price', 0), ('prev_week_price', 7)):
+            week = self.window(crop, location, 7, end, offset)
+            if week['avg_price'] is None and location:
+                week = self.window(crop, None, 7, end, offset)
+            if week['avg_price'] is not None:
+                found[key] = round(week['avg_price'], 2)
+        demand = self.last_month_demand(crop, location, end)
+        if demand is not None:
+            found['prev_demand_kg'] = demand['demand_kg']
+        return found
+
+    def stats(self):
+        grid = self._grid
+        return {
+            'series': len(grid.index),
+            'first_day': date.fromordinal(grid.origin).isoformat(),
+            'history_days': self.history_days,
+            'last_transaction_id': self.last_id,
+            'loaded_at': self.loaded_at,
+            'memory_kb': round(sum(values.nbytes for values in (grid.daily, grid.demand_volume, grid.demand_price)) / 1024, 1),
+            **self.counters
+        }
+
+market_series = MarketSeries()
+
+def install_market_series_maintenance(session_class=None, series=None):
+    """
+    Appends Transactions committed through the ORM to the store. Bulk loads that bypass
+    the ORM are picked up by the next commit's catch-up, which reads past the same id watermark.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from backend.models import Transaction
+    session_class = session_class or Session
+    series = series or market_series
+
+    @event.listens_for(session_class, 'after_flush')
+    def _after_flush(session, flush_context):
+        if any(isinstance(obj, Transaction) for obj in session.new):
+            session.info['market_series_pending'] = True
+
+    @event.listens_for(session_class, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop('market_series_pending', False):
+            try:
+                with session.get_bind().connect() as connection:
+                    series.catch_up(connection)
+            except Exception as e:
+                series.counters['errors'] += 1
+                logger.error(f"Market series catch-up failed: {e}")
+
+    @event.listens_for(session_class, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('market_series_pending', None)
+
+def benchmark(db_path, lookups=100000):
+    """Load time, memory and per-lookup latency of the store against one SQL query per lookup"""
+    import random
+    from sqlalchemy import create_engine
+    engine = create_engine(f"sqlite:///{db_path}")
+    series = MarketSeries()
+    with engine.connect() as connection:
+        stats = series.load(connection)
+        keys = connection.execute(text("""
+            SELECT DISTINCT t.crop_name, f.district FROM transactions t JOIN farmers f ON f.id = t.seller_id
+        """)).fetchall()
+        rng = random.Random(0)
+        picks = [rng.choice(keys) for _ in range(lookups)]
+
+        started = time.perf_counter()
+        for crop, district in picks:
+            series.features(crop, district)
+        store_us = (time.perf_counter() - started) / lookups * 1e6
+
+        started = time.perf_counter()
+        for crop, district in picks:
+            series.window(crop, district, 7)
+        window_us = (time.perf_counter() - started) / lookups * 1e6
+
+        week = date.fromordinal(date.today().toordinal() - 6).isoformat()
+        sql = text("""
+            SELECT COUNT(*), SUM(t.quantity), AVG(t.price_per_unit) FROM transactions t JOIN farmers f ON f.id = t.seller_id
+            WHERE t.crop_name = :crop AND f.district = :district AND t.transaction_date >= :week
+        """)
+        sql_lookups = min(lookups, 200)
+        started = time.perf_counter()
+        for crop, district in picks[:sql_lookups]:
+            connection.execute(sql, {'crop': crop, 'district': district, 'week': week}).fetchone()
+        sql_us = (time.perf_counter() - started) / sql_lookups * 1e6
+
+        # The store must agree with SQL over the same window
+        mismatches = 0
+        for crop, district in picks[:sql_lookups]:
+            count, quantity, price = connection.execute(sql, {'crop': crop, 'district': district, 'week': week}).fetchone()
+            got = series.window(crop, district, 7)
+            if got['trades'] != count or abs(got['quantity'] - (quantity or 0)) > 1e-6 * max(1.0, quantity or 0) \
+                    or (price is not None and abs(got['avg_price'] - price) > 1e-6 * price):
+                mismatches += 1
+    return {**stats, 'features_us': round(store_us, 2), 'window_us': round(window_us, 2),
+            'sql_window_us': round(sql_us, 1), 'sql_mismatches': mismatches}
+
+if __name__ == '__main__':
+    # Usage: python -m backend.market_series benchmark [db path] [--lookups 100000]
+    #        python -m backend.market_series show <crop> [district] [db path]
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Load and query the in-memory market time series')
+    parser.add_argument('command', choices=['benchmark', 'show'])
+    parser.add_argument('args', nargs='*')
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        print(benchmark(args.args[0] if args.args else Config.DB_PATH, args.lookups))
+        sys.exit(0)
+
+    from sqlalchemy import create_engine
+    crop, location = args.args[0], args.args[1] if len(args.args) > 1 else None
+    with create_engine(f"sqlite:///{args.args[2] if len(args.args) > 2 else Config.DB_PATH}").connect() as connection:
+        market_series.load(connection)
+    print({'last_7_days': market_series.window(crop, location, 7),
+           'previous_7_days': market_series.window(crop, location, 7, offset=7),
+           'features': market_series.features(crop, location),
+           'rolling_7_day': market_series.rolling_average(crop, location, 7, 14)})
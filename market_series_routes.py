@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify, request
+from backend.config import Config
+from backend.market_series import market_series
+
+market_series_bp = Blueprint('market_series', __name__)
+
+@market_series_bp.route('/market/<crop>', methods=['GET'])
+def market_history(crop):
+    """?location=<district or city>&window=7&days=30: window totals, rolling averages and ML features"""
+    if not Config.MARKET_SERIES_ENABLED:
+        return jsonify({"success": False, "error": "Market series is disabled"}), 503
+    location = request.args.get('location') or None
+    window = request.args.get('window', 7, type=int)
+    days = request.args.get('days', 30, type=int)
+    limit = market_series.history_days
+    if not window or not days or not 1 <= window <= limit or not 1 <= days <= limit:
+        return jsonify({"success": False, "error": f"window and days must be between 1 and {limit}"}), 400
+    return jsonify({
+        "success": True,
+        "crop": crop,
+        "location": location,
+        "current": market_series.window(crop, location, window),
+        "previous": market_series.window(crop, location, window, offset=window),
+        "rolling": market_series.rolling_average(crop, location, window, days),
+        "features": market_series.features(crop, location)
+    })
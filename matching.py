@@ -0,0 +1,328 @@
+import bisect
+import logging
+import random
+import sys
+import threading
+import time
+from sqlalchemy import text
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Posts with an earlier urgency are offered first; unknown urgencies come last
+URGENCY_ORDER = ['Urgent', 'Standard']
+
+def _norm(value):
+    return (value or '').strip().lower()
+
+class _PriceBands:
+    """
+    Entries of one (crop, location[, urgency]) key bucketed into fixed-width price bands.
+    Queries walk the sorted band numbers and stop as soon as the remaining bands
+    cannot beat what has already been collected.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.bands = {}  # band -> {item_id: (price, entry)}
+        self.order = []  # sorted non-empty band numbers
+
+    def add(self, item_id, price, entry):
+        band = int(price // self.width)
+        bucket = self.bands.get(band)
+        if bucket is None:
+            bucket = self.bands[band] = {}
+            bisect.insort(self.order, band)
+        bucket[item_id] = (price, entry)
+        return band
+
+    def remove(self, item_id, band):
+        bucket = self.bands.get(band)
+        if bucket is None:
+            return
+        bucket.pop(item_id, None)
+        if not bucket:
+            del self.bands[band]
+            del self.order[bisect.bisect_left(self.order, band)]
+
+    def cheapest(self, max_price, limit):
+        """Up to `limit` entries priced at most max_price, cheapest first"""
+        found = []
+        for band in self.order:
+            if band * self.width > max_price or len(found) >= limit:
+                break
+            found.extend(item for item in self.bands[band].values() if item[0] <= max_price)
+        found.sort(key=lambda item: item[0])
+        return found[:limit]
+
+    def highest(self, min_price, limit):
+        """Up to `limit` entries priced at least min_price, highest first"""
+        found = []
+        for band in reversed(self.order):
+            if (band + 1) * self.width <= min_price or len(found) >= limit:
+                break
+            found.extend(item for item in self.bands[band].values() if item[0] >= min_price)
+        found.sort(key=lambda item: -item[0])
+        return found[:limit]
+
+class MatchingIndex:
+    """
+    In-memory index of open crop listings and demand posts, keyed by crop, location
+    and price band. All updates are incremental; load() rebuilds it from the database.
+    - listings_for_post: cheapest listings of the crop priced within the post's target
+      (plus MATCH_PRICE_TOLERANCE), same location first.
+    - posts_for_listing: shops paying at least the listing price, same location first,
+      urgent posts before standard ones, best price first.
+    """
+
+    def __init__(self, band_width=None, price_tolerance=None):
+        self.band_width = band_width or Config.MATCH_PRICE_BAND
+        self.price_tolerance = Config.MATCH_PRICE_TOLERANCE if price_tolerance is None else price_tolerance
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._listings = {}           # (crop, location) -> _PriceBands
+        self._posts = {}              # (crop, location, urgency) -> _PriceBands
+        self._listing_keys = {}       # listing id -> ((crop, location), band)
+        self._post_keys = {}          # post id -> ((crop, location, urgency), band)
+        self._listing_locations = {}  # crop -> {location}
+        self._post_locations = {}     # crop -> {location}
+        self._urgencies = list(URGENCY_ORDER)
+        self.shop_locations = {}      # shop id -> location, for posts (which have no location column)
+
+    # Updates
+
+    def add_listing(self, listing_id, farmer_id, crop_name, location, quantity, price_per_unit):
+        """Adds or replaces an open listing"""
+        with self._lock:
+            self.remove_listing(listing_id)
+            key = (_norm(crop_name), _norm(location))
+            book = self._listings.get(key)
+            if book is None:
+                book = self._listings[key] = _PriceBands(self.band_width)
+                self._listing_locations.setdefault(key[0], set()).add(key[1])
+            entry = (listing_id, farmer_id, crop_name, location, quantity, price_per_unit)
+            self._listing_keys[listing_id] = (key, book.add(listing_id, float(price_per_unit), entry))
+
+    def remove_listing(self, listing_id):
+        with self._lock:
+            found = self._listing_keys.pop(listing_id, None)
+            if found is not None:
+                key, band = found
+                self._listings[key].remove(listing_id, band)
+
+    def add_post(self, post_id, shop_id, vegetable_name, location, required_quantity, target_price, urgency):
+        """Adds or replaces an open demand post; location defaults to the shop's location"""
+        with self._lock:
+            self.remove_post(post_id)
+            if target_price is None:
+                return  # nothing to match a price against
+            location = location if location is not None else self.shop_locations.get(shop_id)
+            key = (_norm(vegetable_name), _norm(location), urgency or 'Standard')
+            if key[2] not in self._urgencies:
+                self._urgencies.append(key[2])
+            book = self._posts.get(key)
+            if book is None:
+                book = self._posts[key] = _PriceBands(self.band_width)
+                self._post_locations.setdefault(key[0], set()).add(key[1])
+            entry = (post_id, shop_id, vegetable_name, location, required_quantity, target_price, key[2])
+            self._post_keys[post_id] = (key, book.add(post_id, float(target_price), entry))
+
+    def set_shop_location(self, shop_id, location):
+        with self._lock:
+            self.shop_locations[shop_id] = location
+
+    def remove_post(self, post_id):
+        with self._lock:
+            found = self._post_keys.pop(post_id, None)
+            if found is not None:
+                key, band = found
+                self._posts[key].remove(post_id, band)
+
+    # Queries
+
+    def listings_for_post(self, vegetable_name, location, target_price, limit=10):
+        crop, location = _norm(vegetable_name), _norm(location)
+        max_price = float(target_price) * (1 + self.price_tolerance)
+        with self._lock:
+            matches = [(True, item) for item in self._book_items(self._listings.get((crop, location)),
+                                                                   'cheapest', max_price, limit)]
+            if len(matches) < limit:
+                others = []
+                for other in self._listing_locations.get(crop, ()):
+                    if other != location:
+                        others.extend(self._book_items(self._listings.get((crop, other)), 'cheapest', max_price,
+                                                       limit - len(matches)))
+                others.sort(key=lambda item: item[0])
+                matches.extend((False, item) for item in others[:limit - len(matches)])
+        return [self._listing_dict(entry, same, target_price) for same, (_, entry) in matches]
+
+    def posts_for_listing(self, crop_name, location, price_per_unit, limit=10):
+        crop, location = _norm(crop_name), _norm(location)
+        min_price = float(price_per_unit)
+        with self._lock:
+            matches = []
+            for same in (True, False):
+                locations = [location] if same else [l for l in self._post_locations.get(crop, ()) if l != location]
+                for urgency in self._urgencies:
+                    if len(matches) >= limit:
+                        break
+                    found = []
+                    for loc in locations:
+                        found.extend(self._book_items(self._posts.get((crop, loc, urgency)), 'highest', min_price,
+                                                      limit - len(matches)))
+                    found.sort(key=lambda item: -item[0])
+                    matches.extend((same, item) for item in found[:limit - len(matches)])
+        return [self._post_dict(entry, same, price_per_unit) for same, (_, entry) in matches]
+
+    def _book_items(self, book, method, price, limit):
+        if book is None or limit <= 0:
+            return []
+        return getattr(book, method)(price, limit)
+
+    def _listing_dict(self, entry, same_location, target_price):
+        listing_id, farmer_id, crop_name, location, quantity, price = entry
+        return {
+            'listing_id': listing_id,
+            'farmer_id': farmer_id,
+            'crop_name': crop_name,
+            'location': location,
+            'quantity': quantity,
+            'price_per_unit': price,
+            'location_match': same_location,
+            'price_gap': round(float(target_price) - float(price), 2)
+        }
+
+    def _post_dict(self, entry, same_location, listing_price):
+        post_id, shop_id, vegetable_name, location, quantity, target_price, urgency = entry
+        return {
+            'post_id': post_id,
+            'shop_id': shop_id,
+            'vegetable_name': vegetable_name,
+            'location': location,
+            'required_quantity': quantity,
+            'target_price': target_price,
+            'urgency': urgency,
+            'location_match': same_location,
+            'price_gap': round(float(target_price) - float(listing_price), 2)
+        }
+
+    # Rebuild
+
+    def load(self, connection):
+        """
+        Rebuilds the index from open listings and posts. The new index is built
+        aside and swapped in, so queries keep answering during the rebuild.
+        Returns: {'listings': n, 'posts': n, 'seconds': s}
+        """
+        started = time.perf_counter()
+        fresh = MatchingIndex(self.band_width, self.price_tolerance)
+        fresh.shop_locations = dict(connection.execute(text("SELECT id, location FROM shops")).fetchall())
+        for row in connection.execute(text(
+                "SELECT id, farmer_id, crop_name, location, quantity, price_per_unit FROM crop_listings "
+                "WHERE status = 'available'")):
+            fresh.add_listing(*row)
+        for row in connection.execute(text(
+                "SELECT id, shop_id, vegetable_name, NULL, required_quantity, target_price, urgency FROM demand_posts "
+                "WHERE status = 'open'")):
+            fresh.add_post(*row)
+        with self._lock:
+            for name in ('_listings', '_posts', '_listing_keys', '_post_keys', '_listing_locations',
+                         '_post_locations', '_urgencies', 'shop_locations'):
+                setattr(self, name, getattr(fresh, name))
+        stats = self.stats()
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        logger.info(f"Matching index loaded: {stats}")
+        return stats
+
+    def stats(self):
+        with self._lock:
+            return {'listings': len(self._listing_keys), 'posts': len(self._post_keys)}
+
+matching_index = MatchingIndex()
+
+def install_matching_maintenance(session_class=None, index=None):
+    """
+    Mirrors ORM writes to CropListing and DemandPost into the index once the
+    session commits: available listings and open posts are (re)indexed, anything
+    else is removed. Rolled-back changes never reach the index. A post from a shop
+    the index hasn't seen (created after load) has its shop's location read in the flush.
+    Column values are captured in the flush, so the commit never touches the expired objects.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from backend.models import CropListing, DemandPost
+    session_class = session_class or Session
+    index = index or matching_index
+
+    @event.listens_for(session_class, 'after_flush')
+    def _after_flush(session, flush_context):
+        pending = session.info.setdefault('matching_pending', {})
+        shops = session.info.setdefault('matching_shops', {})
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, CropListing):
+                pending[(CropListing, obj.id)] = (obj.id, obj.farmer_id, obj.crop_name, obj.location, obj.quantity,
+                                                  obj.price_per_unit) if obj.status == 'available' else None
+            elif isinstance(obj, DemandPost):
+                pending[(DemandPost, obj.id)] = (obj.id, obj.shop_id, obj.vegetable_name, None, obj.required_quantity,
+                                                 obj.target_price, obj.urgency) if obj.status == 'open' else None
+            if isinstance(obj, DemandPost) and obj.shop_id not in index.shop_locations and obj.shop_id not in shops:
+                shops[obj.shop_id] = session.connection().execute(
+                    text("SELECT location FROM shops WHERE id = :id"), {'id': obj.shop_id}).scalar()
+        for obj in session.deleted:
+            if isinstance(obj, (CropListing, DemandPost)):
+                pending[(type(obj), obj.id)] = None
+
+    @event.listens_for(session_class, 'after_commit')
+    def _after_commit(session):
+        for shop_id, location in session.info.pop('matching_shops', {}).items():
+            index.set_shop_location(shop_id, location)
+        for (model, item_id), row in session.info.pop('matching_pending', {}).items():
+            if model is CropListing:
+                if row is not None:
+                    index.add_listing(*row)
+                else:
+                    index.remove_listing(item_id)
+            else:
+                if row is not None:
+                    index.add_post(*row)
+                else:
+                    index.remove_post(item_id)
+
+    @event.listens_for(session_class, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('matching_pending', None)
+        session.info.pop('matching_shops', None)
+
+def benchmark(entries=100000, queries=10000, seed=42):
+    """Fills an index with `entries` listings and posts and times both queries"""
+    rng = random.Random(seed)
+    crops = ['Tomato', 'Onion', 'Potato', 'Carrot', 'Beans', 'Cabbage', 'Brinjal', 'Ladies Finger']
+    cities = ['Chennai', 'Coimbatore', 'Madurai', 'Salem', 'Trichy', 'Vellore', 'Erode', 'Tirunelveli']
+    index = MatchingIndex()
+
+    started = time.perf_counter()
+    for i in range(entries):
+        index.add_listing(i, rng.randint(1, 5000), rng.choice(crops), rng.choice(cities),
+                          rng.uniform(50, 2000), rng.uniform(18, 110))
+        index.add_post(i, rng.randint(1, 2000), rng.choice(crops), rng.choice(cities),
+                       rng.uniform(100, 1500), rng.uniform(18, 110), rng.choice(URGENCY_ORDER))
+    build_seconds = time.perf_counter() - started
+
+    results = {'entries': entries, 'build_seconds': round(build_seconds, 2),
+               'update_us': round(build_seconds / (2 * entries) * 1e6, 2)}
+    for name, query in (('listings_for_post', index.listings_for_post), ('posts_for_listing', index.posts_for_listing)):
+        samples = []
+        for _ in range(queries):
+            args = (rng.choice(crops), rng.choice(cities), rng.uniform(18, 110))
+            t = time.perf_counter()
+            query(*args)
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        results[name] = {'p50_ms': round(samples[len(samples) // 2], 4), 'p99_ms': round(samples[int(len(samples) * 0.99)], 4)}
+    return results
+
+if __name__ == '__main__':
+    # Usage: python -m backend.matching [entries]
+    print(benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,57 @@
+from flask import Blueprint, jsonify, request
+from sqlalchemy import text
+from backend import db
+from backend.config import Config
+from backend.models import CropListing, DemandPost
+from backend.matching import matching_index
+
+matching_bp = Blueprint('matching', __name__)
+
+MAX_MATCHES = 100
+
+def _limit():
+    return max(1, min(request.args.get('limit', 10, type=int) or 10, MAX_MATCHES))
+
+@matching_bp.before_request
+def require_index():
+    # Without the commit hooks the index would be empty or stale, so don't serve from it
+    if not Config.MATCHING_INDEX_ENABLED:
+        return jsonify({"success": False, "error": "Matching index is disabled"}), 503
+
+@matching_bp.route('/matches/post/<int:post_id>', methods=['GET'])
+def listings_for_post(post_id):
+    """Best open listings for a shop's demand post"""
+    post = db.session.get(DemandPost, post_id)
+    if post is None:
+        return jsonify({"success": False, "error": "Demand post not found"}), 404
+    if post.target_price is None:
+        return jsonify({"success": False, "error": "Demand post has no target price"}), 400
+    location = matching_index.shop_locations.get(post.shop_id)
+    if location is None:
+        location = db.session.execute(text("SELECT location FROM shops WHERE id = :id"), {'id': post.shop_id}).scalar()
+    return jsonify({
+        "success": True,
+        "post": post.to_dict(),
+        "matches": matching_index.listings_for_post(post.vegetable_name, location, post.target_price, _limit())
+    })
+
+@matching_bp.route('/matches/listing/<int:listing_id>', methods=['GET'])
+def posts_for_listing(listing_id):
+    """Best open demand posts (shops) for a farmer's listing"""
+    listing = db.session.get(CropListing, listing_id)
+    if listing is None:
+        return jsonify({"success": False, "error": "Listing not found"}), 404
+    return jsonify({
+        "success": True,
+        "listing": listing.to_dict(),
+        "matches": matching_index.posts_for_listing(listing.crop_name, listing.location, listing.price_per_unit,
+                                                    _limit())
+    })
+
+@matching_bp.route('/matches/stats', methods=['GET'])
+def matching_stats():
+    return jsonify(matching_index.stats())
+
+@matching_bp.route('/matches/rebuild', methods=['POST'])
+def rebuild_matching_index():
+    return jsonify(matching_index.load(db.session.connection()))
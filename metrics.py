@@ -0,0 +1,131 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond lookups up to slow forecasts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three additions under a lock"""
+
+    def __init__(self):
+        self.buckets = DEFAULT_BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+class MetricsRegistry:
+    """
+    In-process registry of labelled histograms, rendered in the Prometheus text format.
+    Nothing is logged per observation.
+    """
+
+    def __init__(self):
+        self._histograms = {}  # (name, ((label, value), ...)) -> Histogram
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        """Picklable copy of every histogram, for merging across processes"""
+        with self._lock:
+            items = list(self._histograms.items())
+        return {key: histogram.snapshot() for key, histogram in items}
+
+    def render(self, extra_snapshots=()):
+        """Prometheus text exposition of this registry plus snapshots from other processes"""
+        merged = self.snapshot()
+        for snapshot in extra_snapshots:
+            for key, (counts, total, count) in snapshot.items():
+                if key in merged:
+                    base_counts, base_total, base_count = merged[key]
+                    merged[key] = ([a + b for a, b in zip(base_counts, counts)], base_total + total, base_count + count)
+                else:
+                    merged[key] = (counts, total, count)
+
+        lines = []
+        for name in sorted({name for name, _ in merged}):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (counts, total, count) in sorted(merged.items()):
+                if metric != name:
+                    continue
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                prefix = f"{label_text}," if label_text else ''
+                cumulative = 0
+                for bound, bucket_count in zip(DEFAULT_BUCKETS + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                suffix = f"{{{label_text}}}" if label_text else ''
+                lines.append(f"{name}_sum{suffix} {total}")
+                lines.append(f"{name}_count{suffix} {count}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('ml_stage_seconds', 'Time spent in each stage of a prediction call')
+metrics.describe('ml_predict_seconds', 'Time spent in each sub-model predict call')
+metrics.describe('http_request_seconds', 'Flask request latency including JSON serialization')
+metrics.describe('db_query_seconds', 'SQLAlchemy statement execution time')
+
+_TABLE_PATTERN = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+"?(\w+)', re.IGNORECASE)
+
+def install_sqlalchemy_metrics(engine):
+    """
+    Times every statement executed on one engine (the app's db.engine), labelled by operation
+    and table. Takes: the engine, so engines created by scripts and tests are not timed.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        match = _TABLE_PATTERN.search(statement)
+        metrics.observe('db_query_seconds', elapsed,
+                        operation=statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN',
+                        table=match.group(1) if match else 'unknown')
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(context):
+        # Failed statements never reach after_cursor_execute
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
@@ -1,288 +1,1013 @@
 import joblib
+import hashlib
 import pandas as pd
 import numpy as np
 import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from backend.services.weather_service import weather_service
+from backend.config import Config
+from backend.weather_cache import weather_cache
+from backend.encoding import compile_encoders
+from backend.prediction_cache import PredictionCache
+from backend.forest_engine import compile_model, unnamed_features
+from backend.metrics import metrics
+from backend.model_reload import newest_bundle
+from backend.crop_ranking import crop_ranker, DEFAULT_TOP_K
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_FORECAST_HORIZON_DAYS = 30
+MAX_FORECAST_HORIZON_DAYS = 365
+MAX_FORECAST_SERIES = 50
+
+# Route planning: share of a lot assumed lost by arrival at each predicted spoilage risk level
+SPOILAGE_LOSS_RATES = {'Low': 0.02, 'Medium': 0.10, 'High': 0.35}
+DEFAULT_PLAN_TRANSPORT_HOURS = [12]
+MAX_PLAN_TRANSPORT_HOURS = 168
+SPOILAGE_CATEGORICALS = ['vegetable_type', 'storage_type', 'packaging_type', 'season', 'district']
+
+# Model name -> (model pickle, encoders pickle)
+MODEL_FILES = {
+    'crop': ('crop_model.pkl', 'crop_encoders.pkl'),                  # Model 1: Crop Recommender
+    'demand': ('demand_model.pkl', 'demand_encoders.pkl'),            # Model 2: Demand Forecaster
+    'price_crash': ('price_crash_model.pkl', 'crash_encoders.pkl'),   # Model 3: Price Crash Detector
+    'spoilage': ('spoilage_model.pkl', 'spoilage_encoders.pkl')       # Model 4: Spoilage Predictor
+}
+
+# Unseen values in these columns fall back to a known category instead of failing the request
+UNKNOWN_CATEGORY_FALLBACKS = {
+    'district': 'Salem',
+    'city': 'Chennai',
+    'previous_crop': 'Rice'
+}
+
+# Replaced states kept in memory for rollback()
+MAX_ROLLBACK_DEPTH = 3
+
+def _to_float_column(values):
+    """Converts one feature column to float64, with NaN for values that are not numeric"""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                column[i] = np.nan
+        return column
+
+def _timed_predict(model, sub_model, predict, X):
+    """Calls one sub-model and records its latency"""
+    started = time.perf_counter()
+    with unnamed_features():
+        result = predict(X)
+    metrics.observe('ml_predict_seconds', time.perf_counter() - started, model=model, sub_model=sub_model)
+    return result
+
+def _request_weather(farm_data, error):
+    """The request's own weather values, used when the provider is unavailable"""
+    return {
+        'temp': farm_data.get('temperature_avg', 28),
+        'humidity': farm_data.get('humidity', 60),
+        'rainfall': farm_data.get('rainfall_mm', 1000),
+        'source': 'request',
+        'error': str(error)
+    }
+
+class ModelState:
+    """
+    One loaded model and everything derived from it, replaced as a whole on reload.
+    Each request reads a model's state once, so a swap never mixes old encoders with a new model.
+    """
+    __slots__ = ('name', 'model', 'encoders', 'tables', 'compiled', 'version')
+
+    def __init__(self, name, model, encoders, tables, compiled, version):
+        self.name = name
+        self.model = model
+        self.encoders = encoders
+        self.tables = tables
+        self.compiled = compiled
+        self.version = version
+
+    @property
+    def scorer(self):
+        """The compiled flat engine when enabled, otherwise the sklearn model"""
+        return self.compiled or self.model
+
 class MLService:
-    def __init__(self):
-        self.models = {}
-        self.encoders = {}
-        self.load_all_models()
-
-    def load_all_models(self):
-        """Loads all 4 models and their encoders on startup"""
-        models_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
-        
+    def __init__(self, load_mode=None, mmap_mode=None, inference_backend=None):
+        """
+        load_mode: 'eager' loads every model before returning (the default),
+                   'background' loads them in parallel on a background thread,
+                   'lazy' loads each model on its first prediction.
+        mmap_mode: passed to joblib.load (e.g. 'r') so forked workers share the model arrays.
+        inference_backend: 'sklearn' (the default) or 'flat' to score with compiled FlatForest arrays.
+        """
+        self.states = {}
+        self.inference_backend = inference_backend or Config.ML_INFERENCE_BACKEND
+        self.prediction_cache = PredictionCache(Config.PREDICTION_CACHE_MAX_ENTRIES)
+        self.load_mode = load_mode or Config.ML_LOAD_MODE
+        self.mmap_mode = mmap_mode or Config.ML_MMAP_MODE
+        self.models_root = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
+        # The newest valid versioned bundle (python -m backend.train_models) wins over the flat files
+        self.bundle = newest_bundle(self.models_root)
+        self.models_dir = os.path.join(self.models_root, self.bundle) if self.bundle else self.models_root
+        self.model_status = {name: {'state': 'pending'} for name in MODEL_FILES}
+        self._load_locks = {name: threading.Lock() for name in MODEL_FILES}
+        self._swap_lock = threading.Lock()
+        self._previous = []  # [(states, bundle, models_dir)] restorable by rollback()
+        self.market_series = None  # MarketSeries filling market inputs a request leaves out (set by the app)
+        self.crop_ranker = crop_ranker  # candidate sets, yield and margin tables for crop recommendations
+
+        if self.load_mode == 'eager':
+            self.load_all_models()
+        elif self.load_mode == 'background':
+            threading.Thread(target=self._load_in_background, daemon=True).start()
+        elif self.load_mode != 'lazy':
+            raise ValueError(f"Unknown ML load mode: {self.load_mode}")
+
+    def load_model(self, name):
+        """Loads one model and its encoders. Concurrent callers for the same model share one load."""
+        with self._load_locks[name]:
+            if self.model_status[name]['state'] == 'ready':
+                return
+
+            self.model_status[name] = {'state': 'loading'}
+            started = time.perf_counter()
+            directory = self.models_dir
+            try:
+                state = self._read_state(name, directory)
+            except Exception as e:
+                self.model_status[name] = {'state': 'error', 'error': str(e)}
+                logger.error(f"Error loading {name} model: {e}")
+                raise
+
+            with self._swap_lock:
+                # A bundle swapped in while this model was loading already carries its own state
+                if self.models_dir == directory or name not in self.states:
+                    self.states = {**self.states, name: state}
+            self.prediction_cache.invalidate(name)
+            self.model_status[name] = {'state': 'ready', 'version': state.version, 'bundle': self.bundle,
+                                       'load_seconds': round(time.perf_counter() - started, 3)}
+
+    def _read_state(self, name, directory):
+        model_file, encoders_file = MODEL_FILES[name]
+        version = self._file_version(directory, model_file, encoders_file)
+        model = joblib.load(os.path.join(directory, model_file), mmap_mode=self.mmap_mode)
+        encoders = joblib.load(os.path.join(directory, encoders_file))
+        compiled = compile_model(model, max_rows=Config.ML_FLAT_MAX_ROWS) if self.inference_backend == 'flat' else None
+        # Compile encoders into plain lookup tables once, instead of LabelEncoder calls per request
+        return ModelState(name, model, encoders, compile_encoders(encoders, UNKNOWN_CATEGORY_FALLBACKS), compiled,
+                          version)
+
+    def _file_version(self, directory, *filenames):
+        """Short hash identifying the exact model files on disk (name, size and mtime)"""
+        digest = hashlib.sha1()
+        for filename in filenames:
+            stat = os.stat(os.path.join(directory, filename))
+            digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()[:12]
+
+    def load_all_models(self, parallel=False):
+        """Loads all 4 models and their encoders, optionally in parallel threads"""
         try:
-            # Model 1: Crop Recommender
-            self.models['crop'] = joblib.load(os.path.join(models_dir, 'crop_model.pkl'))
-            self.encoders['crop'] = joblib.load(os.path.join(models_dir, 'crop_encoders.pkl'))
-            
-            # Model 2: Demand Forecaster
-            self.models['demand'] = joblib.load(os.path.join(models_dir, 'demand_model.pkl'))
-            self.encoders['demand'] = joblib.load(os.path.join(models_dir, 'demand_encoders.pkl'))
-            
-            # Model 3: Price Crash Detector
-            self.models['price_crash'] = joblib.load(os.path.join(models_dir, 'price_crash_model.pkl'))
-            self.encoders['price_crash'] = joblib.load(os.path.join(models_dir, 'crash_encoders.pkl'))
-            
-            # Model 4: Spoilage Predictor
-            self.models['spoilage'] = joblib.load(os.path.join(models_dir, 'spoilage_model.pkl'))
-            self.encoders['spoilage'] = joblib.load(os.path.join(models_dir, 'spoilage_encoders.pkl'))
-            
+            if parallel:
+                with ThreadPoolExecutor(max_workers=len(MODEL_FILES)) as pool:
+                    list(pool.map(self.load_model, MODEL_FILES))
+            else:
+                for name in MODEL_FILES:
+                    self.load_model(name)
+
             logger.info("✓ All ML models and encoders loaded successfully")
         except Exception as e:
             logger.error(f"Error loading models: {e}")
             raise e
 
+    def _load_in_background(self):
+        try:
+            self.load_all_models(parallel=True)
+        except Exception:
+            # Failures are recorded in model_status; requests retry the load on first use
+            pass
+
+    def _state(self, name):
+        """The model's current state, loading it first if needed. Requests use only this snapshot."""
+        state = self.states.get(name)
+        if state is None:
+            self.load_model(name)
+            state = self.states[name]
+        return state
+
+    # Read-only views over the current states
+    @property
+    def models(self):
+        return {name: state.model for name, state in self.states.items()}
+
+    @property
+    def encoders(self):
+        return {name: state.encoders for name, state in self.states.items()}
+
+    @property
+    def tables(self):
+        return {name: state.tables for name, state in self.states.items()}
+
+    @property
+    def model_versions(self):
+        return {name: state.version for name, state in self.states.items()}
+
+    # Hot reload (driven by backend.model_reload.ModelReloader)
+
+    def load_bundle(self, directory):
+        """Reads every model of a bundle into new states, without touching the serving ones"""
+        return {name: self._read_state(name, directory) for name in MODEL_FILES}
+
+    def swap(self, states, bundle, directory):
+        """
+        Atomically replaces the serving models. Requests in flight finish on the states
+        they already read; the replaced set is kept for rollback().
+        """
+        with self._swap_lock:
+            self._previous.append((self.states, self.bundle, self.models_dir))
+            del self._previous[:-MAX_ROLLBACK_DEPTH]
+            self._install(states, bundle, directory)
+
+    def previous_bundle(self):
+        """Bundle rollback() would restore: a version, None for the flat files, or False if nothing is held"""
+        with self._swap_lock:
+            return self._previous[-1][1] if self._previous else False
+
+    def rollback(self):
+        """Restores the states replaced by the last swap. Returns their bundle."""
+        with self._swap_lock:
+            if not self._previous:
+                raise LookupError("No previous model version is held in memory")
+            states, bundle, directory = self._previous.pop()
+            self._install(states, bundle, directory)
+        return bundle
+
+    def _install(self, states, bundle, directory):
+        self.states = dict(states)
+        self.bundle, self.models_dir = bundle, directory
+        for name, state in self.states.items():
+            self.prediction_cache.invalidate(name)
+            self.model_status[name] = {'state': 'ready', 'version': state.version, 'bundle': bundle}
+
+    def is_ready(self):
+        return all(status['state'] == 'ready' for status in self.model_status.values())
+
+    def health(self):
+        return {
+            'models_ready': self.is_ready(),
+            'load_mode': self.load_mode,
+            'bundle': self.bundle,
+            'models': self.model_status
+        }
+
+    def cache_stats(self):
+        return self.prediction_cache.stats()
+
+    def known_districts(self):
+        """District names the loaded encoders know, the weather prefetch targets"""
+        districts = set()
+        for state in list(self.states.values()):
+            if 'district' in state.tables:
+                districts.update(state.tables['district'].classes.tolist())
+        return sorted(districts)
+
+    def metrics_snapshots(self):
+        # Stage timings are recorded straight into this process's registry
+        return []
+
+    # Batch helpers
+
+    def _weather_by_district(self, model, items):
+        """Fetches weather once per distinct district in a batch, the districts in parallel"""
+        started = time.perf_counter()
+        weathers = weather_cache.get_many(item.get('district', 'Salem') for item in items)
+        metrics.observe('ml_stage_seconds', time.perf_counter() - started, model=model, stage='weather')
+        return weathers
+
+    def _prepare_batch(self, model, items, build_inputs, tables, cat_cols):
+        """
+        Builds the feature matrix for a batch, encoding each categorical column once
+        through the precompiled lookup tables.
+        build_inputs(item) returns one input dict (or a list of them) per item.
+        Returns: (feature matrix, item position of every row, {position: error},
+                  {position: {column: unknown value replaced by its fallback}})
+        """
+        started = time.perf_counter()
+        rows, owners, errors, substituted = [], [], {}, {}
+        for pos, item in enumerate(items):
+            try:
+                built = build_inputs(item)
+            except Exception as e:
+                errors[pos] = str(e)
+                continue
+            if isinstance(built, dict):
+                built = [built]
+            rows.extend(built)
+            owners.extend([pos] * len(built))
+
+        metrics.observe('ml_stage_seconds', time.perf_counter() - started, model=model, stage='build')
+        if not rows:
+            return np.empty((0, 0)), np.array([], dtype=int), errors, substituted
+
+        started = time.perf_counter()
+        # Column order is the input dict order, which matches training order
+        columns = list(rows[0])
+        owners = np.asarray(owners)
+        valid = np.ones(len(rows), dtype=bool)
+        X = np.empty((len(rows), len(columns)), dtype=np.float64)
+
+        for j, col in enumerate(columns):
+            values = [row[col] for row in rows]
+            if col in cat_cols:
+                table = tables[col]
+                X[:, j], unknown = table.encode(values)
+                for row in np.flatnonzero(unknown & valid):
+                    if table.fallback_code is None:
+                        errors.setdefault(int(owners[row]), f"Unknown {col}: {values[row]!r}")
+                    else:
+                        substituted.setdefault(int(owners[row]), {})[col] = values[row]
+                if table.fallback_code is None:
+                    valid &= ~unknown
+            else:
+                # Reject rows with non-numeric features before they reach the model
+                X[:, j] = _to_float_column(values)
+                bad = np.isnan(X[:, j])
+                for row in np.flatnonzero(bad & valid):
+                    errors.setdefault(int(owners[row]), f"Invalid value for {col}: {values[row]!r}")
+                valid &= ~bad
+
+        # A multi-row item (e.g. a forecast horizon) fails as a whole
+        if errors:
+            valid &= ~np.isin(owners, list(errors))
+
+        metrics.observe('ml_stage_seconds', time.perf_counter() - started, model=model, stage='encode')
+        return X[valid], owners[valid], errors, substituted
+
+    def _predict_cached(self, state, X, predict):
+        """
+        Runs predict(X) -> (n_rows, n_outputs) array, skipping rows whose encoded features
+        are already in the result cache and scoring duplicate rows only once.
+        """
+        cache = self.prediction_cache
+        if not cache.enabled:
+            return predict(X)
+
+        name, version = state.name, state.version
+        keys = [row.tobytes() for row in X]
+        outputs = cache.get_many(name, version, keys)
+
+        first_row = {}
+        for i, output in enumerate(outputs):
+            if output is None:
+                first_row.setdefault(keys[i], i)
+        if first_row:
+            missing = list(first_row.values())
+            fresh = predict(X[missing])
+            cache.put_many(name, version, list(first_row), fresh)
+            fresh_by_key = dict(zip(first_row, fresh))
+            outputs = [fresh_by_key[key] if output is None else output for key, output in zip(keys, outputs)]
+        return np.array(outputs)
+
+    # Model 1: Crop Recommender
+
     def get_crop_recommendations(self, farm_data):
         """
-        Takes: {land_size, soil_type, climate, water, temp, rainfall, ...}
+        Takes: {land_size, soil_type, climate, water, temp, rainfall, ..., top_k}
         Returns: [{crop, confidence, yield, margin, reasoning}, ...]
         """
+        return self.get_crop_recommendations_batch([farm_data])[0]
+
+    def get_crop_recommendations_batch(self, farms):
+        """
+        Takes: [{land_size, soil_type, water, district, season, top_k, ...}, ...]
+        Returns: one get_crop_recommendations result per farm, in input order
+        """
         try:
-            district = farm_data.get('district', 'Salem')
-            
-            # Fetch real-time weather data
-            logger.info(f"Fetching real-time weather for district: {district}")
-            weather = weather_service.get_weather(district)
-            
-            # Inject real-time weather values dynamically
-            inputs = {
-                'land_area': farm_data.get('land_size_acres', 1.0),
-                'soil_type': farm_data.get('soil_type', 'Loamy'),
-                'water_availability': farm_data.get('water_availability', 'High'),
-                'irrigation_type': farm_data.get('irrigation_type', 'Borewell'),
-                'rainfall_mm': weather.get('rainfall', farm_data.get('rainfall_mm', 1000)),
-                'temperature_celsius': weather.get('temp', farm_data.get('temperature_avg', 28)),
-                'humidity_percent': weather.get('humidity', farm_data.get('humidity', 60)),
-                'season': farm_data.get('season', 'Summer'),
-                'previous_crop': farm_data.get('previous_crop', 'Rice'),
-                'market_demand_level': farm_data.get('market_demand_level', 'Medium'),
-                'district': district
-            }
-            
-            df = pd.DataFrame([inputs])
-            encoders = self.encoders['crop']
-            
-            cat_cols = ['soil_type', 'water_availability', 'irrigation_type', 'season', 
-                        'previous_crop', 'market_demand_level', 'district']
-            
-            for col in cat_cols:
-                if col in df.columns and col in encoders:
-                    df[col] = encoders[col].transform(df[col])
-            
-            model = self.models['crop']
-            # Get probabilities for all classes
-            probs = model.predict_proba(df)[0]
-            
-            # Get top 3 indices
-            top_indices = np.argsort(probs)[-3:][::-1]
-            
-            recommendations = []
-            for idx in top_indices:
-                crop_name = encoders['recommended_crop'].inverse_transform([idx])[0]
-                confidence = float(probs[idx])
-                
-                # Dynamic reasoning and metrics (simulated based on crop type)
-                recommendations.append({
-                    'crop': crop_name,
-                    'confidence': round(confidence * 100, 2),
-                    'expected_yield': f"{np.random.randint(15, 50)} tons/acre",
-                    'profit_margin': f"{np.random.randint(20, 45)}%",
-                    'reasoning': f"Based on real-time weather ({inputs['temperature_celsius']}°C), current {inputs['soil_type']} soil and {inputs['water_availability']} water access, {crop_name} shows high suitability."
-                })
-                
-            return {
-                'success': True,
-                'recommendations': recommendations,
-                'weather_context': weather,
-                'timestamp': datetime.now().isoformat()
-            }
+            state = self._state('crop')
+            n_classes = len(state.tables['recommended_crop'].classes)
+            top_ks = []
+            for farm_data in farms:
+                try:
+                    top_ks.append(max(1, min(int(farm_data.get('top_k', DEFAULT_TOP_K)), n_classes)))
+                except (TypeError, ValueError):
+                    top_ks.append(None)
+            weathers = self._weather_by_district('crop', farms)
+
+            def build_inputs(farm_data):
+                district = farm_data.get('district', 'Salem')
+                weather = weathers[district]
+                if isinstance(weather, Exception):
+                    weather = _request_weather(farm_data, weather)
+
+                # Inject real-time weather values dynamically
+                return {
+                    'land_area': farm_data.get('land_size_acres', 1.0),
+                    'soil_type': farm_data.get('soil_type', 'Loamy'),
+                    'water_availability': farm_data.get('water_availability', 'High'),
+                    'irrigation_type': farm_data.get('irrigation_type', 'Borewell'),
+                    'rainfall_mm': weather.get('rainfall', farm_data.get('rainfall_mm', 1000)),
+                    'temperature_celsius': weather.get('temp', farm_data.get('temperature_avg', 28)),
+                    'humidity_percent': weather.get('humidity', farm_data.get('humidity', 60)),
+                    'season': farm_data.get('season', 'Summer'),
+                    'previous_crop': farm_data.get('previous_crop', 'Rice'),
+                    'market_demand_level': farm_data.get('market_demand_level', 'Medium'),
+                    'district': district
+                }
+
+            tables = state.tables
+            cat_cols = [col for col in ['soil_type', 'water_availability', 'irrigation_type', 'season',
+                                        'previous_crop', 'market_demand_level', 'district'] if col in tables]
+            X, owners, errors, substituted = self._prepare_batch('crop', farms, build_inputs, tables, cat_cols)
+            for pos, top_k in enumerate(top_ks):
+                if top_k is None:
+                    errors[pos] = f"Invalid value for top_k: {farms[pos].get('top_k')!r}"
+            keep = np.array([top_ks[pos] is not None for pos in owners], dtype=bool)
+            X, owners = X[keep], owners[keep]
+
+            results = [{'success': False, 'error': errors.get(pos, 'Not scored')} for pos in range(len(farms))]
+            if not len(X):
+                return results
+
+            # Probabilities for all classes in one call; identical farms are scored once
+            probs = self._predict_cached(state, X, lambda X: _timed_predict('crop', 'model', state.scorer.predict_proba, X))
+
+            # Top-k per farm over its (district, season, soil_type) candidate set
+            classes = tables['recommended_crop'].classes
+            keys = [(farms[pos].get('district', 'Salem'), farms[pos].get('season', 'Summer'),
+                     farms[pos].get('soil_type', 'Loamy')) for pos in owners]
+            top_indices, typical, yields, margins = self.crop_ranker.rank(probs, classes, keys, [top_ks[pos] for pos in owners])
+            crop_names = classes[top_indices]
+
+            started = time.perf_counter()
+            timestamp = datetime.now().isoformat()
+            for row, pos in enumerate(owners):
+                farm_data = farms[pos]
+                district = farm_data.get('district', 'Salem')
+                weather = weathers[district]
+                if isinstance(weather, Exception):
+                    weather = _request_weather(farm_data, weather)
+                temperature = weather.get('temp', farm_data.get('temperature_avg', 28))
+                soil_type = farm_data.get('soil_type', 'Loamy')
+                water = farm_data.get('water_availability', 'High')
+
+                recommendations = []
+                for i in range(top_ks[pos]):
+                    idx, crop_name = top_indices[row, i], str(crop_names[row, i])
+                    confidence = float(probs[row, idx])
+                    yield_kg, margin = yields[row, i], margins[row, i]
+
+                    # Yield and margin come from the district/season tables; None where there is no history
+                    recommendations.append({
+                        'crop': crop_name,
+                        'confidence': round(confidence * 100, 2),
+                        'expected_yield': None if np.isnan(yield_kg) else f"{yield_kg / 1000:.1f} tons/acre",
+                        'profit_margin': None if np.isnan(margin) else f"{margin:.0f}%",
+                        'typical_for_area': bool(typical[row, i]),
+                        'reasoning': f"Based on real-time weather ({temperature}°C), current {soil_type} soil and {water} water access, {crop_name} shows high suitability."
+                    })
+
+                results[pos] = {
+                    'success': True,
+                    'recommendations': recommendations,
+                    'weather_context': weather,
+                    'timestamp': timestamp
+                }
+                if pos in substituted:
+                    results[pos]['unknown_categories'] = substituted[pos]
+            metrics.observe('ml_stage_seconds', time.perf_counter() - started, model='crop', stage='serialize')
+            return results
         except Exception as e:
-            logger.error(f"Error in get_crop_recommendations: {e}")
-            return {'success': False, 'error': str(e)}
+            logger.error(f"Error in get_crop_recommendations_batch: {e}")
+            return [{'success': False, 'error': str(e)} for _ in farms]
+
+    # Model 2: Demand Forecaster
+
+    def _encode_value(self, tables, col, value):
+        """Encodes a single categorical value, applying the column's unknown-category policy"""
+        try:
+            return tables[col].encode_one(value)
+        except ValueError:
+            raise ValueError(f"Unknown {col}: {value!r}")
+
+    def _market_features(self, crop, location):
+        """History-derived inputs (MarketSeries.features) for one crop and location; {} without a store"""
+        if self.market_series is None:
+            return {}
+        return self.market_series.features(crop, location)
+
+    def _forecast_matrix(self, state, forecast_data, start_date):
+        """
+        Builds the whole forecast horizon for every requested crop/market as one feature matrix.
+        Returns: (matrix with one row per (crop, market, day), [(crop, market), ...], dates)
+        """
+        horizon = int(forecast_data.get('horizon_days', DEFAULT_FORECAST_HORIZON_DAYS))
+        if not 1 <= horizon <= MAX_FORECAST_HORIZON_DAYS:
+            raise ValueError(f"horizon_days must be between 1 and {MAX_FORECAST_HORIZON_DAYS}")
+
+        for key in ('crop_names', 'market_locations'):
+            if forecast_data.get(key) is not None and not isinstance(forecast_data[key], list):
+                raise ValueError(f"{key} must be a list")
+        crops = forecast_data.get('crop_names') or [forecast_data.get('crop_name', 'Tomato')]
+        cities = forecast_data.get('market_locations') or [forecast_data.get('market_location', 'Chennai')]
+        series = [(crop, city) for crop in crops for city in cities]
+        if len(series) > MAX_FORECAST_SERIES:
+            raise ValueError(f"At most {MAX_FORECAST_SERIES} crop/market combinations per forecast")
+
+        # Categorical values are encoded once per series, not once per day
+        tables = state.tables
+        crop_codes = {crop: self._encode_value(tables, 'vegetable_name', crop) for crop in crops}
+        city_codes = {city: self._encode_value(tables, 'city', city) for city in cities}
+        season_code = self._encode_value(tables, 'season', 'Summer')
+
+        # Values the request leaves out come from each series' market history, then the defaults
+        supply = float(forecast_data.get('supply', 500))
+        markets = [self._market_features(crop, city) for crop, city in series]
+        prev_demand = [float(forecast_data['supply']) if 'supply' in forecast_data
+                       else market.get('prev_demand_kg', supply) for market in markets]
+        price = [float(forecast_data['current_price']) if 'current_price' in forecast_data
+                 else market.get('current_price', 30) for market in markets]
+        dates = pd.date_range(start_date, periods=horizon, freq='D')
+        n_rows = horizon * len(series)
+
+        # Column order must match the order the forecaster was trained on
+        X = np.column_stack([
+            np.repeat([crop_codes[crop] for crop, _ in series], horizon),   # vegetable_name
+            np.tile(dates.month.to_numpy(), len(series)),                     # month
+            np.tile(dates.year.to_numpy(), len(series)),                      # year
+            np.repeat(prev_demand, horizon),                                  # prev_demand_kg
+            np.repeat(price, horizon),                                        # prev_price_rs
+            np.tile((np.arange(horizon) % 7 == 0).astype(int), len(series)),  # festival_week (mock festival logic)
+            np.zeros(n_rows),                                                 # school_holiday
+            np.full(n_rows, season_code),                                     # season
+            np.repeat([city_codes[city] for _, city in series], horizon),     # city
+            np.full(n_rows, 10),                                              # rainfall_mm
+            np.full(n_rows, 30),                                              # temperature
+            np.full(n_rows, supply)                                           # supply_volume_kg
+        ]).astype(np.float64)
+        return X, series, dates
 
     def forecast_demand(self, forecast_data):
         """
-        Takes: {crop_name, current_price, supply, market_location}
-        Returns: [30 days of {day, predicted_demand_kg, price}]
+        Takes: {crop_name | crop_names, current_price, supply, market_location | market_locations, horizon_days}
+        Returns: [horizon_days (default 30) of {day, predicted_demand_kg, price}] per crop/market
+        """
+        return self.forecast_demand_batch([forecast_data])[0]
+
+    def forecast_demand_batch(self, forecasts):
+        """
+        Takes: [{crop_name, current_price, supply, market_location, horizon_days}, ...]
+        Returns: one forecast_demand result per request, in input order
         """
         try:
-            crop_name = forecast_data.get('crop_name', 'Tomato')
-            city = forecast_data.get('market_location', 'Chennai')
-            
-            results = []
+            state = self._state('demand')
             current_date = datetime.now()
-            
-            model_data = self.models['demand']
-            encoders = self.encoders['demand']
-            
-            # Simulated 30-day forecast by varying inputs slightly
-            for i in range(30):
-                forecast_date = current_date + timedelta(days=i)
-                inputs = {
-                    'vegetable_name': crop_name,
-                    'month': forecast_date.month,
-                    'year': forecast_date.year,
-                    'prev_demand_kg': forecast_data.get('supply', 500),
-                    'prev_price_rs': forecast_data.get('current_price', 30),
-                    'festival_week': 1 if i % 7 == 0 else 0, # mock festival logic
-                    'school_holiday': 0,
-                    'season': 'Summer',
-                    'city': city,
-                    'rainfall_mm': 10,
-                    'temperature': 30,
-                    'supply_volume_kg': forecast_data.get('supply', 500)
+            model_data = state.scorer
+
+            results = [None] * len(forecasts)
+            matrices, plans = [], []
+            started = time.perf_counter()
+            for pos, forecast_data in enumerate(forecasts):
+                try:
+                    X, series, dates = self._forecast_matrix(state, forecast_data, current_date)
+                except Exception as e:
+                    results[pos] = {'success': False, 'error': str(e)}
+                    continue
+                matrices.append(X)
+                plans.append((pos, series, dates))
+            metrics.observe('ml_stage_seconds', time.perf_counter() - started, model='demand', stage='build')
+
+            if not matrices:
+                return results
+
+            # One call per model for every day of every series of every request
+            X = np.vstack(matrices) if len(matrices) > 1 else matrices[0]
+            demand_preds = np.round(_timed_predict('demand', 'model_demand', model_data['model_demand'].predict, X), 2)
+            price_preds = np.round(_timed_predict('demand', 'model_price', model_data['model_price'].predict, X), 2)
+
+            started = time.perf_counter()
+            offset = 0
+            for pos, series, dates in plans:
+                days = dates.strftime('%Y-%m-%d').tolist()
+                series_results = []
+                for crop, city in series:
+                    end = offset + len(days)
+                    series_results.append({
+                        'crop_name': crop,
+                        'market': city,
+                        'forecast': [{
+                            'day': day,
+                            'predicted_demand_kg': demand,
+                            'predicted_price_rs': price
+                        } for day, demand, price in zip(days, demand_preds[offset:end].tolist(),
+                                                        price_preds[offset:end].tolist())]
+                    })
+                    offset = end
+
+                results[pos] = {
+                    'success': True,
+                    'forecast': series_results[0]['forecast'],
+                    'crop_name': series_results[0]['crop_name'],
+                    'market': series_results[0]['market'],
+                    'horizon_days': len(days)
                 }
-                
-                df = pd.DataFrame([inputs])
-                
-                # Apply encoders
-                df['vegetable_name'] = encoders['vegetable_name'].transform(df['vegetable_name'])
-                df['city'] = encoders['city'].transform(df['city'])
-                df['season'] = encoders['season'].transform(df['season'])
-                
-                demand_pred = model_data['model_demand'].predict(df)[0]
-                price_pred = model_data['model_price'].predict(df)[0]
-                
-                results.append({
-                    'day': forecast_date.strftime('%Y-%m-%d'),
-                    'predicted_demand_kg': float(round(demand_pred, 2)),
-                    'predicted_price_rs': float(round(price_pred, 2))
-                })
-                
-            return {
-                'success': True,
-                'forecast': results,
-                'crop_name': crop_name,
-                'market': city
-            }
+                if len(series_results) > 1:
+                    results[pos]['forecasts'] = series_results
+            metrics.observe('ml_stage_seconds', time.perf_counter() - started, model='demand', stage='serialize')
+            return results
         except Exception as e:
-            logger.error(f"Error in forecast_demand: {e}")
-            return {'success': False, 'error': str(e)}
+            logger.error(f"Error in forecast_demand_batch: {e}")
+            return [{'success': False, 'error': str(e)} for _ in forecasts]
+
+    # Model 3: Price Crash Detector
 
     def detect_price_crash_risk(self, price_data):
         """
         Takes: {crop_name, current_price, price_history_7days, ...}
         Returns: {risk_level, crash_probability, predicted_price}
         """
+        return self.detect_price_crash_risk_batch([price_data])[0]
+
+    def detect_price_crash_risk_batch(self, prices):
+        """
+        Takes: [{crop_name, current_price, prev_week_price, supply, demand, district}, ...]
+        Returns: one detect_price_crash_risk result per request, in input order
+        """
         try:
-            inputs = {
-                'vegetable_name': price_data.get('crop_name', 'Tomato'),
-                'current_price_rs': price_data.get('current_price', 30),
-                'prev_week_price_rs': price_data.get('prev_week_price', 40),
-                'current_supply_kg': price_data.get('supply', 1000),
-                'current_demand_kg': price_data.get('demand', 800),
-                'supply_demand_ratio': price_data.get('supply', 1000) / price_data.get('demand', 800),
-                'month': datetime.now().month,
-                'festival_next_week': 0,
-                'rainfall_mm': 5,
-                'num_farmers_producing': 50,
-                'cold_storage_available': 1,
-                'district': price_data.get('district', 'Salem')
-            }
-            
-            df = pd.DataFrame([inputs])
-            model_data = self.models['price_crash']
-            encoders = self.encoders['price_crash']
-            
-            # Apply encoders
-            df['vegetable_name'] = encoders['vegetable_name'].transform(df['vegetable_name'])
-            df['district'] = encoders['district'].transform(df['district'])
-            
-            crash_alert = bool(model_data['model_crash'].predict(df)[0])
-            severity_idx = model_data['model_sev'].predict(df)[0]
-            severity = encoders['crash_severity'].inverse_transform([severity_idx])[0]
-            predicted_price = float(model_data['model_price'].predict(df)[0])
-            
-            # Simulated probability since it might not be direct in the specific model dict structure
-            prob = 0.85 if crash_alert else 0.15
-            
-            return {
-                'success': True,
-                'risk_level': severity if crash_alert else 'Low',
-                'crash_probability': prob,
-                'predicted_price': round(predicted_price, 2),
-                'crash_alert': crash_alert
-            }
+            state = self._state('price_crash')
+            month = datetime.now().month
+
+            def build_inputs(price_data):
+                market = {} if 'current_price' in price_data and 'prev_week_price' in price_data else \
+                    self._market_features(price_data.get('crop_name', 'Tomato'), price_data.get('district', 'Salem'))
+                return {
+                    'vegetable_name': price_data.get('crop_name', 'Tomato'),
+                    'current_price_rs': price_data.get('current_price', market.get('current_price', 30)),
+                    'prev_week_price_rs': price_data.get('prev_week_price', market.get('prev_week_price', 40)),
+                    'current_supply_kg': price_data.get('supply', 1000),
+                    'current_demand_kg': price_data.get('demand', 800),
+                    'supply_demand_ratio': price_data.get('supply', 1000) / price_data.get('demand', 800),
+                    'month': month,
+                    'festival_next_week': 0,
+                    'rainfall_mm': 5,
+                    'num_farmers_producing': 50,
+                    'cold_storage_available': 1,
+                    'district': price_data.get('district', 'Salem')
+                }
+
+            model_data = state.scorer
+            tables = state.tables
+            X, owners, errors, substituted = self._prepare_batch('price_crash', prices, build_inputs, tables,
+                                                                 ['vegetable_name', 'district'])
+
+            results = [{'success': False, 'error': errors.get(pos, 'Not scored')} for pos in range(len(prices))]
+            if not len(X):
+                return results
+
+            outputs = self._predict_cached(state, X, lambda X: np.column_stack([
+                _timed_predict('price_crash', 'model_crash', model_data['model_crash'].predict, X),
+                _timed_predict('price_crash', 'model_sev', model_data['model_sev'].predict, X),
+                _timed_predict('price_crash', 'model_price', model_data['model_price'].predict, X)
+            ]))
+            crash_alerts = outputs[:, 0]
+            severities = tables['crash_severity'].decode(outputs[:, 1])
+            predicted_prices = outputs[:, 2]
+
+            started = time.perf_counter()
+            for row, pos in enumerate(owners):
+                crash_alert = bool(crash_alerts[row])
+
+                # Simulated probability since it might not be direct in the specific model dict structure
+                prob = 0.85 if crash_alert else 0.15
+
+                results[pos] = {
+                    'success': True,
+                    'risk_level': severities[row] if crash_alert else 'Low',
+                    'crash_probability': prob,
+                    'predicted_price': round(float(predicted_prices[row]), 2),
+                    'crash_alert': crash_alert
+                }
+                if pos in substituted:
+                    results[pos]['unknown_categories'] = substituted[pos]
+            metrics.observe('ml_stage_seconds', time.perf_counter() - started, model='price_crash', stage='serialize')
+            return results
         except Exception as e:
-            logger.error(f"Error in detect_price_crash_risk: {e}")
-            return {'success': False, 'error': str(e)}
+            logger.error(f"Error in detect_price_crash_risk_batch: {e}")
+            return [{'success': False, 'error': str(e)} for _ in prices]
+
+    # Model 4: Spoilage Predictor
 
     def predict_spoilage_risk(self, spoilage_data):
         """
         Takes: {crop_name, harvest_date, transport_hours, temp, ...}
         Returns: {shelf_life_days, risk_level, recommendations}
         """
+        return self.predict_spoilage_risk_batch([spoilage_data])[0]
+
+    def predict_spoilage_risk_batch(self, lots):
+        """
+        Takes: [{crop_name, transport_hours, storage_method, district, ...}, ...]
+        Returns: one predict_spoilage_risk result per lot, in input order
+        """
         try:
-            district = spoilage_data.get('district', 'Salem')
-            
-            # Fetch real-time weather data
-            logger.info(f"Fetching real-time weather for spoilage risk in: {district}")
-            weather = weather_service.get_weather(district)
-            
-            # Inject real-time weather values
-            inputs = {
-                'vegetable_type': spoilage_data.get('crop_name', 'Tomato'),
-                'storage_temperature': weather.get('temp', spoilage_data.get('storage_temp', 25)),
-                'humidity_percent': weather.get('humidity', spoilage_data.get('humidity', 60)),
-                'transport_time_hours': spoilage_data.get('transport_hours', 5),
-                'days_since_harvest': spoilage_data.get('days_since_harvest', 1),
-                'storage_type': spoilage_data.get('storage_method', 'Open Air'),
-                'packaging_type': 'Crate',
-                'bruising_level': 1,
-                'initial_quality_score': 90,
-                'season': 'Summer',
-                'district': district
-            }
-            
-            df = pd.DataFrame([inputs])
-            model_data = self.models['spoilage']
-            encoders = self.encoders['spoilage']
-            
-            # Apply encoders
-            df['vegetable_type'] = encoders['vegetable_type'].transform(df['vegetable_type'])
-            df['storage_type'] = encoders['storage_type'].transform(df['storage_type'])
-            df['packaging_type'] = encoders['packaging_type'].transform(df['packaging_type'])
-            df['season'] = encoders['season'].transform(df['season'])
-            df['district'] = encoders['district'].transform(df['district'])
-            
-            risk_idx = model_data['model_risk'].predict(df)[0]
-            risk_level = encoders['spoilage_risk_level'].inverse_transform([risk_idx])[0]
-            shelf_life = float(model_data['model_days'].predict(df)[0])
-            
-            # Dynamic recommendations
-            if risk_level == 'High':
-                recommendation = f"High risk due to {inputs['storage_temperature']}°C temperature. Sell immediately or process into value-added products."
-            elif risk_level == 'Medium':
-                recommendation = "Ensure cold chain maintenance and sell within 48 hours."
+            state = self._state('spoilage')
+            weathers = self._weather_by_district('spoilage', lots)
+            model_data = state.scorer
+            tables = state.tables
+            X, owners, errors, substituted = self._prepare_batch(
+                'spoilage', lots, lambda spoilage_data: self._spoilage_inputs(spoilage_data, weathers), tables,
+                SPOILAGE_CATEGORICALS)
+
+            results = [{'success': False, 'error': errors.get(pos, 'Not scored')} for pos in range(len(lots))]
+            if not len(X):
+                return results
+
+            outputs = self._predict_cached(state, X, lambda X: np.column_stack([
+                _timed_predict('spoilage', 'model_risk', model_data['model_risk'].predict, X),
+                _timed_predict('spoilage', 'model_days', model_data['model_days'].predict, X)
+            ]))
+            risk_levels = tables['spoilage_risk_level'].decode(outputs[:, 0])
+            shelf_lives = outputs[:, 1]
+
+            started = time.perf_counter()
+            for row, pos in enumerate(owners):
+                risk_level = risk_levels[row]
+                spoilage_data = lots[pos]
+                weather = self._spoilage_weather(weathers, spoilage_data)
+                temperature = weather.get('temp', spoilage_data.get('storage_temp', 25))
+
+                # Dynamic recommendations
+                if risk_level == 'High':
+                    recommendation = f"High risk due to {temperature}°C temperature. Sell immediately or process into value-added products."
+                elif risk_level == 'Medium':
+                    recommendation = "Ensure cold chain maintenance and sell within 48 hours."
+                else:
+                    recommendation = "Safe for local storage. Monitor quality daily."
+
+                results[pos] = {
+                    'success': True,
+                    'shelf_life_days': round(float(shelf_lives[row]), 1),
+                    'risk_level': risk_level,
+                    'recommendations': recommendation,
+                    'weather_context': weather
+                }
+                if pos in substituted:
+                    results[pos]['unknown_categories'] = substituted[pos]
+            metrics.observe('ml_stage_seconds', time.perf_counter() - started, model='spoilage', stage='serialize')
+            return results
+        except Exception as e:
+            logger.error(f"Error in predict_spoilage_risk_batch: {e}")
+            return [{'success': False, 'error': str(e)} for _ in lots]
+
+    def _spoilage_weather(self, weathers, spoilage_data):
+        """The lot district's weather, or an empty context so the lot's own storage_temp/humidity apply"""
+        weather = weathers[spoilage_data.get('district', 'Salem')]
+        if isinstance(weather, Exception):
+            return {'source': 'request', 'error': str(weather)}
+        return weather
+
+    def _spoilage_inputs(self, spoilage_data, weathers):
+        weather = self._spoilage_weather(weathers, spoilage_data)
+        # Inject real-time weather values
+        return {
+            'vegetable_type': spoilage_data.get('crop_name', 'Tomato'),
+            'storage_temperature': weather.get('temp', spoilage_data.get('storage_temp', 25)),
+            'humidity_percent': weather.get('humidity', spoilage_data.get('humidity', 60)),
+            'transport_time_hours': spoilage_data.get('transport_hours', 5),
+            'days_since_harvest': spoilage_data.get('days_since_harvest', 1),
+            'storage_type': spoilage_data.get('storage_method', 'Open Air'),
+            'packaging_type': spoilage_data.get('packaging_type', 'Crate'),
+            'bruising_level': spoilage_data.get('bruising_level', 1),
+            'initial_quality_score': spoilage_data.get('initial_quality_score', 90),
+            'season': spoilage_data.get('season', 'Summer'),
+            'district': spoilage_data.get('district', 'Salem')
+        }
+
+    def plan_spoilage_routes(self, plan):
+        """
+        Takes: {lots: [{lot_id, crop_name, quantity_kg, district, days_since_harvest, packaging_type, ...}],
+                destinations: [{market, transport_hours: [..], price_per_kg (optional)} | market name, ...],
+                storage_types, transport_hours (default for destinations without their own),
+                storage_cost_per_kg: {storage type: rupees}, transport_cost_per_kg_hour,
+                min_shelf_life_days (left on arrival), options (plans returned per lot)}
+        Returns: {plans: one {lot_id, best, alternatives} per lot in input order, combinations, elapsed_ms,
+                  within_target: elapsed_ms against SPOILAGE_PLAN_TARGET_MS}
+        Every (lot, storage, destination, transport hours) combination is valued as
+        kg x (forecast price on arrival x (1 - expected loss) - storage cost) - kg x hours x transport cost;
+        combinations arriving with less than min_shelf_life_days of shelf life are discarded.
+        """
+        started = time.perf_counter()
+        try:
+            lots = plan.get('lots')
+            if not isinstance(lots, list) or not lots or not all(isinstance(lot, dict) for lot in lots):
+                raise ValueError("lots must be a non-empty list of objects")
+            spoilage = self._state('spoilage')
+            tables = spoilage.tables
+
+            storage_types = plan.get('storage_types') or tables['storage_type'].classes.tolist()
+            unknown = [storage for storage in storage_types if storage not in tables['storage_type']]
+            if unknown:
+                raise ValueError(f"Unknown storage_types: {unknown}")
+            storage_costs = plan.get('storage_cost_per_kg') or {}
+            storage_cost = np.array([float(storage_costs.get(storage, 0)) for storage in storage_types])
+
+            # (destination, transport hours) routes shared by every lot
+            destinations, route_dest, route_hours = [], [], []
+            for destination in plan.get('destinations') or []:
+                destination = {'market': destination} if isinstance(destination, str) else dict(destination)
+                hours = destination.get('transport_hours', plan.get('transport_hours', DEFAULT_PLAN_TRANSPORT_HOURS))
+                for value in hours if isinstance(hours, list) else [hours]:
+                    if not 0 < float(value) <= MAX_PLAN_TRANSPORT_HOURS:
+                        raise ValueError(f"transport_hours must be between 0 and {MAX_PLAN_TRANSPORT_HOURS}")
+                    route_dest.append(len(destinations))
+                    route_hours.append(float(value))
+                destinations.append(destination)
+            if not destinations:
+                raise ValueError("destinations must be a non-empty list")
+            if len(destinations) > MAX_FORECAST_SERIES:
+                raise ValueError(f"At most {MAX_FORECAST_SERIES} destinations per plan")
+
+            combinations = len(lots) * len(storage_types) * len(route_hours)
+            if combinations > Config.SPOILAGE_PLAN_MAX_COMBINATIONS:
+                raise ValueError(f"Plan too large ({combinations} > {Config.SPOILAGE_PLAN_MAX_COMBINATIONS} combinations)")
+
+            route_dest, route_hours = np.array(route_dest), np.array(route_hours)
+            now = datetime.now()
+            arrivals = [now + timedelta(hours=float(h)) for h in route_hours]
+            arrival_days = np.array([(arrival.date() - now.date()).days for arrival in arrivals], dtype=np.int64)
+            hours, hour_index = np.unique(route_hours, return_inverse=True)
+            shelf_life, loss, risk, owners, errors = self._score_plan_rows(spoilage, lots, storage_types, hours)
+            prices = self._plan_prices(lots, owners, destinations, route_dest, arrival_days, now)
+
+            # Everything below is (scored lot, storage, route)
+            shelf = shelf_life[:, :, hour_index]
+            on_arrival = shelf - route_hours / 24
+            quantity = np.array([float(lots[pos].get('quantity_kg', 1)) for pos in owners])[:, None, None]
+            transport_cost = float(plan.get('transport_cost_per_kg_hour', 0))
+            value = quantity * (prices[:, None, :] * (1 - loss[:, :, hour_index]) - storage_cost[None, :, None]) \
+                - quantity * route_hours * transport_cost
+            feasible = (on_arrival >= float(plan.get('min_shelf_life_days', 1.0))) & ~np.isnan(value)
+            value = np.where(feasible, value, -np.inf)
+
+            options = max(1, int(plan.get('options', 3)))
+            results = [{'lot_id': lot.get('lot_id', pos), 'success': False, 'error': errors.get(pos, 'Not scored')}
+                       for pos, lot in enumerate(lots)]
+            flat = value.reshape(len(owners), len(storage_types) * len(route_hours))
+            k = min(options, flat.shape[1])
+            # Top-k per lot without sorting every combination
+            if k < flat.shape[1]:
+                top = np.argpartition(-flat, k - 1, axis=1)[:, :k]
             else:
-                recommendation = "Safe for local storage. Monitor quality daily."
-                
+                top = np.tile(np.arange(k), (len(owners), 1))
+            top = np.take_along_axis(top, np.argsort(-np.take_along_axis(flat, top, axis=1), axis=1), axis=1)
+            for row, pos in enumerate(owners):
+                chosen = []
+                for index in top[row]:
+                    if not np.isfinite(flat[row, index]):
+                        break
+                    s, r = divmod(int(index), len(route_hours))
+                    destination = destinations[route_dest[r]]
+                    chosen.append({
+                        'storage_type': storage_types[s],
+                        'destination': destination.get('market'),
+                        'transport_hours': float(route_hours[r]),
+                        'arrival_date': arrivals[r].date().isoformat(),
+                        'price_per_kg': round(float(prices[row, r]), 2),
+                        'risk_level': risk[row, s, hour_index[r]],
+                        'expected_loss_rate': float(loss[row, s, hour_index[r]]),
+                        'shelf_life_days': round(float(shelf[row, s, r]), 1),
+                        'shelf_life_on_arrival_days': round(float(on_arrival[row, s, r]), 1),
+                        'expected_value_rs': round(float(flat[row, index]), 2)
+                    })
+                if chosen:
+                    results[pos] = {'lot_id': results[pos]['lot_id'], 'success': True, 'best': chosen[0],
+                                    'alternatives': chosen[1:]}
+                else:
+                    results[pos]['error'] = "No combination arrives with enough shelf life at a known price"
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            metrics.observe('ml_stage_seconds', elapsed_ms / 1000, model='spoilage', stage='plan')
             return {
                 'success': True,
-                'shelf_life_days': round(shelf_life, 1),
-                'risk_level': risk_level,
-                'recommendations': recommendation,
-                'weather_context': weather
+                'plans': results,
+                'combinations': combinations,
+                'scored_rows': int(shelf_life.size),
+                'elapsed_ms': round(elapsed_ms, 1),
+                'target_ms': Config.SPOILAGE_PLAN_TARGET_MS,
+                'within_target': elapsed_ms <= Config.SPOILAGE_PLAN_TARGET_MS
             }
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
         except Exception as e:
-            logger.error(f"Error in predict_spoilage_risk: {e}")
+            logger.error(f"Error in plan_spoilage_routes: {e}")
             return {'success': False, 'error': str(e)}
 
+    def _score_plan_rows(self, state, lots, storage_types, hours):
+        """
+        Scores every (lot, storage type, transport hours) row in one pass: each lot is encoded
+        once, then its row is repeated with the storage and hours columns overwritten.
+        Destinations don't change the spoilage inputs, so they share these rows.
+        Returns: (shelf life days, loss rate, risk level) arrays of shape (scored lots, storage, hours),
+                 scored lot positions, {position: error}
+        """
+        tables = state.tables
+        weathers = self._weather_by_district('spoilage', lots)
+        base, owners, errors, _ = self._prepare_batch(
+            'spoilage', lots, lambda lot: self._spoilage_inputs(lot, weathers), tables, SPOILAGE_CATEGORICALS)
+        n_storage, n_hours = len(storage_types), len(hours)
+        if not len(base):
+            empty = np.empty((0, n_storage, n_hours))
+            return empty, empty, empty.astype(object), owners, errors
+
+        columns = list(self._spoilage_inputs({}, {'Salem': {}}))
+        X = np.repeat(base, n_storage * n_hours, axis=0)
+        X[:, columns.index('storage_type')] = np.tile(
+            np.repeat([tables['storage_type'].encode_one(storage) for storage in storage_types], n_hours), len(base))
+        X[:, columns.index('transport_time_hours')] = np.tile(hours, len(base) * n_storage)
+
+        model_data = state.scorer
+        outputs = self._predict_cached(state, X, lambda X: np.column_stack([
+            _timed_predict('spoilage', 'model_risk', model_data['model_risk'].predict, X),
+            _timed_predict('spoilage', 'model_days', model_data['model_days'].predict, X)
+        ]))
+        classes = tables['spoilage_risk_level'].classes
+        loss_by_code = np.array([SPOILAGE_LOSS_RATES.get(level, max(SPOILAGE_LOSS_RATES.values())) for level in classes])
+        codes = outputs[:, 0].astype(np.int64)
+        shape = (len(base), n_storage, n_hours)
+        return (outputs[:, 1].reshape(shape), loss_by_code[codes].reshape(shape), classes[codes].reshape(shape),
+                owners, errors)
+
+    def _plan_prices(self, lots, owners, destinations, route_dest, arrival_days, now):
+        """
+        Price per kg on arrival for every (scored lot, route): the destination's own price_per_kg
+        if given, otherwise the demand model's forecast for the lot's crop at that market on the
+        arrival day (calendar days after `now`). NaN where neither is available (unknown crop or market).
+        Returns: array of shape (scored lots, routes)
+        """
+        crops = sorted({lots[pos].get('crop_name', 'Tomato') for pos in owners})
+        prices = np.full((len(crops), len(destinations), 1), np.nan)
+        try:
+            demand = self._state('demand')
+            markets = [i for i, destination in enumerate(destinations)
+                       if 'price_per_kg' not in destination and destination.get('market') in demand.tables['city']]
+            known = [crop for crop in crops if crop in demand.tables['vegetable_name']]
+        except Exception as e:
+            logger.warning(f"Route plan has no price forecasts: {e}")
+            markets, known = [], []
+        if markets and known:
+            # One forecast matrix per crop over every market, one price model call for all of them
+            horizon = int(arrival_days.max()) + 1
+            matrices = [self._forecast_matrix(demand, {
+                'crop_names': [crop],
+                'market_locations': [destinations[i]['market'] for i in markets],
+                'horizon_days': horizon
+            }, now)[0] for crop in known]
+            forecast = _timed_predict('demand', 'model_price', demand.scorer['model_price'].predict,
+                                      np.vstack(matrices)).reshape(len(known), len(markets), horizon)
+            prices = np.full((len(crops), len(destinations), horizon), np.nan)
+            prices[np.ix_([crops.index(crop) for crop in known], markets)] = forecast
+        for i, destination in enumerate(destinations):
+            if 'price_per_kg' in destination:
+                prices[:, i, :] = float(destination['price_per_kg'])
+
+        crop_rows = np.array([crops.index(lots[pos].get('crop_name', 'Tomato')) for pos in owners], dtype=np.int64)
+        return prices[crop_rows[:, None], route_dest[None, :], np.minimum(arrival_days, prices.shape[2] - 1)[None, :]]
+
 # Singleton instance accessor
 _ml_service = None
 
 def get_ml_service():
+    """
+    Returns the in-process MLService, or with ML_WORKERS > 0 a client for a pool of
+    worker processes that own the models (same method signatures).
+    """
     global _ml_service
     if _ml_service is None:
-        _ml_service = MLService()
+        import multiprocessing
+        from backend.inference_pool import WORKER_NAME
+        if multiprocessing.current_process().name.startswith(WORKER_NAME):
+            # A spawned pool worker re-importing the app's __main__: it builds its own service
+            _ml_service = MLService(load_mode='lazy')
+        elif Config.ML_WORKERS > 0:
+            from backend.inference_pool import InferencePool
+            _ml_service = InferencePool(
+                workers=Config.ML_WORKERS,
+                queue_size=Config.ML_POOL_QUEUE_SIZE,
+                max_batch=Config.ML_POOL_MAX_BATCH,
+                batch_wait_ms=Config.ML_POOL_BATCH_WAIT_MS,
+                timeout=Config.ML_POOL_TIMEOUT_SECONDS,
+                load_mode=Config.ML_LOAD_MODE,
+                mmap_mode=Config.ML_MMAP_MODE,
+                inference_backend=Config.ML_INFERENCE_BACKEND
+            )
+        else:
+            _ml_service = MLService()
     return _ml_service
@@ -0,0 +1,249 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from backend.forest_engine import unnamed_features
+from backend.train_models import TRAINING_SPECS, MANIFEST, DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Marker file that takes a bundle out of service in every process watching the directory
+REJECTED = 'REJECTED'
+
+# Rows of each training CSV a candidate bundle must score before it is swapped in
+CANNED_ROWS = 25
+
+def list_bundles(root):
+    """Versions of the complete, non-rejected bundles under root, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(entry for entry in os.listdir(root)
+                  if not entry.startswith('.')
+                  and os.path.isfile(os.path.join(root, entry, MANIFEST))
+                  and not os.path.exists(os.path.join(root, entry, REJECTED)))
+
+def newest_bundle(root):
+    """The bundle every process should serve (versions sort by creation time), or None for the flat files"""
+    bundles = list_bundles(root)
+    return bundles[-1] if bundles else None
+
+def reject_bundle(root, version, reason):
+    with open(os.path.join(root, version, REJECTED), 'w') as f:
+        f.write(f"{datetime.utcnow().isoformat()} {reason}\n")
+
+_canned = {}
+
+def canned_inputs(data_dir=DATA_DIR, rows=CANNED_ROWS):
+    """{model: DataFrame of the first rows of its training CSV}, read once per process"""
+    if data_dir not in _canned:
+        _canned[data_dir] = {name: pd.read_csv(os.path.join(data_dir, spec['csv']), nrows=rows, keep_default_na=False)
+                             for name, spec in TRAINING_SPECS.items()}
+    return _canned[data_dir]
+
+def validate_states(states, manifest=None, data_dir=DATA_DIR):
+    """
+    Scores the canned rows with every sub-model of a candidate bundle: features must match the
+    order MLService builds, the encoders must know every canned category, and predictions
+    must be finite and (for classifiers) decodable.
+    Returns: list of problems, empty when the bundle can serve
+    """
+    problems = []
+    for name, df in canned_inputs(data_dir).items():
+        spec = TRAINING_SPECS[name]
+        state = states.get(name)
+        if state is None:
+            problems.append(f"{name}: missing")
+            continue
+        targets = {target for target, _ in spec['targets'].values()}
+        features = [col for col in spec['columns'] if col not in targets]
+        listed = ((manifest or {}).get('models', {}).get(name) or {}).get('features')
+        if listed is not None and listed != features:
+            problems.append(f"{name}: manifest feature order {listed} differs from the service's {features}")
+            continue
+
+        try:
+            columns = []
+            for col in features:
+                if col in state.tables:
+                    codes, unknown = state.tables[col].encode(df[col].astype(str).tolist())
+                    if unknown.any() and state.tables[col].fallback_code is None:
+                        raise ValueError(f"encoder for {col} lacks {sorted(set(df[col][unknown].astype(str)))}")
+                    columns.append(codes)
+                else:
+                    columns.append(df[col].astype(np.float64).to_numpy())
+            X = np.column_stack(columns).astype(np.float64)
+        except Exception as e:
+            problems.append(f"{name}: canned rows not encodable: {e}")
+            continue
+
+        for key, (target, _) in spec['targets'].items():
+            label = f"{name}.{key or 'model'}"
+            sub_model = state.model if key is None else (state.model or {}).get(key)
+            if sub_model is None:
+                problems.append(f"{label}: missing")
+                continue
+            if getattr(sub_model, 'n_features_in_', len(features)) != len(features):
+                problems.append(f"{label}: expects {sub_model.n_features_in_} features, service sends {len(features)}")
+                continue
+            try:
+                with unnamed_features():
+                    output = np.asarray(sub_model.predict(X), dtype=np.float64)
+            except Exception as e:
+                problems.append(f"{label}: predict failed: {e}")
+                continue
+            if output.shape != (len(X),) or not np.isfinite(output).all():
+                problems.append(f"{label}: invalid predictions")
+            elif target in state.tables and not ((output >= 0) & (output < len(state.tables[target].classes))).all():
+                problems.append(f"{label}: predicts classes its encoder cannot decode")
+    return problems
+
+class ModelReloader:
+    """
+    Watches the models directory and hot-swaps an MLService onto the newest valid bundle.
+    A new bundle is loaded and validated beside the serving one; requests keep using the
+    old version until the single reference swap. Invalid bundles are never served.
+    """
+
+    def __init__(self, service, interval=10.0, data_dir=DATA_DIR):
+        self.service = service
+        self.root = service.models_root
+        self.interval = interval
+        self.data_dir = data_dir
+        self.failed = {}  # version -> problems; not retried by this process
+        self.events = deque(maxlen=20)
+        self.counters = {'checks': 0, 'reloads': 0, 'rejected': 0, 'rollbacks': 0, 'errors': 0}
+        self._lock = threading.Lock()  # one check or rollback at a time
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """
+        Moves the service onto the newest non-rejected bundle if it isn't serving it already.
+        Returns: the reload/rejection event, or None when nothing changed
+        """
+        with self._lock:
+            self.counters['checks'] += 1
+            target = newest_bundle(self.root)
+            if target == self.service.bundle or target in self.failed:
+                return None
+            return self._move_to(target)
+
+    def _move_to(self, version):
+        started = time.perf_counter()
+        previous = self.service.bundle
+        # Going back to the version the last swap replaced needs no reload
+        if self.service.previous_bundle() == version:
+            self.service.rollback()
+            return self._record('restored', version, previous=previous, seconds=time.perf_counter() - started)
+
+        directory = os.path.join(self.root, version) if version else self.root
+        states = None
+        try:
+            manifest = None
+            if version:
+                with open(os.path.join(directory, MANIFEST)) as f:
+                    manifest = json.load(f)
+            states = self.service.load_bundle(directory)
+            problems = validate_states(states, manifest, self.data_dir)
+        except Exception as e:
+            problems = [f"load failed: {e}"]
+        if problems and (version or states is None):
+            # Validation is deterministic, so the marker spares every other process the same load
+            if version:
+                reject_bundle(self.root, version, '; '.join(problems))
+            self.failed[version] = problems
+            self.counters['rejected'] += 1
+            return self._record('rejected', version, problems=problems, seconds=time.perf_counter() - started)
+        if problems:
+            # The flat files are the last resort: serve them, but say why they failed validation
+            logger.warning(f"Flat model files failed validation: {problems}")
+
+        self.service.swap(states, version, directory)
+        self.counters['reloads'] += 1
+        return self._record('reloaded', version, previous=previous, seconds=time.perf_counter() - started)
+
+    def rollback(self, reason='rollback requested'):
+        """
+        Marks the serving bundle REJECTED on disk, so every process watching the directory
+        moves off it, and switches this process to the newest remaining version.
+        Returns: the restore/reload event
+        Raises: LookupError when nothing is left to serve (the rejected bundle stays loaded)
+        """
+        with self._lock:
+            current = self.service.bundle
+            if current is None:
+                raise LookupError("No versioned bundle is serving, nothing to roll back")
+            reject_bundle(self.root, current, reason)
+            self.counters['rollbacks'] += 1
+            tried = set()
+            while True:
+                # Every rejection marks its bundle, so this ends at the flat files at the latest
+                target = newest_bundle(self.root)
+                if target in tried:
+                    break
+                tried.add(target)
+                event = self._move_to(target)
+                if event['action'] != 'rejected':
+                    return event
+                if target is None:
+                    break
+            raise LookupError(f"No loadable model version left to roll back to; still serving {current}")
+
+    def _record(self, action, version, **details):
+        event = {'action': action, 'version': version, 'at': datetime.utcnow().isoformat(), **details}
+        if 'seconds' in event:
+            event['seconds'] = round(event['seconds'], 3)
+        self.events.append(event)
+        log = logger.warning if action == 'rejected' else logger.info
+        log(f"Model bundle {action}: {event}")
+        return event
+
+    def start(self):
+        def loop():
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.check()
+                except Exception as e:
+                    self.counters['errors'] += 1
+                    logger.error(f"Model bundle check failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name='model-reloader', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self):
+        return {
+            'serving': self.service.bundle,
+            'available': list_bundles(self.root),
+            'failed': self.failed,
+            'interval_seconds': self.interval,
+            **self.counters,
+            'events': list(self.events)
+        }
+
+if __name__ == '__main__':
+    # Usage: python -m backend.model_reload validate <bundle dir>
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='Validate model bundles')
+    parser.add_argument('command', choices=['validate'])
+    parser.add_argument('bundle', help='a bundle directory written by python -m backend.train_models')
+    args = parser.parse_args()
+
+    from backend.ml_service import MLService
+    with open(os.path.join(args.bundle, MANIFEST)) as f:
+        manifest = json.load(f)
+    problems = validate_states(MLService(load_mode='lazy').load_bundle(args.bundle), manifest)
+    print('\n'.join(problems) if problems else f"{manifest['version']}: valid")
+    sys.exit(1 if problems else 0)
@@ -68,6 +68,58 @@ class PriceAlert(db.Model):
             "created_at": self.created_at.isoformat()
         }
 
+class CropListing(db.Model):
+    __tablename__ = 'crop_listings'
+    id = db.Column(db.Integer, primary_key=True)
+    farmer_id = db.Column(db.Integer)
+    crop_name = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    unit = db.Column(db.String(20), default='kg')
+    price_per_unit = db.Column(db.Float, nullable=False)
+    location = db.Column(db.String(100))
+    description = db.Column(db.Text)
+    status = db.Column(db.String(20), default='available') # available, sold
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "farmer_id": self.farmer_id,
+            "crop_name": self.crop_name,
+            "quantity": self.quantity,
+            "unit": self.unit,
+            "price_per_unit": self.price_per_unit,
+            "location": self.location,
+            "description": self.description,
+            "status": self.status,
+            "created_at": self.created_at.isoformat()
+        }
+
+class DemandPost(db.Model):
+    __tablename__ = 'demand_posts'
+    id = db.Column(db.Integer, primary_key=True)
+    shop_id = db.Column(db.Integer)
+    vegetable_name = db.Column(db.String(100), nullable=False)
+    required_quantity = db.Column(db.Float, nullable=False)
+    unit = db.Column(db.String(20), default='kg')
+    target_price = db.Column(db.Float)
+    urgency = db.Column(db.String(20), default='Standard') # Standard, Urgent
+    status = db.Column(db.String(20), default='open') # open, fulfilled
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "shop_id": self.shop_id,
+            "vegetable_name": self.vegetable_name,
+            "required_quantity": self.required_quantity,
+            "unit": self.unit,
+            "target_price": self.target_price,
+            "urgency": self.urgency,
+            "status": self.status,
+            "created_at": self.created_at.isoformat()
+        }
+
 class PilotParticipant(db.Model):
     __tablename__ = 'pilot_participants'
     id = db.Column(db.Integer, primary_key=True)
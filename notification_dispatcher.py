@@ -0,0 +1,385 @@
+import json
+import logging
+import queue
+import random
+import smtplib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+from sqlalchemy import bindparam, text
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ['email', 'sms', 'push']  # in_app delivery is the notifications row itself
+
+# Model defaults for users without a notification_preferences row
+DEFAULT_PREFERENCES = {'in_app': True, 'email': True, 'sms': False, 'push': True}
+
+# Brokers
+
+class InProcessBroker:
+    """Queue-backed broker for a single process, and for tests"""
+
+    def __init__(self, max_jobs=10000):
+        self._queue = queue.Queue(maxsize=max_jobs)
+
+    def put(self, job):
+        self._queue.put(job)
+
+    def get(self, timeout=1.0):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def size(self):
+        return self._queue.qsize()
+
+class RedisBroker:
+    """Redis list broker, so web processes can enqueue and a separate worker process delivers"""
+
+    def __init__(self, url, key='harvestlink:notifications'):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.key = key
+
+    def put(self, job):
+        self._redis.lpush(self.key, json.dumps(job))
+
+    def get(self, timeout=1.0):
+        item = self._redis.brpop(self.key, timeout=max(1, int(timeout)))
+        return json.loads(item[1]) if item else None
+
+    def size(self):
+        return self._redis.llen(self.key)
+
+# Channel senders: send(delivery) raises on failure so the channel worker retries
+
+class SmtpEmailSender:
+    def __init__(self, host, port, username=None, password=None, sender='alerts@harvestlink.in'):
+        self.host, self.port, self.username, self.password, self.sender = host, port, username, password, sender
+
+    def send(self, delivery):
+        if not delivery['address']:
+            raise ValueError("No email address")
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = delivery['address']
+        message['Subject'] = delivery['title']
+        message.set_content(delivery['message'])
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            if self.username:
+                smtp.starttls()
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+class TwilioSmsSender:
+    def __init__(self, account_sid, auth_token, from_number):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    def send(self, delivery):
+        if not delivery['address']:
+            raise ValueError("No phone number")
+        self.client.messages.create(to=delivery['address'], from_=self.from_number,
+                                    body=f"{delivery['title']}: {delivery['message']}")
+
+class LogSender:
+    """Logs instead of delivering; used for channels without a configured provider"""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def send(self, delivery):
+        logger.info(f"[{self.channel}] user {delivery['user_id']}: {delivery['title']}")
+
+class FakeSender:
+    """Records deliveries; fails the first `failures` attempts per user to exercise retries"""
+
+    def __init__(self, failures=0, latency=0.0):
+        self.failures = failures
+        self.latency = latency
+        self.sent = []
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def send(self, delivery):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            attempts = self._attempts[delivery['user_id']] = self._attempts.get(delivery['user_id'], 0) + 1
+            if attempts <= self.failures:
+                raise ConnectionError("Simulated provider failure")
+            self.sent.append(delivery)
+
+# Delivery
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class ChannelWorker:
+    """
+    Delivers one channel with bounded concurrency, a rate limit and retries
+    with exponential backoff and jitter.
+    """
+
+    def __init__(self, channel, sender, concurrency=8, rate_per_second=50, max_attempts=3, backoff_seconds=0.5):
+        self.channel = channel
+        self.sender = sender
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.limiter = RateLimiter(rate_per_second) if rate_per_second else None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"notify-{channel}")
+        self._slots = threading.BoundedSemaphore(concurrency * 50)  # backpressure on the batch consumer
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.counters = {'sent': 0, 'failed': 0, 'retries': 0, 'throttled_seconds': 0.0}
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def submit(self, delivery):
+        self._slots.acquire()
+        with self._idle:
+            self._pending += 1
+        self._executor.submit(self._deliver, delivery)
+
+    def _deliver(self, delivery):
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                if self.limiter:
+                    self._count('throttled_seconds', self.limiter.acquire())
+                try:
+                    self.sender.send(delivery)
+                    self._count('sent')
+                    return
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        self._count('failed')
+                        logger.error(f"{self.channel} delivery to user {delivery['user_id']} failed: {e}")
+                        return
+                    self._count('retries')
+                    time.sleep(self.backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        finally:
+            self._slots.release()
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout=None):
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'throttled_seconds': round(self.counters['throttled_seconds'], 3),
+                    'pending': self._pending}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+class NotificationDispatcher:
+    """
+    Queue-backed fan-out of one notification to many users.
+    notify() splits the audience into batches and enqueues them. For each batch, the consumer:
+    - loads preferences and contact details with one query each for the whole batch,
+    - bulk-inserts the notifications rows (the in-app channel) for users who accept in_app,
+      in the same transaction,
+    - hands email / sms / push deliveries to the per-channel workers, skipping users with no
+      address for the channel (they would only fail and be retried).
+    """
+
+    def __init__(self, engine, broker=None, senders=None, batch_size=None, channel_options=None):
+        self.engine = engine
+        self.broker = broker or InProcessBroker()
+        self.batch_size = batch_size or Config.NOTIFY_BATCH_SIZE
+        senders = senders or {}
+        channel_options = channel_options or {}
+        self.channels = {
+            channel: ChannelWorker(channel, senders.get(channel) or LogSender(channel),
+                                   **{**Config.NOTIFY_CHANNEL_OPTIONS.get(channel, {}),
+                                      **channel_options.get(channel, {})})
+            for channel in CHANNELS
+        }
+        self._outstanding = 0  # batches enqueued by this process and not yet processed
+        self._outstanding_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.counters = {'jobs': 0, 'batches': 0, 'notifications': 0, 'errors': 0, 'no_address': 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, daemon=True, name='notify-consumer')
+            self._thread.start()
+        return self
+
+    def notify(self, user_ids, title, message, notification_type):
+        """Enqueues one notification for every user id; returns the number of batches queued"""
+        user_ids = list(dict.fromkeys(int(u) for u in user_ids))
+        for start in range(0, len(user_ids), self.batch_size):
+            with self._outstanding_lock:
+                self._outstanding += 1
+            self.broker.put({'user_ids': user_ids[start:start + self.batch_size], 'title': title,
+                             'message': message, 'notification_type': notification_type})
+        self.counters['jobs'] += 1
+        return -(-len(user_ids) // self.batch_size)
+
+    def notify_growers(self, crop_name, title, message, notification_type, district=None):
+        """Notifies every farmer with a current planting of the crop (optionally in one district)"""
+        sql = ("SELECT DISTINCT f.user_id FROM crops c JOIN farmers f ON f.id = c.farmer_id "
+               "WHERE c.crop_name = :crop AND c.status != 'harvested' AND f.user_id IS NOT NULL")
+        params = {'crop': crop_name}
+        if district:
+            sql += " AND f.district = :district"
+            params['district'] = district
+        with self.engine.connect() as connection:
+            user_ids = [row[0] for row in connection.execute(text(sql), params)]
+        self.notify(user_ids, title, message, notification_type)
+        return len(user_ids)
+
+    def run(self):
+        """Consumer loop: processes queued batches until stop()"""
+        while not self._stopped.is_set():
+            job = self.broker.get(timeout=0.5)
+            if job is None:
+                continue
+            try:
+                self.process_batch(job)
+            except Exception as e:
+                self.counters['errors'] += 1
+                logger.error(f"Notification batch failed: {e}")
+            finally:
+                with self._outstanding_lock:
+                    self._outstanding -= 1
+
+    def process_batch(self, job):
+        user_ids = job['user_ids']
+        now = datetime.utcnow().isoformat(sep=' ')
+        with self.engine.begin() as connection:
+            preferences = self._preferences(connection, user_ids)
+            contacts = self._contacts(connection, user_ids)
+            in_app = [user_id for user_id in user_ids if preferences.get(user_id, DEFAULT_PREFERENCES)['in_app']]
+            if in_app:
+                connection.execute(text(
+                    "INSERT INTO notifications (user_id, title, message, notification_type, is_read, created_at) "
+                    "VALUES (:user_id, :title, :message, :notification_type, 0, :created_at)"),
+                    [{'user_id': user_id, 'title': job['title'], 'message': job['message'],
+                      'notification_type': job['notification_type'], 'created_at': now} for user_id in in_app])
+        self.counters['batches'] += 1
+        self.counters['notifications'] += len(in_app)
+
+        for user_id in user_ids:
+            prefs = preferences.get(user_id, DEFAULT_PREFERENCES)
+            for channel in CHANNELS:
+                if not prefs[channel]:
+                    continue
+                address = contacts.get(user_id, {}).get('phone' if channel == 'sms' else channel)
+                if not address:
+                    self.counters['no_address'] += 1
+                    continue
+                self.channels[channel].submit({
+                    'user_id': user_id,
+                    'channel': channel,
+                    'address': address,
+                    'title': job['title'],
+                    'message': job['message'],
+                    'notification_type': job['notification_type']
+                })
+
+    def _preferences(self, connection, user_ids):
+        rows = connection.execute(text(
+            "SELECT user_id, in_app, email, sms, push FROM notification_preferences WHERE user_id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True)), {'ids': user_ids})
+        return {row[0]: {'in_app': bool(row[1]), 'email': bool(row[2]), 'sms': bool(row[3]), 'push': bool(row[4])}
+                for row in rows}
+
+    def _contacts(self, connection, user_ids):
+        """Email from users, phone from the farmer or shop profile"""
+        rows = connection.execute(text(
+            "SELECT u.id, u.email, COALESCE(f.phone, s.phone) FROM users u "
+            "LEFT JOIN farmers f ON f.user_id = u.id LEFT JOIN shops s ON s.user_id = u.id "
+            "WHERE u.id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True)), {'ids': user_ids})
+        return {row[0]: {'email': row[1], 'phone': row[2], 'push': str(row[0])} for row in rows}
+
+    def drain(self, timeout=30.0):
+        """Waits until the broker is empty and every delivery has finished (for tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._outstanding > 0:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return all(worker.wait_idle(max(0.0, deadline - time.monotonic())) for worker in self.channels.values())
+
+    def stop(self, timeout=10.0):
+        self.drain(timeout)
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for worker in self.channels.values():
+            worker.shutdown()
+
+    def stats(self):
+        return {**self.counters, 'queued_batches': self.broker.size(),
+                'channels': {channel: worker.stats() for channel, worker in self.channels.items()}}
+
+def default_senders():
+    """Real providers where credentials are configured, log-only senders otherwise"""
+    senders = {}
+    if Config.SMTP_HOST:
+        senders['email'] = SmtpEmailSender(Config.SMTP_HOST, Config.SMTP_PORT, Config.SMTP_USERNAME,
+                                           Config.SMTP_PASSWORD)
+    if Config.TWILIO_ACCOUNT_SID:
+        senders['sms'] = TwilioSmsSender(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN, Config.TWILIO_FROM_NUMBER)
+    return senders
+
+notification_dispatcher = None
+
+def create_notification_dispatcher(engine, start=True):
+    global notification_dispatcher
+    broker = RedisBroker(Config.REDIS_URL) if Config.NOTIFY_BROKER == 'redis' else InProcessBroker()
+    notification_dispatcher = NotificationDispatcher(engine, broker, default_senders())
+    # With the redis broker, delivery runs in `python -m backend.notification_dispatcher worker`
+    if start and Config.NOTIFY_BROKER != 'redis':
+        notification_dispatcher.start()
+    return notification_dispatcher
+
+if __name__ == '__main__':
+    # Usage: python -m backend.notification_dispatcher worker [db_path]
+    from sqlalchemy import create_engine
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'worker':
+        sys.exit("Usage: python -m backend.notification_dispatcher worker [db_path]")
+    engine = create_engine(f"sqlite:///{sys.argv[2] if len(sys.argv) > 2 else Config.DB_PATH}")
+    dispatcher = create_notification_dispatcher(engine, start=False)
+    dispatcher.run()
@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import String, literal, or_, select, type_coerce
+
+# Keyset pagination over (timestamp, id), newest first. Rows are read as plain column tuples
+# from the model's table, so no ORM instances are built, and each page is one index range scan
+# however deep into the history it starts.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+def encode_cursor(sort_value, row_id):
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Takes: a cursor from encode_cursor
+    Returns: (sort value, id); raises ValueError for anything else
+    """
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(sort_value, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return sort_value, row_id
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+def keyset_page(connection, table, sort_column, filters, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Takes: a connection, a Table, the name of its timestamp column, {column: value} equality
+           filters, the cursor returned with the previous page, page size
+    Returns: (rows as dicts with the same keys as the model's to_dict, cursor of the next page or None)
+    """
+    sort = table.c[sort_column]
+    # The cursor carries the stored text, not a parsed datetime: timestamps written with and
+    # without microseconds only order consistently when compared as stored
+    raw_sort = type_coerce(sort, String)
+    query = select(*table.c, raw_sort.label('sort_key')) \
+        .where(*[table.c[column] == value for column, value in filters.items()])
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        after = literal(sort_value, String)
+        # The <= bound gives SQLite an index range; the OR breaks ties on id
+        query = query.where(raw_sort <= after, or_(raw_sort < after, table.c.id < row_id))
+    query = query.order_by(sort.desc(), table.c.id.desc()).limit(limit + 1)
+
+    rows = connection.execute(query).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].sort_key, rows[-1].id)
+    columns = [column.name for column in table.c]
+    return [{name: _jsonable(value) for name, value in zip(columns, row)} for row in rows], next_cursor
+
+def iter_rows(connection, table, sort_column, filters, cursor=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields every matching row (newest first) one keyset page at a time, so memory stays
+    bounded by batch_size for any history length and no read cursor stays open between pages.
+    """
+    while True:
+        rows, cursor = keyset_page(connection, table, sort_column, filters, cursor, batch_size)
+        yield from rows
+        if cursor is None:
+            return
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, separators=(',', ':')) + '\n'
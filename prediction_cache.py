@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+class PredictionCache:
+    """
+    Size-bounded LRU cache of raw model outputs, keyed on
+    (model name, model version, encoded feature row bytes).
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {}  # model name -> {'hits': n, 'misses': n}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get_many(self, model, version, keys):
+        """Returns the cached output for each key, or None where there is no entry"""
+        found = []
+        with self._lock:
+            counters = self._counters.setdefault(model, {'hits': 0, 'misses': 0})
+            for key in keys:
+                value = self._entries.get((model, version, key))
+                if value is None:
+                    counters['misses'] += 1
+                else:
+                    self._entries.move_to_end((model, version, key))
+                    counters['hits'] += 1
+                found.append(value)
+        return found
+
+    def put_many(self, model, version, keys, values):
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[(model, version, key)] = value
+                self._entries.move_to_end((model, version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, model=None):
+        """Drops every entry, or only the entries of one model"""
+        with self._lock:
+            if model is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == model]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            sizes = {}
+            for model, _, _ in self._entries:
+                sizes[model] = sizes.get(model, 0) + 1
+            models = {}
+            for model, counters in self._counters.items():
+                lookups = counters['hits'] + counters['misses']
+                models[model] = {
+                    **counters,
+                    'hit_rate': round(counters['hits'] / lookups, 4) if lookups else 0.0,
+                    'size': sizes.get(model, 0)
+                }
+            return {'size': len(self._entries), 'max_entries': self.max_entries, 'models': models}
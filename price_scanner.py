@@ -0,0 +1,358 @@
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+logger = logging.getLogger(__name__)
+
+# Model severities -> price_alerts.risk_level. A pair with no scan state counts as LOW,
+# so the first full scan only writes alerts for MEDIUM/HIGH pairs.
+RISK_LEVELS = {'High': 'HIGH', 'Medium': 'MEDIUM', 'Low': 'LOW', 'None': 'LOW'}
+BASELINE_RISK = 'LOW'
+
+# Market signal windows: current week vs previous week, harvests due within the horizon count as supply
+PRICE_WINDOW_DAYS = 7
+HARVEST_HORIZON_DAYS = 14
+
+# Same tables as schema.sql, for databases created before the scanner
+SCAN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_scan_state (
+    crop_name TEXT NOT NULL,
+    district TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    current_price REAL,
+    predicted_price REAL,
+    scanned_at TIMESTAMP,
+    PRIMARY KEY (crop_name, district)
+);
+CREATE TABLE IF NOT EXISTS price_scan_watermarks (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Source table -> (crop, district) pairs touched by rows in an id range. Between full scans only
+# these pairs are rescored; status changes on existing rows wait for the next full scan.
+DIRTY_PAIRS = {
+    'crops': "SELECT DISTINCT c.crop_name, f.district FROM crops c JOIN farmers f ON f.id = c.farmer_id "
+             "WHERE c.id > :low AND c.id <= :high AND c.status != 'harvested'",
+    'transactions': "SELECT DISTINCT t.crop_name, f.district FROM transactions t JOIN farmers f ON f.id = t.seller_id "
+                    "WHERE t.id > :low AND t.id <= :high",
+    'crop_listings': "SELECT DISTINCT crop_name, location FROM crop_listings WHERE id > :low AND id <= :high",
+    'demand_posts': "SELECT DISTINCT d.vegetable_name, s.location FROM demand_posts d JOIN shops s ON s.id = d.shop_id "
+                    "WHERE d.id > :low AND d.id <= :high"
+}
+
+# One grouped query per signal; each returns (crop_name, district, ...)
+GROWERS_SQL = """
+    SELECT c.crop_name, f.district, COUNT(DISTINCT c.farmer_id),
+           SUM(CASE WHEN c.expected_harvest <= :horizon THEN c.quantity_kg ELSE 0 END)
+    FROM crops c JOIN farmers f ON f.id = c.farmer_id
+    WHERE c.status != 'harvested' AND f.district IS NOT NULL {crop_filter}
+    GROUP BY 1, 2
+"""
+PRICES_SQL = """
+    SELECT t.crop_name, f.district,
+           SUM(CASE WHEN t.transaction_date >= :week THEN t.price_per_unit END),
+           COUNT(CASE WHEN t.transaction_date >= :week THEN 1 END),
+           SUM(CASE WHEN t.transaction_date < :week THEN t.price_per_unit END),
+           COUNT(CASE WHEN t.transaction_date < :week THEN 1 END),
+           SUM(CASE WHEN t.transaction_date >= :week THEN t.quantity ELSE 0 END)
+    FROM transactions t JOIN farmers f ON f.id = t.seller_id
+    WHERE t.transaction_date >= :fortnight AND t.transaction_date < :as_of {crop_filter}
+    GROUP BY 1, 2
+"""
+LISTINGS_SQL = "SELECT crop_name, location, SUM(quantity) FROM crop_listings WHERE status = 'available' GROUP BY 1, 2"
+DEMAND_SQL = """
+    SELECT d.vegetable_name, s.location, SUM(d.required_quantity)
+    FROM demand_posts d JOIN shops s ON s.id = d.shop_id
+    WHERE d.status = 'open'
+    GROUP BY 1, 2
+"""
+
+# One alert per grower of a pair; :min_crop_id > 0 limits it to plantings added since the last scan
+ALERT_SQL = text("""
+    INSERT INTO price_alerts (farmer_id, crop_name, alert_type, current_price, predicted_crash_price, risk_level, created_at)
+    SELECT DISTINCT c.farmer_id, c.crop_name, :alert_type, :current_price, :predicted_price, :risk_level, :now
+    FROM crops c JOIN farmers f ON f.id = c.farmer_id
+    WHERE c.crop_name = :crop_name AND f.district = :district AND c.status != 'harvested' AND c.id > :min_crop_id
+""")
+
+def ensure_schema(connection):
+    for statement in SCAN_SCHEMA.split(';'):
+        if statement.strip():
+            connection.execute(text(statement))
+    for name in DIRTY_PAIRS:
+        connection.execute(text("INSERT OR IGNORE INTO price_scan_watermarks (name, last_id) VALUES (:name, 0)"),
+                           {'name': name})
+
+def _frame(connection, sql, columns, params=None, crops=None, crop_column=None):
+    params = dict(params or {})
+    statement = text(sql.format(crop_filter=f"AND {crop_column} IN :crops" if crops else ''))
+    if crops:
+        statement = statement.bindparams(bindparam('crops', expanding=True))
+        params['crops'] = sorted(crops)
+    return pd.DataFrame(connection.execute(statement, params).fetchall(), columns=columns)
+
+def market_signals(connection, as_of, pairs=None):
+    """
+    Builds the price_crash inputs for every active (crop, district) pair from four grouped
+    queries, joined and defaulted column-wise.
+    Takes: a connection, the scan time, optionally the set of pairs to keep
+    Returns: DataFrame [crop_name, district, growers, current_price, prev_week_price, supply, demand]
+             (pairs without any price history for their crop are dropped)
+    """
+    week = as_of - timedelta(days=PRICE_WINDOW_DAYS)
+    keys = ['crop_name', 'district']
+    # Whole crops are read for a partial scan, since the state-wide price fallback needs every district
+    crops = {crop for crop, district in pairs} if pairs is not None else None
+    growers = _frame(connection, GROWERS_SQL, keys + ['growers', 'harvest_kg'],
+                     {'horizon': (as_of + timedelta(days=HARVEST_HORIZON_DAYS)).date().isoformat()},
+                     crops, 'c.crop_name')
+    if pairs is not None:
+        growers = growers[pd.MultiIndex.from_frame(growers[keys]).isin(list(pairs))]
+    prices = _frame(connection, PRICES_SQL, keys + ['cur_sum', 'cur_n', 'prev_sum', 'prev_n', 'sold_kg'], {
+        'week': week.isoformat(sep=' '),
+        'fortnight': (week - timedelta(days=PRICE_WINDOW_DAYS)).isoformat(sep=' '),
+        'as_of': as_of.isoformat(sep=' ')
+    }, crops, 't.crop_name')
+    listings = _frame(connection, LISTINGS_SQL, keys + ['listed_kg'])
+    demand = _frame(connection, DEMAND_SQL, keys + ['wanted_kg'])
+
+    df = growers.merge(prices, on=keys, how='left').merge(listings, on=keys, how='left') \
+                .merge(demand, on=keys, how='left').fillna(0)
+
+    # Pairs without local sales fall back to the crop's state-wide average, and a missing
+    # week to the other one
+    crop_prices = prices.groupby('crop_name')[['cur_sum', 'cur_n', 'prev_sum', 'prev_n']].sum()
+    crop_current = (crop_prices['cur_sum'] / crop_prices['cur_n']).reindex(df['crop_name']).to_numpy()
+    crop_prev = (crop_prices['prev_sum'] / crop_prices['prev_n']).reindex(df['crop_name']).to_numpy()
+    current = (df['cur_sum'] / df['cur_n'].where(df['cur_n'] > 0)).fillna(pd.Series(crop_current, index=df.index))
+    prev = (df['prev_sum'] / df['prev_n'].where(df['prev_n'] > 0)).fillna(pd.Series(crop_prev, index=df.index))
+    df['current_price'] = current.fillna(prev).round(2)
+    df['prev_week_price'] = prev.fillna(current).round(2)
+
+    df['supply'] = (df['harvest_kg'] + df['listed_kg']).round(2)
+    df['demand'] = (df['wanted_kg'] + df['sold_kg']).clip(lower=1.0).round(2)
+    df = df[df['current_price'].notna()]
+    return df[keys + ['growers', 'current_price', 'prev_week_price', 'supply', 'demand']].reset_index(drop=True)
+
+class PriceCrashScanner:
+    """
+    Background price crash scan over every active (crop, district) pair. Pairs are scored
+    in one batch and price_alerts rows are written only for pairs whose risk level changed
+    since the previous scan (plus, between full scans, for new plantings of risky pairs).
+    """
+
+    def __init__(self, engine, ml_service, dispatcher=None):
+        self.engine = engine
+        self.ml_service = ml_service
+        self.dispatcher = dispatcher
+        self.last_scan = None
+        self.counters = {'full_scans': 0, 'incremental_scans': 0, 'alerts_written': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        with engine.begin() as connection:
+            ensure_schema(connection)
+
+    def _new_ranges(self, connection):
+        """Returns: {source: (low, high)} for every source table with rows past its watermark"""
+        ranges = {}
+        for name in DIRTY_PAIRS:
+            low = connection.execute(text("SELECT last_id FROM price_scan_watermarks WHERE name = :name"),
+                                     {'name': name}).scalar() or 0
+            high = connection.execute(text(f"SELECT MAX(id) FROM {name}")).scalar() or 0
+            if high > low:
+                ranges[name] = (low, high)
+        return ranges
+
+    def _advance_watermarks(self, connection, ranges):
+        """
+        Moves each watermark from low to high, in the caller's write transaction so the
+        ranges are only consumed together with the state and alerts scored from them.
+        Returns: False when another scanner moved one first
+        """
+        advanced = True
+        for name, (low, high) in ranges.items():
+            advanced &= bool(connection.execute(
+                text("UPDATE price_scan_watermarks SET last_id = :high WHERE name = :name AND last_id = :low"),
+                {'high': high, 'low': low, 'name': name}).rowcount)
+        return advanced
+
+    def scan(self, full=True, as_of=None):
+        """
+        Takes: full (rescore every pair) or incremental (only pairs touched by rows added
+               since the last scan), optional scan time (default now)
+        Returns: summary {mode, pairs, scored, unscored, changed, alerts_written, timings}
+        """
+        with self._lock:
+            started = time.perf_counter()
+            as_of = as_of or datetime.utcnow()
+            now = datetime.utcnow().isoformat(sep=' ')
+            timings = {}
+
+            pairs = None
+            with self.engine.connect() as connection:
+                ranges = self._new_ranges(connection)
+                if not full:
+                    pairs = set()
+                    for name, (low, high) in ranges.items():
+                        pairs.update(tuple(row) for row in connection.execute(text(DIRTY_PAIRS[name]),
+                                                                             {'low': low, 'high': high}))
+            new_crops_after = ranges['crops'][0] if 'crops' in ranges and not full else None
+            summary = {'mode': 'full' if full else 'incremental', 'pairs': 0, 'scored': 0, 'unscored': 0,
+                       'changed': 0, 'alerts_written': 0}
+            if pairs is not None and not pairs:
+                with self.engine.begin() as connection:
+                    self._advance_watermarks(connection, ranges)
+                summary['seconds'] = round(time.perf_counter() - started, 3)
+                return self._finish(summary, full)
+
+            step = time.perf_counter()
+            with self.engine.connect() as connection:
+                signals = market_signals(connection, as_of, pairs)
+                previous = dict(((row[0], row[1]), row[2]) for row in connection.execute(
+                    text("SELECT crop_name, district, risk_level FROM price_scan_state")))
+            timings['signals'] = round(time.perf_counter() - step, 3)
+
+            step = time.perf_counter()
+            records = signals[['crop_name', 'current_price', 'prev_week_price', 'supply', 'demand', 'district']] \
+                .to_dict('records')
+            results = self.ml_service.detect_price_crash_risk_batch(records) if records else []
+            timings['score'] = round(time.perf_counter() - step, 3)
+
+            step = time.perf_counter()
+            changed, refreshed, new_plantings = [], [], []
+            for record, result in zip(records, results):
+                if not result.get('success'):
+                    summary['unscored'] += 1
+                    continue
+                key = (record['crop_name'], record['district'])
+                row = {'crop_name': key[0], 'district': key[1],
+                       'risk_level': RISK_LEVELS.get(result['risk_level'], BASELINE_RISK),
+                       'current_price': record['current_price'], 'predicted_price': result['predicted_price'],
+                       'now': now, 'old': previous.get(key)}
+                if row['risk_level'] != (row['old'] or BASELINE_RISK):
+                    changed.append(row)
+                else:
+                    refreshed.append(row)
+                    if new_crops_after is not None and row['risk_level'] != BASELINE_RISK:
+                        new_plantings.append(row)
+            summary['pairs'] = len(records)
+            summary['scored'] = len(changed) + len(refreshed)
+
+            won = []
+            with self.engine.connect() as connection, connection.begin() as transaction:
+                if not self._advance_watermarks(connection, ranges) and not full:
+                    # Another scanner took some of these rows since they were read; its scan writes their alerts
+                    transaction.rollback()
+                    changed, refreshed, new_plantings = [], [], []
+                    summary['superseded'] = True
+
+                # Claim each level change against the stored one so concurrent scanners
+                # (one per worker process) never alert the same change twice
+                for row in changed:
+                    if row['old'] is None:
+                        claimed_row = connection.execute(text(
+                            "INSERT OR IGNORE INTO price_scan_state "
+                            "(crop_name, district, risk_level, current_price, predicted_price, scanned_at) VALUES "
+                            "(:crop_name, :district, :risk_level, :current_price, :predicted_price, :now)"), row).rowcount
+                    else:
+                        claimed_row = connection.execute(text(
+                            "UPDATE price_scan_state SET risk_level = :risk_level, current_price = :current_price, "
+                            "predicted_price = :predicted_price, scanned_at = :now "
+                            "WHERE crop_name = :crop_name AND district = :district AND risk_level = :old"), row).rowcount
+                    if claimed_row:
+                        won.append(row)
+                if refreshed:
+                    connection.execute(text(
+                        "INSERT INTO price_scan_state "
+                        "(crop_name, district, risk_level, current_price, predicted_price, scanned_at) VALUES "
+                        "(:crop_name, :district, :risk_level, :current_price, :predicted_price, :now) "
+                        "ON CONFLICT (crop_name, district) DO UPDATE SET current_price = excluded.current_price, "
+                        "predicted_price = excluded.predicted_price, scanned_at = excluded.scanned_at"), refreshed)
+
+                alerts = [dict(row, min_crop_id=0) for row in won] + \
+                         [dict(row, min_crop_id=new_crops_after) for row in new_plantings]
+                for row in alerts:
+                    row['alert_type'] = 'crash_risk_cleared' if row['risk_level'] == BASELINE_RISK else 'crash_risk'
+                if alerts:
+                    summary['alerts_written'] = connection.execute(ALERT_SQL, alerts).rowcount
+            summary['changed'] = len(won)
+            timings['write'] = round(time.perf_counter() - step, 3)
+
+            if self.dispatcher is not None:
+                for row in won:
+                    if row['risk_level'] != BASELINE_RISK:
+                        self.dispatcher.notify_growers(
+                            row['crop_name'], f"{row['crop_name']} price crash risk: {row['risk_level']}",
+                            f"{row['crop_name']} in {row['district']} may fall from Rs {row['current_price']} "
+                            f"to Rs {row['predicted_price']}/kg. Consider selling early or cold storage.",
+                            'price_alert', district=row['district'])
+
+            summary['timings'] = timings
+            summary['seconds'] = round(time.perf_counter() - started, 3)
+            return self._finish(summary, full)
+
+    def _finish(self, summary, full):
+        self.counters['full_scans' if full else 'incremental_scans'] += 1
+        self.counters['alerts_written'] += summary['alerts_written']
+        summary['finished_at'] = datetime.utcnow().isoformat()
+        self.last_scan = summary
+        logger.info(f"Price crash scan: {summary}")
+        return summary
+
+    def start(self, full_interval, incremental_interval):
+        """Runs a full scan now and every full_interval seconds, incremental scans in between"""
+        def loop():
+            last_full = None
+            while not self._stopped.is_set():
+                full = last_full is None or time.monotonic() - last_full >= full_interval
+                try:
+                    self.scan(full=full)
+                    if full:
+                        last_full = time.monotonic()
+                except Exception as e:
+                    self.counters['errors'] += 1
+                    logger.error(f"Price crash scan failed: {e}")
+                self._stopped.wait(incremental_interval)
+
+        self._thread = threading.Thread(target=loop, name='price-crash-scanner', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self):
+        return {'running': self._thread is not None and self._thread.is_alive(), **self.counters,
+                'last_scan': self.last_scan}
+
+price_scanner = None
+
+def create_price_scanner(engine, ml_service, dispatcher=None, start=True):
+    global price_scanner
+    from backend.config import Config
+    price_scanner = PriceCrashScanner(engine, ml_service, dispatcher)
+    if start:
+        price_scanner.start(Config.PRICE_SCAN_FULL_INTERVAL_SECONDS, Config.PRICE_SCAN_INCREMENTAL_INTERVAL_SECONDS)
+    return price_scanner
+
+if __name__ == '__main__':
+    # Usage: python -m backend.price_scanner [full|incremental] [db_path]
+    from sqlalchemy import create_engine
+    from backend.config import Config
+    from backend.ml_service import MLService
+    logging.basicConfig(level=logging.WARNING)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'full'
+    if command not in ('full', 'incremental'):
+        sys.exit(f"Unknown command: {command}")
+    engine = create_engine(f"sqlite:///{sys.argv[2] if len(sys.argv) > 2 else Config.DB_PATH}")
+    scanner = PriceCrashScanner(engine, MLService())
+    print(scanner.scan(full=command == 'full'))
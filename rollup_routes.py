@@ -0,0 +1,56 @@
+from flask import Blueprint, jsonify, request
+from backend import db
+from backend.rollups import trend, top, DIMENSIONS, PERIODS
+
+rollup_bp = Blueprint('rollups', __name__)
+
+# Upper bound on periods per request, so a response reads a bounded number of rollup rows
+MAX_PERIODS = 366
+
+def _period_args(default_period, default_periods):
+    period = request.args.get('period', default_period)
+    periods = request.args.get('periods', default_periods, type=int)
+    if period not in PERIODS:
+        return None, None, (jsonify({"success": False, "error": f"period must be one of {list(PERIODS)}"}), 400)
+    if not periods or not 1 <= periods <= MAX_PERIODS:
+        return None, None, (jsonify({"success": False, "error": f"periods must be between 1 and {MAX_PERIODS}"}), 400)
+    return period, periods, None
+
+@rollup_bp.route('/trends/<dimension>/<key>', methods=['GET'])
+def rollup_trend(dimension, key):
+    """Daily or weekly count/quantity/revenue for one seller, buyer or crop"""
+    if dimension not in DIMENSIONS:
+        return jsonify({"success": False, "error": f"dimension must be one of {list(DIMENSIONS)}"}), 400
+    period, periods, error = _period_args('day', 30)
+    if error:
+        return error
+    series = trend(db.session.connection(), dimension, key, period, periods)
+    return jsonify({
+        "success": True,
+        "dimension": dimension,
+        "key": key,
+        "period": period,
+        "totals": {
+            "transaction_count": sum(p['transaction_count'] for p in series),
+            "quantity": round(sum(p['quantity'] for p in series), 2),
+            "revenue": round(sum(p['revenue'] for p in series), 2)
+        },
+        "series": series
+    })
+
+@rollup_bp.route('/top/<dimension>', methods=['GET'])
+def rollup_top(dimension):
+    """Top sellers, buyers or crops by revenue over recent periods"""
+    if dimension not in DIMENSIONS:
+        return jsonify({"success": False, "error": f"dimension must be one of {list(DIMENSIONS)}"}), 400
+    period, periods, error = _period_args('week', 4)
+    if error:
+        return error
+    limit = max(1, min(request.args.get('limit', 10, type=int) or 10, 100))
+    return jsonify({
+        "success": True,
+        "dimension": dimension,
+        "period": period,
+        "periods": periods,
+        "results": top(db.session.connection(), dimension, period, periods, limit)
+    })
@@ -0,0 +1,195 @@
+import logging
+import sys
+import time
+from datetime import date, timedelta
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Rollup grain: period -> SQL expression giving the period start, dimension -> grouping column.
+# Weeks start on Monday.
+PERIODS = {
+    'day': "date(transaction_date)",
+    'week': "date(transaction_date, 'weekday 0', '-6 days')"
+}
+DIMENSIONS = {
+    'seller': 'seller_id',
+    'buyer': 'buyer_id',
+    'crop': 'crop_name'
+}
+
+WATERMARK = 'transactions'
+
+# Rows folded into the rollups per catch-up transaction
+CATCH_UP_BATCH = 200000
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transaction_rollups (
+    dimension TEXT NOT NULL,
+    group_key TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_start DATE NOT NULL,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    quantity REAL NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, group_key, period, period_start)
+);
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_transaction_rollups_period ON transaction_rollups (dimension, period, period_start);
+"""
+
+def _upsert_sql(dimension, period):
+    # "WHERE true" resolves SQLite's parsing ambiguity between a join constraint and ON CONFLICT
+    return f"""
+        INSERT INTO transaction_rollups (dimension, group_key, period, period_start, transaction_count, quantity, revenue)
+        SELECT '{dimension}', CAST({DIMENSIONS[dimension]} AS TEXT), '{period}', {PERIODS[period]},
+               COUNT(*), SUM(quantity), SUM(total_price)
+        FROM transactions
+        WHERE id > :low AND id <= :high AND true
+        GROUP BY 2, 4
+        ON CONFLICT (dimension, group_key, period, period_start) DO UPDATE SET
+            transaction_count = transaction_count + excluded.transaction_count,
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue
+    """
+
+UPSERTS = {(dimension, period): text(_upsert_sql(dimension, period)) for dimension in DIMENSIONS for period in PERIODS}
+
+def ensure_schema(connection):
+    for statement in ROLLUP_SCHEMA.split(';'):
+        if statement.strip():
+            connection.execute(text(statement))
+    connection.execute(text("INSERT OR IGNORE INTO rollup_watermarks (name, last_id) VALUES (:name, 0)"),
+                       {'name': WATERMARK})
+
+def catch_up(engine, batch_size=CATCH_UP_BATCH):
+    """
+    Folds transactions inserted since the watermark into the rollups, one id range per
+    database transaction. The watermark is claimed with a conditional update before the
+    upserts run, so concurrent callers never apply the same range twice.
+    Takes: a SQLAlchemy engine
+    Returns: number of transactions processed
+    """
+    processed = 0
+    while True:
+        with engine.begin() as connection:
+            low = connection.execute(text("SELECT last_id FROM rollup_watermarks WHERE name = :name"),
+                                     {'name': WATERMARK}).scalar()
+            newest = connection.execute(text("SELECT MAX(id) FROM transactions")).scalar()
+            if low is None or newest is None or newest <= low:
+                return processed
+            high = min(newest, low + batch_size)
+            claimed = connection.execute(
+                text("UPDATE rollup_watermarks SET last_id = :high WHERE name = :name AND last_id = :low"),
+                {'high': high, 'low': low, 'name': WATERMARK}).rowcount
+            if not claimed:
+                continue  # another writer advanced the watermark; re-read it
+            for upsert in UPSERTS.values():
+                connection.execute(upsert, {'low': low, 'high': high})
+            processed += connection.execute(text("SELECT COUNT(*) FROM transactions WHERE id > :low AND id <= :high"),
+                                            {'low': low, 'high': high}).scalar()
+
+def rebuild(engine):
+    """Drops every rollup row and recomputes them from the full transaction history"""
+    with engine.begin() as connection:
+        ensure_schema(connection)
+        connection.execute(text("DELETE FROM transaction_rollups"))
+        connection.execute(text("UPDATE rollup_watermarks SET last_id = 0 WHERE name = :name"), {'name': WATERMARK})
+    return catch_up(engine)
+
+def install_rollup_maintenance(session_class=None):
+    """
+    Keeps the rollups current for ORM writes: after any commit that inserted a
+    Transaction, the new rows are folded in. Bulk loads that bypass the ORM are
+    picked up by the next catch-up (python -m backend.rollups).
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from backend.models import Transaction
+    session_class = session_class or Session
+
+    @event.listens_for(session_class, 'after_flush')
+    def _after_flush(session, flush_context):
+        if any(isinstance(obj, Transaction) for obj in session.new):
+            session.info['rollups_pending'] = True
+
+    @event.listens_for(session_class, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop('rollups_pending', False):
+            try:
+                catch_up(session.get_bind())
+            except Exception as e:
+                # The next commit or the catch-up job retries from the same watermark
+                logger.error(f"Rollup catch-up failed: {e}")
+
+    @event.listens_for(session_class, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('rollups_pending', None)
+
+def _period_starts(period, periods, end):
+    if period == 'day':
+        return [end - timedelta(days=i) for i in range(periods - 1, -1, -1)]
+    monday = end - timedelta(days=end.weekday())
+    return [monday - timedelta(weeks=i) for i in range(periods - 1, -1, -1)]
+
+def trend(connection, dimension, key, period='day', periods=30, end=None):
+    """
+    Takes: dimension ('seller' | 'buyer' | 'crop'), its key, period ('day' | 'week'), number of periods
+    Returns: one {period_start, transaction_count, quantity, revenue} per period ending at `end`,
+             zero-filled, read from at most `periods` rollup rows
+    """
+    if dimension not in DIMENSIONS or period not in PERIODS:
+        raise ValueError(f"Unknown dimension/period: {dimension}/{period}")
+    starts = _period_starts(period, periods, end or date.today())
+    rows = connection.execute(text("""
+        SELECT period_start, transaction_count, quantity, revenue FROM transaction_rollups
+        WHERE dimension = :dimension AND group_key = :key AND period = :period
+          AND period_start BETWEEN :first AND :last
+    """), {'dimension': dimension, 'key': str(key), 'period': period,
+           'first': starts[0].isoformat(), 'last': starts[-1].isoformat()}).fetchall()
+    found = {row[0]: row for row in rows}
+    series = []
+    for start in starts:
+        row = found.get(start.isoformat())
+        series.append({
+            'period_start': start.isoformat(),
+            'transaction_count': row[1] if row else 0,
+            'quantity': round(row[2], 2) if row else 0.0,
+            'revenue': round(row[3], 2) if row else 0.0
+        })
+    return series
+
+def top(connection, dimension, period='week', periods=4, limit=10, end=None):
+    """Top keys of a dimension by revenue over the last `periods` periods"""
+    if dimension not in DIMENSIONS or period not in PERIODS:
+        raise ValueError(f"Unknown dimension/period: {dimension}/{period}")
+    starts = _period_starts(period, periods, end or date.today())
+    rows = connection.execute(text("""
+        SELECT group_key, SUM(transaction_count), SUM(quantity), SUM(revenue) FROM transaction_rollups
+        WHERE dimension = :dimension AND period = :period AND period_start BETWEEN :first AND :last
+        GROUP BY group_key ORDER BY SUM(revenue) DESC LIMIT :limit
+    """), {'dimension': dimension, 'period': period, 'first': starts[0].isoformat(),
+           'last': starts[-1].isoformat(), 'limit': limit}).fetchall()
+    return [{'key': row[0], 'transaction_count': row[1], 'quantity': round(row[2], 2), 'revenue': round(row[3], 2)}
+            for row in rows]
+
+if __name__ == '__main__':
+    # Usage: python -m backend.rollups [catch-up|rebuild] [db_path]
+    from sqlalchemy import create_engine
+    from backend.config import Config
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'catch-up'
+    engine = create_engine(f"sqlite:///{sys.argv[2] if len(sys.argv) > 2 else Config.DB_PATH}")
+    started = time.perf_counter()
+    if command == 'rebuild':
+        processed = rebuild(engine)
+    elif command == 'catch-up':
+        with engine.begin() as connection:
+            ensure_schema(connection)
+        processed = catch_up(engine)
+    else:
+        sys.exit(f"Unknown command: {command}")
+    print(f"{command}: {processed} transactions in {time.perf_counter() - started:.1f}s")
@@ -203,3 +203,55 @@ CREATE TABLE IF NOT EXISTS notification_preferences (
     push BOOLEAN DEFAULT 1,
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
+
+-- 16. Transaction rollups (daily/weekly totals per seller, buyer and crop; maintained by rollups.py)
+CREATE TABLE IF NOT EXISTS transaction_rollups (
+    dimension TEXT NOT NULL, -- seller, buyer, crop
+    group_key TEXT NOT NULL,
+    period TEXT NOT NULL, -- day, week
+    period_start DATE NOT NULL,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    quantity REAL NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, group_key, period, period_start)
+);
+
+-- 17. Rollup watermarks (last transaction id folded into the rollups)
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO rollup_watermarks (name, last_id) VALUES ('transactions', 0);
+CREATE INDEX IF NOT EXISTS ix_transaction_rollups_period ON transaction_rollups (dimension, period, period_start);
+
+-- 18. Price scan state (last crash risk level of each crop/district pair; maintained by price_scanner.py)
+CREATE TABLE IF NOT EXISTS price_scan_state (
+    crop_name TEXT NOT NULL,
+    district TEXT NOT NULL,
+    risk_level TEXT NOT NULL, -- LOW, MEDIUM, HIGH
+    current_price REAL,
+    predicted_price REAL,
+    scanned_at TIMESTAMP,
+    PRIMARY KEY (crop_name, district)
+);
+
+-- 19. Price scan watermarks (last id of each source table rescored by an incremental scan)
+CREATE TABLE IF NOT EXISTS price_scan_watermarks (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO price_scan_watermarks (name, last_id) VALUES
+    ('crops', 0), ('transactions', 0), ('crop_listings', 0), ('demand_posts', 0);
+
+-- Secondary indexes (keep in sync with INDEXES in db_tuning.py; existing databases: python -m backend.db_tuning migrate)
+CREATE INDEX IF NOT EXISTS ix_transactions_seller_date ON transactions (seller_id, transaction_date);
+CREATE INDEX IF NOT EXISTS ix_transactions_buyer_date ON transactions (buyer_id, transaction_date);
+CREATE INDEX IF NOT EXISTS ix_transactions_date_total ON transactions (transaction_date, total_price);
+CREATE INDEX IF NOT EXISTS ix_notifications_user_created ON notifications (user_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_notifications_user_unread ON notifications (user_id, is_read);
+CREATE INDEX IF NOT EXISTS ix_price_alerts_farmer_created ON price_alerts (farmer_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_activity_logs_user_created ON activity_logs (user_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_activity_logs_created_feature ON activity_logs (created_at, feature);
+CREATE INDEX IF NOT EXISTS ix_ai_recommendations_farmer_created ON ai_recommendations (farmer_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_spoilage_checks_farmer_created ON spoilage_checks (farmer_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_crops_farmer ON crops (farmer_id);
@@ -0,0 +1,13 @@
+import warnings
+import pytest
+from backend.train_models import train_bundle
+
+@pytest.fixture(scope='session')
+def bundle_dir(tmp_path_factory):
+    """A small versioned bundle of all four models, trained once per test run"""
+    root = tmp_path_factory.mktemp('bundles')
+    with warnings.catch_warnings():
+        # Five trees leave some rows without out-of-bag scores
+        warnings.simplefilter('ignore', UserWarning)
+        manifest = train_bundle(str(root), n_estimators=5, n_jobs=1)
+    return str(root / manifest['version'])
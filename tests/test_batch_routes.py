@@ -0,0 +1,85 @@
+import os
+import pytest
+from flask import Flask
+import backend.ml_service as ml_service
+from backend.batch_routes import batch_bp
+from backend.ml_service import MLService
+
+MAX_ITEMS = 4
+
+@pytest.fixture(scope='module')
+def service(bundle_dir):
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    return service
+
+@pytest.fixture
+def client(service, monkeypatch):
+    monkeypatch.setattr(ml_service, '_ml_service', service)
+    app = Flask(__name__)
+    app.config['ML_BATCH_MAX_ITEMS'] = MAX_ITEMS
+    app.register_blueprint(batch_bp, url_prefix='/api/predict')
+    return app.test_client()
+
+def _farm(**overrides):
+    return {'district': 'Salem', 'season': 'Kharif', 'soil_type': 'Loamy', 'water_availability': 'High',
+            'irrigation_type': 'Borewell', 'land_size_acres': 2, 'previous_crop': 'Rice',
+            'market_demand_level': 'High', 'temperature_avg': 30, 'humidity': 70, 'rainfall_mm': 100, **overrides}
+
+# Per model: the batch method, the single-item method, and items with one bad entry in the middle
+CASES = {
+    'crop': ('get_crop_recommendations_batch', 'get_crop_recommendations',
+             [_farm(), _farm(soil_type='Peaty'), _farm(soil_type='Red', top_k=2)]),
+    'demand': ('forecast_demand_batch', 'forecast_demand',
+               [{'crop_name': 'Tomato', 'market_location': 'Chennai', 'horizon_days': 3, 'current_price': 30},
+                {'crop_name': 'Tomato', 'horizon_days': 0},
+                {'crop_names': ['Onion', 'Tomato'], 'market_locations': ['Chennai'], 'horizon_days': 2, 'supply': 800}]),
+    'price-crash': ('detect_price_crash_risk_batch', 'detect_price_crash_risk',
+                    [{'crop_name': 'Tomato', 'current_price': 20, 'prev_week_price': 35},
+                     {'crop_name': 'Tomato', 'current_price': 'cheap', 'prev_week_price': 35},
+                     {'crop_name': 'Onion', 'current_price': 40, 'prev_week_price': 38, 'supply': 2000}]),
+    'spoilage': ('predict_spoilage_risk_batch', 'predict_spoilage_risk',
+                 [{'crop_name': 'Tomato', 'transport_hours': 12, 'storage_temp': 22, 'humidity': 70},
+                  {'crop_name': 'Moonfruit', 'transport_hours': 12},
+                  {'crop_name': 'Onion', 'transport_hours': 30, 'storage_method': 'Cold Storage'}])
+}
+
+def _comparable(result):
+    return {key: value for key, value in result.items() if key != 'timestamp'}
+
+@pytest.mark.parametrize('model', list(CASES))
+def test_batch_matches_single_calls_and_isolates_errors(service, client, model):
+    batch_method, single_method, items = CASES[model]
+    response = client.post(f"/api/predict/{model}/batch", json={'items': items})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] and body['count'] == 3 and body['failed'] == 1
+
+    results = body['results']
+    assert [result['success'] for result in results] == [True, False, True]
+    assert results[1]['error']
+    singles = [getattr(service, single_method)(item) for item in items]
+    assert [_comparable(result) for result in results] == [_comparable(result) for result in singles]
+    # The bare list form gives the same results as {"items": [...]}
+    bare = client.post(f"/api/predict/{model}/batch", json=items).get_json()['results']
+    assert [_comparable(result) for result in bare] == [_comparable(result) for result in results]
+
+def test_a_failing_item_does_not_change_its_neighbours(service):
+    _, _, items = CASES['spoilage']
+    alone = service.predict_spoilage_risk_batch([items[0], items[2]])
+    mixed = service.predict_spoilage_risk_batch(items)
+    assert [mixed[0], mixed[2]] == alone
+
+@pytest.mark.parametrize('size, status', [(MAX_ITEMS, 200), (MAX_ITEMS + 1, 413)])
+def test_batch_size_is_limited(client, size, status):
+    response = client.post("/api/predict/crop/batch", json=[_farm()] * size)
+    assert response.status_code == status
+    if status == 413:
+        assert response.get_json() == {'success': False, 'error': f"Batch too large ({size} > {MAX_ITEMS} items)"}
+
+@pytest.mark.parametrize('payload', [{'farm': _farm()}, [_farm(), 'Salem'], 'Salem', None])
+def test_malformed_batches_are_rejected(client, payload):
+    response = client.post("/api/predict/crop/batch", json=payload)
+    assert response.status_code == 400 and not response.get_json()['success']
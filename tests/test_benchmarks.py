@@ -0,0 +1,43 @@
+import json
+import os
+import pytest
+import backend.ml_service as ml_service
+from backend.benchmarks import WORKLOADS, main
+from backend.ml_service import MLService
+from backend.train_models import DATA_DIR
+
+PERCENTILES = {'n', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'}
+
+@pytest.fixture
+def service(bundle_dir, monkeypatch):
+    """The app's service, serving the test bundle"""
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    monkeypatch.setattr(ml_service, '_ml_service', service)
+    return service
+
+def test_smoke_run_writes_every_section(service, tmp_path, capsys):
+    out, baseline = str(tmp_path / 'bench.json'), str(tmp_path / 'baseline.json')
+    options = ['--data-dir', DATA_DIR, '--calls', '5', '--duration', '0.2', '--concurrency', '1,2',
+               '--skip-startup', '--plan-calls', '0']
+    main(options + ['--out', baseline])
+    main(options + ['--out', out, '--compare', baseline])
+
+    with open(out) as f:
+        results = json.load(f)
+    assert set(results) == {'meta', 'latency', 'throughput', 'memory'}
+    assert results['meta']['calls'] == 5 and results['meta']['duration_seconds'] == 0.2
+    assert set(results['latency']) == set(results['throughput']) == set(WORKLOADS)
+    for model in WORKLOADS:
+        assert set(results['latency'][model]) == PERCENTILES and results['latency'][model]['n'] == 5
+        assert set(results['throughput'][model]) == {'1', '2'}
+        for run in results['throughput'][model].values():
+            assert set(run) == PERCENTILES | {'requests_per_second', 'errors'}
+            assert run['errors'] == 0 and run['requests_per_second'] > 0
+    assert results['memory']['peak_rss_mb'] > 0
+
+    # --compare prints one line per numeric result present in both runs
+    printed = capsys.readouterr().out
+    assert 'latency.crop.p50_ms' in printed and 'throughput.spoilage.2.requests_per_second' in printed
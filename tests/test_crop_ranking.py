@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from backend.crop_ranking import CANDIDATE_PRIOR, CropRanker
+
+@pytest.fixture(scope='module')
+def ranker():
+    ranker = CropRanker()
+    ranker.load()  # CSV tables only
+    return ranker
+
+def _key_with_both(tables):
+    """A (district, season, soil_type) key with a candidate and a non-candidate crop, and their columns"""
+    for key, row in tables.index.items():
+        if key[0] is not None and 0 < tables.candidates[row].sum() < len(tables.crops):
+            return key, int(np.argmax(tables.candidates[row])), int(np.argmin(tables.candidates[row]))
+
+def _first(ranker, key, probs):
+    top, typical, _, _ = ranker.rank(np.array([probs]), ranker.tables.crops, [key], [2])
+    return int(top[0, 0]), bool(typical[0, 0])
+
+def test_candidate_is_only_a_bounded_prior(ranker):
+    key, candidate, other = _key_with_both(ranker.tables)
+
+    def probs(candidate_p, other_p):
+        p = np.zeros(len(ranker.tables.crops))
+        p[candidate], p[other] = candidate_p, other_p
+        return p
+
+    # A long-shot candidate doesn't beat the model's clear favourite
+    assert _first(ranker, key, probs(0.01, 0.9)) == (other, False)
+    # Within the prior, and on ties, the crop typical for the area wins
+    assert _first(ranker, key, probs(0.5, 0.5 + CANDIDATE_PRIOR / 2)) == (candidate, True)
+    assert _first(ranker, key, probs(0.4, 0.4)) == (candidate, True)
+    # A candidate the model rules out doesn't get lifted
+    assert _first(ranker, key, probs(0.0, 0.0001)) == (other, False)
+
+def test_keys_match_regardless_of_case(ranker):
+    tables = ranker.tables
+    key, _, _ = _key_with_both(tables)
+    district, season, soil = (part.upper() for part in key)
+    assert tables.row(f" {district} ", season.lower(), soil) == tables.index[key]
+
+    probs = np.full((1, len(tables.crops)), 1 / len(tables.crops))
+    unmatched = ranker.counters['unmatched_keys']
+    ranker.rank(probs, tables.crops, [(district, season, soil)], [3])
+    assert ranker.counters['unmatched_keys'] == unmatched
+
+    # An unknown district still ranks, on its season's row, and is counted
+    row, exact = tables.lookup('Atlantis', season, soil)
+    assert row == tables.index[(None, key[1], None)] and not exact
+    ranker.rank(probs, tables.crops, [('Atlantis', season, soil)], [3])
+    assert ranker.counters['unmatched_keys'] == unmatched + 1
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import pytest
+from sqlalchemy import create_engine, text
+from backend.config import Config
+from backend.db_tuning import INDEXES, install_sqlite_pragmas, migrate, seed_bench_db
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+def _indexes(path):
+    with sqlite3.connect(path) as connection:
+        return {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def test_pragmas_are_set_on_every_new_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    install_sqlite_pragmas(engine)
+    expected = {'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -Config.SQLITE_CACHE_SIZE_KB,
+                'temp_store': 2, 'busy_timeout': Config.SQLITE_BUSY_TIMEOUT_MS,
+                'mmap_size': Config.SQLITE_MMAP_SIZE}
+    # Two connections open at once, so the second one is new rather than reused from the pool
+    with engine.connect() as first, engine.connect() as second:
+        for connection in (first, second):
+            assert {name: connection.execute(text(f"PRAGMA {name}")).scalar() for name in expected} == expected
+    engine.dispose()
+
+    # An engine without the listener keeps SQLite's per-connection defaults
+    plain = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    with plain.connect() as connection:
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 2
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == 'wal'  # persisted in the file
+    plain.dispose()
+
+def test_migrate_is_idempotent(tmp_path):
+    path = str(tmp_path / 'bench.db')
+    seed_bench_db(path, 5000, schema_path=SCHEMA)
+    assert not _indexes(path) & {name for name, _, _ in INDEXES}
+
+    assert migrate(path) == [name for name, _, _ in INDEXES]
+    indexes = _indexes(path)
+    assert {name for name, _, _ in INDEXES} <= indexes
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert connection.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+
+    assert migrate(path) == []
+    assert _indexes(path) == indexes
+
+def test_migrate_skips_tables_the_database_does_not_have(tmp_path):
+    path = str(tmp_path / 'partial.db')
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE notifications (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                           "is_read BOOLEAN, created_at TIMESTAMP)")
+    assert migrate(path) == [name for name, table, _ in INDEXES if table == 'notifications']
+    assert migrate(path) == []
@@ -0,0 +1,40 @@
+import os
+from datetime import datetime
+import numpy as np
+import pytest
+from backend.forest_engine import feature_columns
+from backend.ml_service import MLService
+
+@pytest.fixture(scope='module')
+def service(bundle_dir):
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    return service
+
+@pytest.mark.parametrize('key', ['crop_names', 'market_locations'])
+def test_names_that_are_not_lists_are_rejected(service, key):
+    result = service.forecast_demand({key: 'Tomato' if key == 'crop_names' else 'Chennai', 'horizon_days': 3})
+    assert result == {'success': False, 'error': f"{key} must be a list"}
+
+def test_matrix_columns_follow_the_trained_feature_order(service):
+    state = service._state('demand')
+    tables = state.tables
+    crop, city = tables['vegetable_name'].classes[0], tables['city'].classes[-1]
+    start = datetime(2026, 12, 30)
+    X, series, dates = service._forecast_matrix(state, {
+        'crop_names': [crop], 'market_locations': [city], 'horizon_days': 4, 'current_price': 42.5, 'supply': 750
+    }, start)
+
+    features = feature_columns(service, 'demand')
+    assert X.shape == (4, len(features)) == (4, state.model['model_price'].n_features_in_)
+    column = {name: X[:, i] for i, name in enumerate(features)}
+    assert (column['vegetable_name'] == tables['vegetable_name'].encode_one(crop)).all()
+    assert (column['city'] == tables['city'].encode_one(city)).all()
+    assert (column['season'] == tables['season'].encode_one('Summer')).all()
+    assert column['month'].tolist() == [12, 12, 1, 1]
+    assert column['year'].tolist() == [2026, 2026, 2027, 2027]
+    assert (column['prev_price_rs'] == 42.5).all()
+    assert (column['prev_demand_kg'] == 750).all() and (column['supply_volume_kg'] == 750).all()
+    assert series == [(crop, city)] and len(dates) == 4
@@ -0,0 +1,82 @@
+import os
+import warnings
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+import pandas as pd
+from backend.encoding import CategoryTable, UNKNOWN_FALLBACK, compile_encoders
+from backend.ml_service import MLService, UNKNOWN_CATEGORY_FALLBACKS, _timed_predict
+
+SOILS = ['Red', 'Loamy', 'Clay', 'Black', 'Sandy', 'Loamy']
+
+@pytest.fixture(scope='module')
+def encoder():
+    return LabelEncoder().fit(SOILS)
+
+def test_codes_and_classes_match_label_encoder(encoder):
+    table = CategoryTable(encoder.classes_)
+    values = ['Sandy', 'Red', 'Red', 'Black', 'Clay', 'Loamy']
+    codes, unknown = table.encode(values)
+    assert codes.tolist() == encoder.transform(values).tolist()
+    assert not unknown.any()
+    assert table.decode(codes).tolist() == encoder.inverse_transform(codes).tolist()
+    assert [table.encode_one(value) for value in values] == encoder.transform(values).tolist()
+
+def test_unknown_values_are_rejected_under_the_error_policy(encoder):
+    table = CategoryTable(encoder.classes_)
+    codes, unknown = table.encode(['Red', 'Peaty'])
+    assert codes.tolist() == [encoder.transform(['Red'])[0], -1]
+    assert unknown.tolist() == [False, True]
+    with pytest.raises(ValueError, match="Unknown category: 'Peaty'"):
+        table.encode_one('Peaty')
+
+def test_unknown_values_take_the_fallback_under_the_fallback_policy(encoder):
+    table = CategoryTable(encoder.classes_, UNKNOWN_FALLBACK, 'Loamy')
+    loamy = encoder.transform(['Loamy'])[0]
+    codes, unknown = table.encode(['Peaty', 'Red'])
+    assert codes.tolist() == [loamy, encoder.transform(['Red'])[0]]
+    assert unknown.tolist() == [True, False]  # still reported, so callers can say what was substituted
+    assert table.encode_one('Peaty') == loamy
+
+    # A fallback the encoder doesn't know falls back to the first class
+    assert CategoryTable(encoder.classes_, UNKNOWN_FALLBACK, 'Peaty').encode_one('Silt') == 0
+
+def test_compile_encoders_applies_fallbacks_per_column(encoder):
+    districts = LabelEncoder().fit(['Salem', 'Erode', 'Madurai'])
+    tables = compile_encoders({'soil_type': encoder, 'district': districts, 'scaler': object()},
+                              {'district': 'Salem'})
+    assert set(tables) == {'soil_type', 'district'}
+    assert tables['district'].encode_one('Atlantis') == districts.transform(['Salem'])[0]
+    with pytest.raises(ValueError):
+        tables['soil_type'].encode_one('Peaty')
+
+@pytest.fixture(scope='module')
+def service(bundle_dir):
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    return service
+
+def _farm(**overrides):
+    return {'district': 'Salem', 'season': 'Kharif', 'soil_type': 'Loamy', 'water_availability': 'High',
+            'irrigation_type': 'Borewell', 'land_size_acres': 2, 'previous_crop': 'Rice',
+            'market_demand_level': 'High', 'temperature_avg': 30, 'humidity': 70, 'rainfall_mm': 100, **overrides}
+
+def test_service_falls_back_only_for_configured_columns(service):
+    assert 'district' in UNKNOWN_CATEGORY_FALLBACKS and 'soil_type' not in UNKNOWN_CATEGORY_FALLBACKS
+    unknown_district, unknown_soil = service.get_crop_recommendations_batch(
+        [_farm(district='Atlantis'), _farm(soil_type='Peaty')])
+    assert unknown_district['success'] and unknown_district['unknown_categories'] == {'district': 'Atlantis'}
+    assert not unknown_soil['success'] and unknown_soil['error'] == "Unknown soil_type: 'Peaty'"
+
+def test_feature_name_warning_is_silenced_only_around_scoring():
+    X = pd.DataFrame({'a': [0.0, 1.0, 2.0, 3.0], 'b': [1.0, 0.0, 1.0, 0.0]})
+    model = RandomForestRegressor(n_estimators=2, random_state=0).fit(X, [0.0, 1.0, 2.0, 3.0])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        _timed_predict('test', 'model', model.predict, X.to_numpy())
+        assert not caught
+        model.predict(X.to_numpy())
+    assert any('valid feature names' in str(warning.message) for warning in caught)
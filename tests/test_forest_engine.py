@@ -0,0 +1,28 @@
+import os
+import pytest
+from backend.forest_engine import check_parity, feature_columns
+from backend.ml_service import MLService
+from backend.train_models import DATA_DIR, TRAINING_SPECS
+
+@pytest.fixture(scope='module')
+def service(bundle_dir):
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    return service
+
+def test_columns_come_from_the_manifest(service):
+    # Fit on arrays, so sklearn knows no column names
+    assert not hasattr(service.models['crop'], 'feature_names_in_')
+    assert feature_columns(service, 'crop')[:3] == ['land_area', 'soil_type', 'water_availability']
+    assert 'recommended_crop' not in feature_columns(service, 'crop')
+
+@pytest.mark.parametrize('name', list(TRAINING_SPECS))
+def test_flat_engine_matches_sklearn(service, name):
+    report = check_parity(service, DATA_DIR, names=[name])[name]
+    targets = TRAINING_SPECS[name]['targets']
+    assert sorted(report) == ([name] if None in targets else sorted(targets))
+    for sub_name, result in report.items():
+        assert result['rows'] > 0
+        assert result['identical'], f"{name}.{sub_name} differs from sklearn"
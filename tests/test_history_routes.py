@@ -0,0 +1,101 @@
+import base64
+import json
+import os
+import sqlite3
+import pytest
+from flask import Flask
+from backend import db
+from backend.history_routes import history_bp
+from backend.models import Notification
+from backend.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+# Stored timestamps, three notifications each, inserted out of order; with and without microseconds
+STAMPS = ['2026-03-01 10:00:00', '2026-03-02 08:30:00.250000', '2026-03-01 10:00:00.500000', '2026-02-28 23:59:59']
+BULK_USER = 2
+
+@pytest.fixture
+def app(tmp_path):
+    path = str(tmp_path / 'history.db')
+    with sqlite3.connect(path) as connection:
+        with open(SCHEMA) as f:
+            connection.executescript(f.read())
+        for i in range(3):
+            connection.executemany(
+                "INSERT INTO notifications (user_id, title, message, notification_type, is_read, created_at) "
+                "VALUES (1, ?, 'Body', 'price_alert', ?, ?)",
+                [(f"Alert {stamp} {i}", i % 2, stamp) for stamp in STAMPS])
+        connection.executemany(
+            "INSERT INTO notifications (user_id, title, created_at) VALUES (?, 'Bulk', '2026-01-01 00:00:00')",
+            [(BULK_USER,)] * (MAX_PAGE_SIZE + 20))
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    app.register_blueprint(history_bp, url_prefix='/api/history')
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _expected_ids(app):
+    """Newest first by the stored text, ties broken by the highest id"""
+    with app.app_context():
+        rows = db.session.execute(db.text(
+            "SELECT id, CAST(created_at AS TEXT) FROM notifications WHERE user_id = 1")).fetchall()
+    return [row_id for row_id, _ in sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)]
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 5])
+def test_pages_cover_every_row_once_across_ties(app, client, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = f"?limit={limit}" + (f"&cursor={cursor}" if cursor else '')
+        body = client.get(f"/api/history/notifications/1{query}").get_json()
+        assert body['success'] and body['count'] == len(body['notifications']) <= limit
+        ids += [row['id'] for row in body['notifications']]
+        cursor, pages = body['next_cursor'], pages + 1
+        assert body['has_more'] == (cursor is not None)
+        if cursor is None:
+            break
+    assert ids == _expected_ids(app)
+    assert pages == -(-len(ids) // limit)
+
+def test_cursor_round_trips():
+    assert decode_cursor(encode_cursor('2026-03-01 10:00:00.500000', 7)) == ('2026-03-01 10:00:00.500000', 7)
+
+def _b64(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', _b64(['2026-03-01', 7, 'extra']), _b64([20260301, 7]),
+                                    _b64(['2026-03-01', '7']), _b64({'sort': '2026-03-01', 'id': 7}), '%25%25'])
+@pytest.mark.parametrize('export', [False, True])
+def test_invalid_cursors_are_rejected(client, cursor, export):
+    query = f"?cursor={cursor}" + ('&format=ndjson' if export else '')
+    response = client.get(f"/api/history/notifications/1{query}")
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'error': 'Invalid cursor'}
+
+@pytest.mark.parametrize('limit, expected', [(None, 50), ('0', 50), ('-5', 1), ('abc', 50), ('7', 7),
+                                             (str(MAX_PAGE_SIZE + 1), MAX_PAGE_SIZE), ('100000', MAX_PAGE_SIZE)])
+def test_limit_is_clamped(client, limit, expected):
+    query = '' if limit is None else f"?limit={limit}"
+    body = client.get(f"/api/history/notifications/{BULK_USER}{query}").get_json()
+    assert body['count'] == expected and body['has_more']
+
+def test_ndjson_export_matches_to_dict(app, client):
+    response = client.get("/api/history/notifications/1?format=ndjson")
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in lines] == _expected_ids(app)
+    with app.app_context():
+        expected = {n.id: n.to_dict() for n in db.session.query(Notification).filter_by(user_id=1)}
+    for row in lines:
+        assert list(row) == list(expected[row['id']])
+        assert row == expected[row['id']]
+
+def test_ndjson_export_resumes_from_a_cursor(app, client):
+    page = client.get("/api/history/notifications/1?limit=5").get_json()
+    response = client.get(f"/api/history/notifications/1?format=ndjson&cursor={page['next_cursor']}")
+    ids = [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()]
+    assert ids == _expected_ids(app)[5:]
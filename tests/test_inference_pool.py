@@ -0,0 +1,74 @@
+import os
+import signal
+import time
+import pytest
+import backend.inference_pool as inference_pool
+from backend.inference_pool import InferencePool
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Workers inherit the environment: keep them to the models only
+    for name in ('MODEL_RELOAD_ENABLED', 'CROP_RANKING_HISTORY', 'WEATHER_CLIENT_ENABLED'):
+        monkeypatch.setenv(name, '0')
+    pool = InferencePool(workers=1, timeout=60, load_mode='lazy')
+    yield pool
+    pool.shutdown()
+
+def _wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_killed_worker_fails_inflight_jobs_and_is_replaced(pool):
+    # The worker is still importing, so this job is certainly in flight when it dies
+    future = pool._submit('raw', 'health', ())
+    _wait_for(lambda: pool.stats()['inflight_jobs'] == 1)
+    os.kill(pool._workers[0].process.pid, signal.SIGKILL)
+    with pytest.raises(RuntimeError, match='exited'):
+        future.result(timeout=30)
+
+    health = pool.health()
+    assert health.get('pool', {}).get('workers') == 1, health
+    stats = pool.stats()
+    assert stats['worker_restarts'] == 1
+    assert stats['failed_by_worker_exit'] == 1
+    assert stats['inflight_jobs'] == 0
+
+def test_idle_worker_killed_twice_keeps_serving(pool):
+    assert 'pool' in pool.health()
+    for restarts in (1, 2):
+        os.kill(pool._workers[0].process.pid, signal.SIGKILL)
+        _wait_for(lambda: pool.stats()['worker_restarts'] == restarts)
+        assert 'pool' in pool.health()
+    assert pool.stats()['failed_by_worker_exit'] == 0
+
+def _stub_worker(jobs, results, *args):
+    """Worker stand-in: answers every job at once, except plan_spoilage_routes, which never returns"""
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, method, _ = job
+        if method == 'plan_spoilage_routes':
+            time.sleep(3600)
+        results.send((job_id, {'method': method}, None))
+
+def test_hung_worker_is_killed_and_its_slots_freed(monkeypatch):
+    monkeypatch.setattr(inference_pool, '_worker_main', _stub_worker)
+    pool = InferencePool(workers=1, timeout=0.5, load_mode='lazy')
+    try:
+        # More hung jobs than the pool has slots (workers * 2)
+        hung = [pool._submit('raw', 'plan_spoilage_routes', ({},)) for _ in range(3)]
+        for future in hung:
+            with pytest.raises(RuntimeError, match='timed out'):
+                future.result(timeout=30)
+
+        # The dispatcher isn't stuck on a slot: new calls reach a fresh worker
+        _wait_for(lambda: pool._call_raw('cache_stats', ()) == {'method': 'cache_stats'})
+        stats = pool.stats()
+        assert stats['hung_workers'] >= 2
+        assert stats['inflight_jobs'] == 0
+        assert stats['workers'] == 1
+    finally:
+        pool.shutdown()
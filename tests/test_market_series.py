@@ -0,0 +1,135 @@
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+from backend.market_series import MarketSeries, install_market_series_maintenance
+from backend.models import Transaction
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+HISTORY_DAYS = 30
+FARMERS = {1: 'Salem', 2: 'Erode', 3: None}  # farmer 3 has no district, so only counts state-wide
+
+def _day(days_ago):
+    return date.today() - timedelta(days=days_ago)
+
+def _trades():
+    """(seller, crop, days ago, kg, price): a few trades most days, some outside the window"""
+    trades = []
+    for days_ago in range(0, HISTORY_DAYS + 10):
+        for seller in FARMERS:
+            if (days_ago + seller) % 3:
+                trades.append((seller, 'Tomato', days_ago, 10 + days_ago + seller, 20 + (days_ago * seller) % 7))
+        if days_ago % 4 == 0:
+            trades.append((1, 'Onion', days_ago, 50, 31.5))
+    return trades
+
+@pytest.fixture
+def engine(tmp_path):
+    path = str(tmp_path / 'market.db')
+    with sqlite3.connect(path) as connection:
+        with open(SCHEMA) as f:
+            connection.executescript(f.read())
+        for farmer_id, district in FARMERS.items():
+            connection.execute("INSERT INTO farmers (id, name, district) VALUES (?, ?, ?)",
+                               (farmer_id, f"Farmer {farmer_id}", district))
+        connection.executemany(
+            "INSERT INTO transactions (seller_id, buyer_id, crop_name, quantity, price_per_unit, total_price, "
+            "transaction_date) VALUES (?, 1, ?, ?, ?, ?, ?)",
+            [(seller, crop, kg, price, kg * price, f"{_day(days_ago).isoformat()} 09:30:00")
+             for seller, crop, days_ago, kg, price in _trades()])
+        this_month = date.today().replace(day=1)
+        for months_ago, volume in ((1, 900.0), (3, 700.0)):
+            month = (this_month - timedelta(days=28 * months_ago)).replace(day=1)
+            connection.execute("INSERT INTO market_demand (vegetable_name, month, year, demand_volume, avg_price, city) "
+                               "VALUES ('Tomato', ?, ?, ?, 24.0, 'Chennai')", (month.month, month.year, volume))
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def series(engine):
+    series = MarketSeries(HISTORY_DAYS)
+    with engine.connect() as connection:
+        series.load(connection)
+    return series
+
+def _sql_window(engine, crop, district, first, last):
+    """Trades, kg and average price per trade between two days, inclusive, straight from SQL"""
+    where = "AND f.district = :district" if district else ""
+    with engine.connect() as connection:
+        return connection.execute(text(f"""
+            SELECT COUNT(*), COALESCE(SUM(t.quantity), 0), AVG(t.price_per_unit)
+            FROM transactions t LEFT JOIN farmers f ON f.id = t.seller_id
+            WHERE t.crop_name = :crop AND date(t.transaction_date) BETWEEN :first AND :last {where}
+        """), {'crop': crop, 'district': district, 'first': first.isoformat(), 'last': last.isoformat()}).fetchone()
+
+@pytest.mark.parametrize('crop, location', [('Tomato', 'Salem'), ('Tomato', 'Erode'), ('Tomato', None), ('Onion', 'Salem')])
+@pytest.mark.parametrize('days, offset', [(7, 0), (7, 7), (1, 3), (HISTORY_DAYS, 0)])
+def test_window_matches_sql(engine, series, crop, location, days, offset):
+    trades, quantity, price = _sql_window(engine, crop, location, _day(offset + days - 1), _day(offset))
+    got = series.window(crop.upper(), location and location.lower(), days, offset=offset)
+    assert (got['trades'], got['quantity']) == (trades, pytest.approx(quantity))
+    assert got['avg_price'] == (None if price is None else pytest.approx(price))
+
+@pytest.mark.parametrize('crop, location', [('Tomato', 'Erode'), ('Tomato', None), ('Onion', 'Salem')])
+def test_rolling_average_matches_sql(engine, series, crop, location):
+    rolling = series.rolling_average(crop, location, window=5, days=12)
+    assert rolling['dates'] == [_day(days_ago).isoformat() for days_ago in range(11, -1, -1)]
+    for day, price, quantity in zip(rolling['dates'], rolling['avg_price'], rolling['quantity']):
+        last = date.fromisoformat(day)
+        _, sql_quantity, sql_price = _sql_window(engine, crop, location, last - timedelta(days=4), last)
+        assert price == (None if sql_price is None else round(sql_price, 2))
+        assert quantity == round(sql_quantity / 5, 2)
+
+def test_features_match_sql_and_fall_back_state_wide(engine, series):
+    _, _, current = _sql_window(engine, 'Tomato', 'Salem', _day(6), _day(0))
+    _, _, previous = _sql_window(engine, 'Tomato', 'Salem', _day(13), _day(7))
+    assert series.features('Tomato', 'Salem') == {'current_price': round(current, 2), 'prev_week_price': round(previous, 2)}
+
+    # No Onion trades in Erode, so the state-wide prices are used; Chennai has market_demand records
+    _, _, onion = _sql_window(engine, 'Onion', None, _day(6), _day(0))
+    assert series.features('Onion', 'Erode')['current_price'] == round(onion, 2)
+    assert series.features('Tomato', 'Chennai')['prev_demand_kg'] == 900.0
+    assert series.features('Okra', 'Salem') == {}
+
+def test_orm_commits_are_caught_up(engine, series):
+    class MarketSession(Session):
+        pass
+
+    install_market_series_maintenance(MarketSession, series)
+    before = series.window('Okra', 'Erode', 1)
+    with sessionmaker(bind=engine, class_=MarketSession)() as session:
+        session.add(Transaction(seller_id=2, buyer_id=1, crop_name='Okra', quantity=12, price_per_unit=40,
+                                total_price=480, transaction_date=datetime.combine(_day(0), datetime.min.time())))
+        session.commit()
+
+    assert before['trades'] == 0
+    assert series.window('Okra', 'Erode', 1) == {'days': 1, 'trades': 1, 'quantity': 12.0, 'avg_price': 40.0}
+    assert series.window('Okra', None, 1)['trades'] == 1
+    assert series.stats()['catch_ups'] == 1
+
+def test_catch_up_swaps_in_a_copy_and_drops_expired_days(engine):
+    series = MarketSeries(HISTORY_DAYS)
+    with engine.connect() as connection:
+        series.load(connection, end=_day(9))
+    old = series._grid
+    first_day, oldest = series.stats()['first_day'], series.window('Tomato', None, 1, offset=HISTORY_DAYS + 8)
+    assert first_day == _day(HISTORY_DAYS + 8).isoformat() and oldest['trades'] > 0
+    snapshot = old.daily.copy()
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO transactions (seller_id, buyer_id, crop_name, quantity, price_per_unit, "
+                                "total_price, transaction_date) VALUES (1, 1, 'Tomato', 5, 20, 100, :day)"),
+                           {'day': f"{_day(0).isoformat()} 08:00:00"})
+    with engine.connect() as connection:
+        assert series.catch_up(connection) > 0
+
+    # A reader still holding the old grid saw no partial update
+    assert series._grid is not old and (old.daily == snapshot).all()
+    assert series.stats()['first_day'] == _day(HISTORY_DAYS - 1).isoformat()
+    assert series.window('Tomato', None, 1, offset=HISTORY_DAYS + 8)['trades'] == 0
+    trades, _, _ = _sql_window(engine, 'Tomato', None, _day(HISTORY_DAYS - 1), _day(0))
+    assert series.window('Tomato', None, HISTORY_DAYS)['trades'] == trades
@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker
+from backend.matching import MatchingIndex, install_matching_maintenance
+from backend.models import CropListing, DemandPost
+
+def test_posts_from_shops_created_after_load_match_their_location(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matching.db'}")
+    for model in (CropListing, DemandPost):
+        model.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE shops (id INTEGER PRIMARY KEY, location TEXT)"))
+        connection.execute(text("INSERT INTO shops (id, location) VALUES (1, 'Chennai')"))
+
+    class MatchingSession(Session):
+        pass
+
+    index = MatchingIndex()
+    install_matching_maintenance(MatchingSession, index)
+    with engine.connect() as connection:
+        index.load(connection)
+
+    # A shop registered after the index was loaded
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO shops (id, location) VALUES (2, 'Salem')"))
+    with sessionmaker(bind=engine, class_=MatchingSession)() as session:
+        session.add(DemandPost(shop_id=2, vegetable_name='Tomato', required_quantity=100, target_price=30))
+        session.commit()
+
+    assert index.shop_locations[2] == 'Salem'
+    matches = index.posts_for_listing('Tomato', 'Salem', 25)
+    assert [match['shop_id'] for match in matches] == [2]
+    assert matches[0]['location'] == 'Salem' and matches[0]['location_match']
+
+def test_commit_applies_flushed_values_without_reloading_objects(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matching.db'}")
+    for model in (CropListing, DemandPost):
+        model.__table__.create(engine)
+
+    class MatchingSession(Session):
+        pass
+
+    index = MatchingIndex()
+    install_matching_maintenance(MatchingSession, index)
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    with sessionmaker(bind=engine, class_=MatchingSession)() as session:
+        listing = CropListing(farmer_id=1, crop_name='Onion', quantity=200, price_per_unit=22, location='Erode')
+        session.add(listing)
+        session.flush()
+        listing_id = listing.id
+        # Objects expired before the commit must not be loaded again by the hook
+        session.expire_all()
+        flushed = len(statements)
+        session.commit()
+        assert statements[flushed:] == []
+    assert [match['farmer_id'] for match in index.listings_for_post('Onion', 'Erode', 25)] == [1]
+
+    with sessionmaker(bind=engine, class_=MatchingSession)() as session:
+        session.get(CropListing, listing_id).status = 'sold'
+        session.flush()
+        session.expire_all()
+        session.commit()
+    assert index.listings_for_post('Onion', 'Erode', 25) == []
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from backend.metrics import DEFAULT_BUCKETS, Histogram, MetricsRegistry, install_sqlalchemy_metrics, metrics
+
+def test_values_land_in_the_first_bucket_they_fit():
+    histogram = Histogram()
+    for value in (0.0001, 0.0005, 0.0006, 0.3, 99.0):
+        histogram.observe(value)
+    counts, total, count = histogram.snapshot()
+    assert len(counts) == len(DEFAULT_BUCKETS) + 1
+    # Bounds are inclusive (le), and anything past the last bound goes to +Inf
+    assert counts[0] == 2 and counts[1] == 1
+    assert counts[DEFAULT_BUCKETS.index(0.5)] == 1 and counts[-1] == 1
+    assert (total, count) == (pytest.approx(99.3012), 5)
+
+def test_render_is_cumulative_prometheus_text():
+    registry = MetricsRegistry()
+    registry.describe('ml_stage_seconds', 'Time per stage')
+    registry.observe('ml_stage_seconds', 0.002, stage='encode', model='crop')
+    registry.observe('ml_stage_seconds', 0.2, stage='encode', model='crop')
+    registry.observe('plain_seconds', 20)
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ['# HELP ml_stage_seconds Time per stage', '# TYPE ml_stage_seconds histogram']
+    assert 'ml_stage_seconds_bucket{model="crop",stage="encode",le="0.001"} 0' in lines
+    assert 'ml_stage_seconds_bucket{model="crop",stage="encode",le="0.0025"} 1' in lines
+    assert 'ml_stage_seconds_bucket{model="crop",stage="encode",le="10.0"} 2' in lines
+    assert 'ml_stage_seconds_bucket{model="crop",stage="encode",le="+Inf"} 2' in lines
+    assert 'ml_stage_seconds_count{model="crop",stage="encode"} 2' in lines
+    assert '# HELP plain_seconds' not in '\n'.join(lines)
+    assert lines[-3:] == ['plain_seconds_bucket{le="+Inf"} 1', 'plain_seconds_sum 20.0', 'plain_seconds_count 1']
+
+def test_render_merges_worker_snapshots():
+    registry, worker = MetricsRegistry(), MetricsRegistry()
+    registry.observe('ml_predict_seconds', 0.01, model='crop')
+    worker.observe('ml_predict_seconds', 0.01, model='crop')
+    worker.observe('ml_predict_seconds', 3.0, model='crop')
+    worker.observe('ml_predict_seconds', 0.01, model='demand')
+    lines = registry.render([worker.snapshot(), worker.snapshot()]).splitlines()
+    assert 'ml_predict_seconds_count{model="crop"} 5' in lines
+    assert 'ml_predict_seconds_bucket{model="crop",le="0.01"} 3' in lines
+    assert 'ml_predict_seconds_count{model="demand"} 2' in lines
+    # Rendering doesn't change the registry itself
+    assert registry.histogram('ml_predict_seconds', model='crop').count == 1
+
+def _queries(operation, table):
+    return metrics.histogram('db_query_seconds', operation=operation, table=table).count
+
+def test_sqlalchemy_metrics_time_only_the_installed_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'timed.db'}")
+    other = create_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    install_sqlalchemy_metrics(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE crops (id INTEGER PRIMARY KEY, name TEXT)"))
+    with other.begin() as connection:
+        connection.execute(text("CREATE TABLE crops (id INTEGER PRIMARY KEY, name TEXT)"))
+    inserts, selects = _queries('INSERT', 'crops'), _queries('SELECT', 'crops')
+
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO crops (name) VALUES ('Tomato')"))
+        connection.execute(text("SELECT c.name FROM crops c")).fetchall()
+    with other.begin() as connection:
+        connection.execute(text("INSERT INTO crops (name) VALUES ('Onion')"))
+    assert (_queries('INSERT', 'crops'), _queries('SELECT', 'crops')) == (inserts + 1, selects + 1)
+
+    # A failed statement doesn't leave its start time behind for the next one
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing"))
+        assert connection.info['query_started'] == []
+        connection.execute(text("SELECT COUNT(*) FROM crops")).scalar()
+    assert _queries('SELECT', 'crops') == selects + 2
+    engine.dispose()
+    other.dispose()
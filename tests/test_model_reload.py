@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import threading
+import time
+import pytest
+from backend.ml_service import MLService
+from backend.model_reload import ModelReloader, REJECTED
+from backend.train_models import MANIFEST, TRAINING_SPECS
+
+def _serving(root, version):
+    """A service started on root/version, as a fresh process would be"""
+    service = MLService(load_mode='lazy')
+    service.models_root = root
+    service.bundle, service.models_dir = version, os.path.join(root, version)
+    service.load_all_models()
+    return service
+
+def test_rollback_without_flat_files_raises(tmp_path, bundle_dir):
+    root = str(tmp_path)
+    shutil.copytree(bundle_dir, os.path.join(root, 'v1'))
+    service = _serving(root, 'v1')
+    reloader = ModelReloader(service)
+
+    # The root has no flat files, so there is nothing to fall back to
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(pytest.raises(LookupError, reloader.rollback, 'test')),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert outcome, "rollback did not return"
+    assert os.path.exists(os.path.join(root, 'v1', REJECTED))
+    assert service.bundle == 'v1'
+    # The lock was released: later checks return instead of hanging
+    assert reloader.check() is None
+
+def _hammer(bundle_dir, root, seconds, threads, cycles_per_second):
+    """
+    Serves price crash and demand predictions from `threads` threads while the main thread
+    keeps publishing new copies of a bundle, publishing corrupt bundles (every fifth version),
+    and rolling back.
+    Returns: counts of predictions, failures, reloads, rejections and rollbacks
+    """
+    shutil.copytree(bundle_dir, os.path.join(root, 'v0'))
+    service = _serving(root, 'v0')
+    reloader = ModelReloader(service)
+
+    prices = [{'crop_name': crop, 'current_price': price, 'prev_week_price': price * 1.2, 'supply': 1500,
+               'demand': 700, 'district': 'Salem'} for crop in ('Tomato', 'Onion', 'Beans') for price in (18, 30, 45)]
+    forecast = [{'crop_name': 'Tomato', 'current_price': 30, 'supply': 500, 'horizon_days': 7}]
+    done = threading.Event()
+    lock = threading.Lock()
+    totals = {'predictions': 0, 'failures': 0}
+    failures = []
+
+    def client():
+        while not done.is_set():
+            results = service.detect_price_crash_risk_batch(prices) + service.forecast_demand_batch(forecast)
+            bad = [r for r in results if not r.get('success')]
+            with lock:
+                totals['predictions'] += len(results)
+                totals['failures'] += len(bad)
+                if len(failures) < 3:
+                    failures.extend(bad[:3 - len(failures)])
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    started, step = time.perf_counter(), 0
+    try:
+        while time.perf_counter() - started < seconds:
+            step += 1
+            version = f"v{step:06d}"
+            if step % 5 == 0:
+                # Corrupt bundle: must be rejected while the old version keeps serving
+                os.makedirs(os.path.join(root, version))
+                with open(os.path.join(root, version, MANIFEST), 'w') as f:
+                    json.dump({'version': version, 'models': {}}, f)
+                for spec in TRAINING_SPECS.values():
+                    for filename in spec['files']:
+                        with open(os.path.join(root, version, filename), 'wb') as f:
+                            f.write(b'not a pickle')
+            else:
+                shutil.copytree(bundle_dir, os.path.join(root, f".{version}.tmp"))
+                os.rename(os.path.join(root, f".{version}.tmp"), os.path.join(root, version))
+            reloader.check()
+            if step % 3 == 0 and service.bundle != 'v0':
+                reloader.rollback('hammer test')
+            time.sleep(1.0 / cycles_per_second)
+    finally:
+        done.set()
+        for worker in workers:
+            worker.join()
+    return {**totals, 'sample_failures': failures, 'reloads': reloader.counters['reloads'],
+            'rejected': reloader.counters['rejected'], 'rollbacks': reloader.counters['rollbacks'],
+            'serving': service.bundle}
+
+def test_predictions_survive_reloads_and_corrupt_bundles(tmp_path, bundle_dir):
+    root = str(tmp_path)
+    report = _hammer(bundle_dir, root, seconds=4, threads=4, cycles_per_second=5)
+    assert report['predictions'] > 0
+    assert report['failures'] == 0, report['sample_failures']
+    assert report['reloads'] > 0 and report['rollbacks'] > 0
+
+    # Every fifth version is corrupt: each one was rejected and none is serving
+    corrupt = [version for version in os.listdir(root) if version != 'v0' and int(version[1:]) % 5 == 0]
+    assert corrupt
+    assert report['rejected'] >= len(corrupt)
+    assert all(os.path.exists(os.path.join(root, version, REJECTED)) for version in corrupt)
+    assert report['serving'] not in corrupt
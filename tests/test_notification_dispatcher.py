@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import time
+import pytest
+from sqlalchemy import create_engine, event, text
+from backend.notification_dispatcher import FakeSender, InProcessBroker, NotificationDispatcher, RateLimiter
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+USERS = 12
+NO_IN_APP = {2, 7}  # users who turned the in-app channel off
+SMS = {3, 4, 5}  # users who turned sms on
+NO_PHONE = 13  # a shop user with sms on and no phone number
+
+@pytest.fixture
+def engine(tmp_path):
+    path = str(tmp_path / 'notify.db')
+    with sqlite3.connect(path) as connection:
+        with open(SCHEMA) as f:
+            connection.executescript(f.read())
+        for user_id in range(1, USERS + 1):
+            connection.execute("INSERT INTO users (id, name, email, password_hash, role) VALUES (?, ?, ?, 'x', 'farmer')",
+                               (user_id, f"User {user_id}", f"user{user_id}@example.com"))
+            connection.execute("INSERT INTO farmers (user_id, name, phone) VALUES (?, ?, ?)",
+                               (user_id, f"User {user_id}", f"90000000{user_id:02d}"))
+            if user_id in NO_IN_APP | SMS:
+                connection.execute("INSERT INTO notification_preferences (user_id, in_app, email, sms, push) "
+                                   "VALUES (?, ?, 1, ?, 0)", (user_id, user_id not in NO_IN_APP, user_id in SMS))
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+def _dispatcher(engine, senders, batch_size=5, **options):
+    options = {'concurrency': 4, 'rate_per_second': 0, 'max_attempts': 3, 'backoff_seconds': 0.01, **options}
+    return NotificationDispatcher(engine, InProcessBroker(), senders, batch_size,
+                                  {channel: options for channel in ('email', 'sms', 'push')}).start()
+
+def test_batches_follow_each_users_preferences(engine):
+    senders = {channel: FakeSender() for channel in ('email', 'sms', 'push')}
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    dispatcher = _dispatcher(engine, senders)
+    try:
+        assert dispatcher.notify(range(1, USERS + 1), 'Price drop', 'Tomato fell 20%', 'price_alert') == 3
+        assert dispatcher.drain()
+    finally:
+        dispatcher.stop()
+
+    # One insert and two lookups per batch of five
+    assert dispatcher.counters['batches'] == 3
+    assert sum(sql.startswith('INSERT INTO notifications') for sql in statements) == 3
+    assert sum(sql.startswith('SELECT') for sql in statements) == 6
+
+    with engine.connect() as connection:
+        in_app = connection.execute(text("SELECT user_id FROM notifications ORDER BY user_id")).scalars().all()
+    assert in_app == [u for u in range(1, USERS + 1) if u not in NO_IN_APP]
+    assert dispatcher.counters['notifications'] == len(in_app)
+    assert sorted(d['user_id'] for d in senders['email'].sent) == list(range(1, USERS + 1))
+    assert sorted(d['address'] for d in senders['sms'].sent) == [f"90000000{u:02d}" for u in sorted(SMS)]
+    assert sorted(d['user_id'] for d in senders['push'].sent) == [u for u in range(1, USERS + 1)
+                                                                  if u not in NO_IN_APP | SMS]
+
+def test_failed_deliveries_are_retried_up_to_max_attempts(engine):
+    flaky, broken = FakeSender(failures=2), FakeSender(failures=3)
+    dispatcher = _dispatcher(engine, {'email': flaky, 'push': broken})
+    try:
+        dispatcher.notify([1, 6], 'Demand', 'New demand post', 'demand_update')
+        assert dispatcher.drain()
+    finally:
+        dispatcher.stop()
+
+    email, push = dispatcher.channels['email'].stats(), dispatcher.channels['push'].stats()
+    assert (email['sent'], email['retries'], email['failed']) == (2, 4, 0)
+    assert (push['sent'], push['retries'], push['failed']) == (0, 4, 2)
+    assert len(flaky.sent) == 2 and not broken.sent
+
+def test_channel_rate_limit_spaces_out_deliveries(engine):
+    sender = FakeSender()
+    dispatcher = _dispatcher(engine, {'email': sender}, batch_size=USERS, rate_per_second=10)
+    started = time.perf_counter()
+    try:
+        dispatcher.notify(range(1, USERS + 1), 'Weather', 'Heavy rain expected', 'recommendation')
+        assert dispatcher.drain()
+    finally:
+        dispatcher.stop()
+    # A burst of 10, then the last two emails wait a tenth of a second each
+    assert len(sender.sent) == USERS
+    assert time.perf_counter() - started >= 0.15
+    assert dispatcher.channels['email'].stats()['throttled_seconds'] > 0
+
+def test_rate_limiter_refills_with_the_clock():
+    now = [0.0]
+    limiter = RateLimiter(rate=2, burst=2, clock=lambda: now[0])
+    assert limiter.acquire() == 0 and limiter.acquire() == 0
+    now[0] = 0.5  # one token back
+    assert limiter.acquire() == 0
+
+def test_users_without_an_address_are_skipped_not_retried(engine):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, password_hash, role) "
+                                "VALUES (:id, 'Shop', 'shop@example.com', 'x', 'shop')"), {'id': NO_PHONE})
+        connection.execute(text("INSERT INTO shops (user_id, owner_name, shop_name) VALUES (:id, 'Owner', 'Shop')"),
+                           {'id': NO_PHONE})
+        connection.execute(text("INSERT INTO notification_preferences (user_id, in_app, email, sms, push) "
+                                "VALUES (:id, 1, 0, 1, 0)"), {'id': NO_PHONE})
+    sender = FakeSender()
+    dispatcher = _dispatcher(engine, {'sms': sender}, backoff_seconds=1.0)
+    try:
+        dispatcher.notify([3, NO_PHONE], 'Price drop', 'Onion fell 15%', 'price_alert')
+        assert dispatcher.drain(timeout=1.0)
+    finally:
+        dispatcher.stop()
+    assert [d['user_id'] for d in sender.sent] == [3]
+    assert dispatcher.counters['no_address'] == 1
+    sms = dispatcher.channels['sms'].stats()
+    assert (sms['sent'], sms['retries'], sms['failed']) == (1, 0, 0)
@@ -0,0 +1,109 @@
+import os
+import numpy as np
+import pytest
+import backend.ml_service as ml_service
+from backend.ml_service import MLService
+from backend.prediction_cache import PredictionCache
+
+def test_least_recently_used_entries_are_evicted_at_the_bound():
+    cache = PredictionCache(max_entries=3)
+    cache.put_many('crop', 'v1', [b'a', b'b', b'c'], [1, 2, 3])
+    assert cache.get_many('crop', 'v1', [b'a']) == [1]  # b is now the least recently used
+    cache.put_many('crop', 'v1', [b'd'], [4])
+    assert cache.get_many('crop', 'v1', [b'a', b'b', b'c', b'd']) == [1, None, 3, 4]
+    assert cache.stats()['size'] == 3
+
+def test_keys_include_the_model_and_its_version():
+    cache = PredictionCache()
+    cache.put_many('crop', 'v1', [b'row'], [0.7])
+    assert cache.get_many('crop', 'v2', [b'row']) == [None]
+    assert cache.get_many('spoilage', 'v1', [b'row']) == [None]
+    assert cache.get_many('crop', 'v1', [b'row']) == [0.7]
+
+def test_invalidate_drops_one_model_or_all():
+    cache = PredictionCache()
+    cache.put_many('crop', 'v1', [b'a'], [1])
+    cache.put_many('demand', 'v1', [b'a'], [2])
+    cache.invalidate('crop')
+    assert cache.get_many('crop', 'v1', [b'a']) == [None] and cache.get_many('demand', 'v1', [b'a']) == [2]
+    cache.invalidate()
+    assert cache.stats()['size'] == 0
+
+def test_hit_rate_is_reported_per_model():
+    cache = PredictionCache()
+    cache.put_many('crop', 'v1', [b'a'], [1])
+    cache.get_many('crop', 'v1', [b'a', b'a', b'a', b'b'])
+    cache.get_many('demand', 'v1', [b'a'])
+    models = cache.stats()['models']
+    assert models['crop'] == {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'size': 1}
+    assert models['demand'] == {'hits': 0, 'misses': 1, 'hit_rate': 0.0, 'size': 0}
+
+def test_disabled_cache_stores_nothing():
+    assert not PredictionCache(max_entries=0).enabled
+
+@pytest.fixture(scope='module')
+def loaded(bundle_dir):
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    return service
+
+@pytest.fixture
+def service(loaded):
+    """The shared service with an empty cache"""
+    loaded.prediction_cache = PredictionCache(100)
+    return loaded
+
+@pytest.fixture
+def scored(monkeypatch):
+    """The number of rows each model call scores"""
+    scored = []
+    timed_predict = ml_service._timed_predict
+
+    def counting(model, stage, predict, X):
+        scored.append(len(X))
+        return timed_predict(model, stage, predict, X)
+
+    monkeypatch.setattr(ml_service, '_timed_predict', counting)
+    return scored
+
+def _farm(**overrides):
+    return {'district': 'Salem', 'season': 'Kharif', 'soil_type': 'Loamy', 'water_availability': 'High',
+            'irrigation_type': 'Borewell', 'land_size_acres': 2, 'previous_crop': 'Rice',
+            'market_demand_level': 'High', 'temperature_avg': 30, 'humidity': 70, 'rainfall_mm': 100, **overrides}
+
+def test_duplicate_rows_in_a_batch_are_scored_once(service, scored):
+    farms = [_farm(), _farm(), _farm(soil_type='Red'), _farm()]
+    first = service.get_crop_recommendations_batch(farms)
+    assert all(result['success'] for result in first)
+    assert scored == [2]
+    recommendations = [result['recommendations'] for result in first]
+    assert recommendations[0] == recommendations[1] == recommendations[3]
+
+    # The same farms again are answered from the cache without a model call
+    again = service.get_crop_recommendations_batch(farms)
+    assert [result['recommendations'] for result in again] == recommendations
+    assert scored == [2]
+    crop = service.cache_stats()['models']['crop']
+    assert (crop['hits'], crop['misses'], crop['size']) == (4, 4, 2)
+
+def test_swapping_models_drops_their_cached_outputs(service, scored):
+    service.get_crop_recommendations_batch([_farm()])
+    assert service.cache_stats()['size'] == 1
+    service.swap(service.states, service.bundle, service.models_dir)
+    assert service.cache_stats()['size'] == 0
+    service.get_crop_recommendations_batch([_farm()])
+    assert scored == [1, 1]
+
+def test_predict_cached_returns_outputs_in_input_order(service):
+    state = service._state('crop')
+    X = np.array([[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]])
+    calls = []
+
+    def predict(rows):
+        calls.append(rows.copy())
+        return rows.sum(axis=1, keepdims=True)
+
+    assert service._predict_cached(state, X, predict).ravel().tolist() == [3.0, 7.0, 3.0]
+    assert [rows.tolist() for rows in calls] == [[[1.0, 2.0], [3.0, 4.0]]]
@@ -0,0 +1,59 @@
+import os
+import pytest
+from sqlalchemy import create_engine, text
+from backend.init_db import generate
+from backend.ml_service import MLService
+from backend.price_scanner import PriceCrashScanner
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+@pytest.fixture
+def scanner(tmp_path, bundle_dir):
+    path = str(tmp_path / 'scan.db')
+    generate(path, 20000, schema_path=SCHEMA)
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    engine = create_engine(f"sqlite:///{path}")
+    yield PriceCrashScanner(engine, service)
+    engine.dispose()
+
+def _watermark(engine, name):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT last_id FROM price_scan_watermarks WHERE name = :name"),
+                                  {'name': name}).scalar()
+
+def _plant(engine):
+    with engine.begin() as connection:
+        # A grower of a pair the last scan scored, so the new planting is rescored
+        farmer_id, crop_name = connection.execute(text(
+            "SELECT c.farmer_id, c.crop_name FROM crops c JOIN farmers f ON f.id = c.farmer_id "
+            "JOIN price_scan_state p ON p.crop_name = c.crop_name AND p.district = f.district LIMIT 1")).fetchone()
+        return connection.execute(text("INSERT INTO crops (farmer_id, crop_name, quantity_kg, status) "
+                                       "VALUES (:farmer_id, :crop_name, 100, 'growing')"),
+                                  {'farmer_id': farmer_id, 'crop_name': crop_name}).lastrowid
+
+def test_full_scan_advances_the_watermarks(scanner):
+    summary = scanner.scan(full=True)
+    assert summary['scored'] > 0
+    with scanner.engine.connect() as connection:
+        assert _watermark(scanner.engine, 'crops') == connection.execute(text("SELECT MAX(id) FROM crops")).scalar()
+
+def test_failed_scan_keeps_its_rows_for_the_next_one(scanner, monkeypatch):
+    scanner.scan(full=True)
+    before = _watermark(scanner.engine, 'crops')
+    crop_id = _plant(scanner.engine)
+
+    def fail(records):
+        raise RuntimeError('model unavailable')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(scanner.ml_service, 'detect_price_crash_risk_batch', fail)
+        with pytest.raises(RuntimeError):
+            scanner.scan(full=False)
+    assert _watermark(scanner.engine, 'crops') == before
+
+    summary = scanner.scan(full=False)
+    assert summary['pairs'] == 1
+    assert _watermark(scanner.engine, 'crops') == crop_id
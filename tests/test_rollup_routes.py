@@ -0,0 +1,33 @@
+import os
+import sqlite3
+from datetime import date, timedelta
+import pytest
+from flask import Flask
+from backend import db
+from backend.rollup_routes import rollup_bp
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+@pytest.fixture
+def client(tmp_path):
+    path = str(tmp_path / 'rollups.db')
+    monday = date.today() - timedelta(days=date.today().weekday())
+    with sqlite3.connect(path) as connection:
+        with open(SCHEMA) as f:
+            connection.executescript(f.read())
+        connection.executemany(
+            "INSERT INTO transaction_rollups (dimension, group_key, period, period_start, transaction_count, quantity, revenue) "
+            "VALUES ('crop', ?, 'week', ?, 1, 10, ?)",
+            [(crop, monday.isoformat(), revenue) for crop, revenue in (('Tomato', 300), ('Onion', 200), ('Rice', 100))])
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    app.register_blueprint(rollup_bp, url_prefix='/api/analytics')
+    return app.test_client()
+
+@pytest.mark.parametrize('limit, expected', [(None, 3), (2, 2), (-1, 1), (0, 3), (1000, 3)])
+def test_top_limit_is_clamped(client, limit, expected):
+    query = '' if limit is None else f"?limit={limit}"
+    response = client.get(f"/api/analytics/top/crop{query}")
+    assert response.status_code == 200
+    assert [row['key'] for row in response.get_json()['results']] == ['Tomato', 'Onion', 'Rice'][:expected]
@@ -0,0 +1,43 @@
+import os
+from datetime import datetime
+import pytest
+import backend.ml_service as ml_service
+from backend.ml_service import MLService
+
+class LateEvening(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 3, 1, 20, 0)
+
+@pytest.fixture(scope='module')
+def service(bundle_dir):
+    service = MLService(load_mode='lazy')
+    service.models_root = os.path.dirname(bundle_dir)
+    service.bundle, service.models_dir = os.path.basename(bundle_dir), bundle_dir
+    service.load_all_models()
+    return service
+
+def test_arrival_date_and_forecast_day_follow_the_clock(service, monkeypatch):
+    demand, spoilage = service._state('demand').tables, service._state('spoilage').tables
+    crop = next(c for c in demand['vegetable_name'].classes if c in spoilage['vegetable_type'])
+    market = demand['city'].classes[0]
+    forecasts = []
+    forecast_matrix = service._forecast_matrix
+
+    def spy(state, forecast_data, start_date):
+        forecasts.append((forecast_data['horizon_days'], start_date))
+        return forecast_matrix(state, forecast_data, start_date)
+
+    monkeypatch.setattr(ml_service, 'datetime', LateEvening)
+    monkeypatch.setattr(service, '_forecast_matrix', spy)
+    result = service.plan_spoilage_routes({
+        'lots': [{'lot_id': 'a', 'crop_name': crop, 'quantity_kg': 100}],
+        'destinations': [{'market': market, 'transport_hours': [6, 30]}],
+        'storage_types': ['Cold Storage'], 'min_shelf_life_days': 0, 'options': 2
+    })
+    assert result['success'] and 'within_target' in result and 'within_budget' not in result
+
+    # Leaving at 20:00, six hours arrive the next day and thirty the day after
+    plans = [result['plans'][0]['best']] + result['plans'][0]['alternatives']
+    assert sorted((p['transport_hours'], p['arrival_date']) for p in plans) == [(6.0, '2026-03-02'), (30.0, '2026-03-03')]
+    assert forecasts == [(3, LateEvening(2026, 3, 1, 20, 0))]
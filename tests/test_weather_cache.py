@@ -0,0 +1,134 @@
+import threading
+import time
+import pytest
+from backend.weather_cache import WeatherCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeFetch:
+    """Upstream stand-in: counts calls per district, can hold them at a gate or fail them"""
+
+    def __init__(self):
+        self.calls = {}
+        self.version = 1
+        self.fail = False
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, district):
+        with self._lock:
+            self.calls[district] = self.calls.get(district, 0) + 1
+        self.started.set()
+        assert self.gate.wait(10)
+        if self.fail:
+            raise ConnectionError('provider down')
+        return {'district': district, 'temp': 30, 'version': self.version}
+
+@pytest.fixture
+def fetch():
+    return FakeFetch()
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def _cache(fetch, clock, **kwargs):
+    return WeatherCache(fetch, **{'ttl_seconds': 10, 'stale_ttl_seconds': 100, 'max_entries': 8, 'clock': clock, **kwargs})
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def test_fresh_entries_are_served_from_the_cache(fetch, clock):
+    cache = _cache(fetch, clock)
+    assert cache.get_weather('Salem')['version'] == 1
+    clock.now = 9
+    fetch.version = 2
+    assert cache.get_weather('Salem')['version'] == 1
+    assert fetch.calls == {'Salem': 1}
+
+def test_entries_past_the_stale_ttl_are_fetched_again(fetch, clock):
+    cache = _cache(fetch, clock)
+    cache.get_weather('Salem')
+    clock.now = 100
+    fetch.version = 2
+    assert cache.get_weather('Salem')['version'] == 2
+    assert fetch.calls == {'Salem': 2}
+    assert cache.stats()['misses'] == 2
+
+def test_stale_entries_are_served_while_one_refresh_runs(fetch, clock):
+    cache = _cache(fetch, clock)
+    cache.get_weather('Salem')
+    clock.now = 15
+    fetch.version = 2
+    fetch.gate.clear()
+    fetch.started.clear()
+    # Every caller gets the stale value at once; only the first starts a refresh
+    assert [cache.get_weather('Salem')['version'] for _ in range(5)] == [1] * 5
+    assert fetch.started.wait(10)
+    assert fetch.calls == {'Salem': 2}
+    assert (cache.stats()['stale_hits'], cache.stats()['refreshes']) == (5, 1)
+
+    fetch.gate.set()
+    _wait_for(lambda: cache.stats()['fetches'] == 2)
+    assert cache.get_weather('Salem')['version'] == 2
+
+def test_concurrent_misses_share_one_upstream_call(fetch, clock):
+    cache = _cache(fetch, clock)
+    fetch.gate.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_weather('Madurai'))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: cache.stats()['misses'] + cache.stats()['coalesced'] == 10)
+    fetch.gate.set()
+    for thread in threads:
+        thread.join(10)
+    assert len(results) == 10 and all(result is results[0] for result in results)
+    assert fetch.calls == {'Madurai': 1}
+    assert (cache.stats()['misses'], cache.stats()['coalesced']) == (1, 9)
+
+def test_least_recently_used_entry_is_evicted(fetch, clock):
+    cache = _cache(fetch, clock, max_entries=2)
+    cache.get_weather('Salem')
+    cache.get_weather('Erode')
+    cache.get_weather('Salem')  # Erode is now the least recently used
+    cache.get_weather('Trichy')
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions']) == (2, 1)
+    cache.get_weather('Salem')
+    assert fetch.calls['Salem'] == 1
+    cache.get_weather('Erode')
+    assert fetch.calls['Erode'] == 2
+
+def test_failed_fetch_falls_back_to_the_last_value(fetch, clock):
+    cache = _cache(fetch, clock)
+    cache.get_weather('Salem')
+    clock.now = 200
+    fetch.fail = True
+    assert cache.get_weather('Salem')['version'] == 1
+    with pytest.raises(ConnectionError):
+        cache.get_weather('Erode')
+    assert cache.stats()['errors'] == 2
+
+def test_counters_and_hit_rate(fetch, clock):
+    cache = _cache(fetch, clock)
+    cache.get_weather('Salem')  # miss
+    cache.get_weather('Salem')  # hit
+    cache.get_weather('Salem')  # hit
+    clock.now = 20
+    cache.get_weather('Salem')  # stale hit, refresh in the background
+    _wait_for(lambda: cache.stats()['fetches'] == 2)
+    stats = cache.stats()
+    assert {name: stats[name] for name in ('hits', 'stale_hits', 'misses', 'coalesced', 'refreshes', 'fetches', 'errors')} \
+        == {'hits': 2, 'stale_hits': 1, 'misses': 1, 'coalesced': 0, 'refreshes': 1, 'fetches': 2, 'errors': 0}
+    assert stats['hit_rate'] == 0.75
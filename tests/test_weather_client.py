@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from backend.weather_cache import WeatherCache
+from backend.weather_client import CircuitBreaker, WeatherClient, WeatherPrefetcher, WeatherUnavailable, parse_weather
+
+class FakeProvider:
+    """OpenWeatherMap stand-in on an ephemeral port; `mode` is 'ok', 'error', 'slow' or 'flaky' (fails `flaky_left` times)"""
+
+    def __init__(self):
+        self.mode, self.delay, self.flaky_left = 'ok', 0.0, 0
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def do_GET(self):
+                with provider._lock:
+                    provider.requests += 1
+                    provider.connections.add(self.client_address)
+                    mode = provider.mode
+                    if mode == 'flaky' and provider.flaky_left > 0:
+                        provider.flaky_left -= 1
+                        mode = 'error'
+                time.sleep(provider.delay)
+                city = parse_qs(urlparse(self.path).query)['q'][0].split(',')[0]
+                if mode == 'slow':
+                    time.sleep(0.5)
+                if mode == 'error':
+                    status, body = 503, {'message': 'unavailable'}
+                elif city == 'Nowhere':
+                    status, body = 404, {'message': 'city not found'}
+                else:
+                    status, body = 200, {'name': city, 'main': {'temp': 30.5, 'humidity': 70}, 'rain': {'1h': 1.5}}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        class QuietServer(ThreadingHTTPServer):
+            request_queue_size = 64  # the default backlog of 5 delays parallel connects by a SYN retry
+
+            def handle_error(self, request, client_address):
+                pass  # clients that timed out hang up mid-response
+
+        self.server = QuietServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data/2.5/weather"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+@pytest.fixture
+def provider():
+    provider = FakeProvider()
+    yield provider
+    provider.server.shutdown()
+    provider.server.server_close()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _client(provider, **kwargs):
+    options = dict(connect_timeout=0.5, read_timeout=0.2, retries=2, backoff_seconds=0.01)
+    options.update(kwargs)
+    return WeatherClient(provider.url, 'test', **options)
+
+def _fails(client, district):
+    with pytest.raises(WeatherUnavailable):
+        client.get_weather(district)
+
+def test_parse_weather_maps_rainfall():
+    base = {'name': 'Salem', 'main': {'temp': 30, 'humidity': 70}}
+    assert parse_weather({**base, 'rain': {'1h': 2.5}})['rainfall'] == 2.5
+    assert parse_weather({**base, 'rain': {'3h': 4.0}})['rainfall'] == 4.0
+    assert parse_weather(base)['rainfall'] == 0.0
+
+def test_parses_and_reuses_one_connection(provider):
+    client = _client(provider)
+    assert client.get_weather('Salem') == {'temp': 30.5, 'humidity': 70.0, 'rainfall': 1.5, 'district': 'Salem'}
+    for _ in range(20):
+        client.get_weather('Salem')
+    assert len(provider.connections) == 1
+    client.close()
+
+def test_retries_5xx_until_it_succeeds(provider):
+    client = _client(provider)
+    provider.mode, provider.flaky_left = 'flaky', 2
+    assert client.get_weather('Erode')['district'] == 'Erode'
+    assert provider.requests == 3
+    assert client.stats()['retries'] == 2
+    assert client.breaker.state == 'closed'
+    client.close()
+
+def test_4xx_is_not_retried_and_keeps_the_circuit_closed(provider):
+    client = _client(provider, breaker=CircuitBreaker(failure_threshold=1))
+    _fails(client, 'Nowhere')
+    assert provider.requests == 1
+    assert client.breaker.state == 'closed'
+    client.close()
+
+def test_read_timeout_bounds_the_call(provider):
+    client = _client(provider)
+    provider.mode = 'slow'
+    started = time.perf_counter()
+    _fails(client, 'Madurai')
+    assert time.perf_counter() - started < 1.2  # 3 attempts at 0.2 s each
+    client.close()
+
+def test_circuit_opens_fails_fast_and_half_opens(provider):
+    clock = FakeClock()
+    client = _client(provider, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=clock))
+    provider.mode = 'error'
+    _fails(client, 'Madurai')
+    _fails(client, 'Trichy')
+    assert client.breaker.state == 'open'
+
+    # Open: no request reaches the provider
+    requests = provider.requests
+    _fails(client, 'Salem')
+    assert provider.requests == requests
+    assert client.breaker.stats()['short_circuited'] == 1
+
+    # After the reset time one trial call goes through; a failure reopens the circuit
+    clock.now = 31
+    _fails(client, 'Salem')
+    assert provider.requests == requests + 3  # one call, with its retries
+    assert client.breaker.state == 'open'
+
+    # The next trial succeeds and closes it
+    provider.mode = 'ok'
+    clock.now = 62
+    assert client.get_weather('Salem')['temp'] == 30.5
+    assert client.breaker.state == 'closed'
+    client.close()
+
+def test_half_open_circuit_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now = 30
+    assert breaker.allow() and breaker.state == 'half_open'
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.state == 'closed'
+
+def test_prefetch_refreshes_every_district_in_parallel(provider):
+    provider.delay = 0.2
+    client = _client(provider, read_timeout=2.0, retries=0, pool_size=16)
+    cache = WeatherCache(client.get_weather, ttl_seconds=60, max_entries=64, max_parallel=16)
+    districts = [f"District{i}" for i in range(16)]
+    prefetcher = WeatherPrefetcher(cache, lambda: districts, interval=60, workers=16)
+    try:
+        run = prefetcher.run_once()
+        assert (run['refreshed'], run['failed']) == (16, 0)
+        assert run['seconds'] < 0.2 * 4  # one round trip, not sixteen
+
+        requests = provider.requests
+        found = cache.get_many(districts)
+        assert all(not isinstance(weather, Exception) for weather in found.values())
+        assert provider.requests == requests
+    finally:
+        prefetcher.stop()
+        client.close()
+
+def test_prefetch_counts_failed_districts(provider):
+    client = _client(provider, retries=0)
+    cache = WeatherCache(client.get_weather, ttl_seconds=60, max_entries=64)
+    prefetcher = WeatherPrefetcher(cache, lambda: ['Salem', 'Nowhere'], interval=60, workers=2)
+    try:
+        run = prefetcher.run_once()
+        assert (run['districts'], run['refreshed'], run['failed']) == (2, 1, 1)
+    finally:
+        prefetcher.stop()
+        client.close()
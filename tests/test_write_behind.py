@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+from backend.models import ActivityLog, AIRecommendation
+from backend.write_behind import WriteBehindBuffer, install_write_behind
+
+@pytest.fixture
+def setup(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'write_behind.db'}")
+    for model in (ActivityLog, AIRecommendation):
+        model.__table__.create(engine)
+
+    # A subclass per test, so the listeners don't leak onto other sessions
+    class BufferedSession(Session):
+        pass
+
+    buffer = WriteBehindBuffer(engine, batch_size=500, flush_interval=60).start()
+    install_write_behind(BufferedSession, buffer)
+    yield sessionmaker(bind=engine, class_=BufferedSession), buffer
+    buffer.stop()
+    engine.dispose()
+
+def _count(buffer, model):
+    with buffer.engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+def _log(user_id=1):
+    return ActivityLog(user_id=user_id, feature='Crop Advisor', action='recommendation')
+
+def test_rows_reach_the_buffer_on_commit(setup):
+    factory, buffer = setup
+    with factory() as session:
+        session.add(_log())
+        session.flush()
+        assert buffer.stats()['pending'] == 0
+        session.commit()
+    assert buffer.stats()['pending'] == 1
+    buffer.flush()
+    assert _count(buffer, ActivityLog) == 1
+
+def test_flushed_then_rolled_back_rows_are_dropped(setup):
+    factory, buffer = setup
+    with factory() as session:
+        session.add(_log())
+        session.flush()
+        session.rollback()
+        session.add(_log(2))
+        session.commit()
+    buffer.flush()
+    with buffer.engine.connect() as connection:
+        users = connection.execute(select(ActivityLog.__table__.c.user_id)).scalars().all()
+    assert users == [2]
+
+def test_rolled_back_savepoint_drops_only_its_rows(setup):
+    factory, buffer = setup
+    with factory() as session:
+        session.add(_log(1))
+        session.flush()
+        savepoint = session.begin_nested()
+        session.add(_log(2))
+        session.flush()
+        savepoint.rollback()
+        session.commit()
+    buffer.flush()
+    with buffer.engine.connect() as connection:
+        users = connection.execute(select(ActivityLog.__table__.c.user_id)).scalars().all()
+    assert users == [1]
+
+def test_closed_without_commit_writes_nothing(setup):
+    factory, buffer = setup
+    session = factory()
+    session.add(_log())
+    session.flush()
+    session.close()
+    buffer.flush()
+    assert _count(buffer, ActivityLog) == 0
+
+def test_recommendations_keep_their_id(setup):
+    factory, buffer = setup
+    with factory() as session:
+        recommendation = AIRecommendation(farmer_id=1, recommendation_type='crop', crop_suggested='Tomato',
+                                          confidence_score=0.8, action_taken='pending')
+        session.add(recommendation)
+        session.commit()
+        assert recommendation.id is not None
+    assert buffer.stats()['pending'] == 0
+
+def test_rows_the_buffer_rejects_are_written_after_commit(setup):
+    factory, buffer = setup
+    buffer.max_pending = 0
+    with factory() as session:
+        session.add(_log())
+        session.commit()
+    assert buffer.stats()['rejected'] == 1
+    assert _count(buffer, ActivityLog) == 1
@@ -0,0 +1,261 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(os.path.dirname(DATA_DIR), 'models')
+MANIFEST = 'manifest.json'
+CHUNK_SIZE = 20000
+
+# Model name -> training spec. Feature order is the CSV column order, which is the order
+# MLService builds its input rows in. Targets map a sub-model key to (target column, estimator);
+# a key of None means the estimator itself is the pickled model (the crop recommender).
+# Every column gets an explicit dtype so chunks never fall back to object/float64 inference.
+TRAINING_SPECS = {
+    'crop': {
+        'csv': 'crops_dataset.csv',
+        'files': ('crop_model.pkl', 'crop_encoders.pkl'),
+        'columns': {
+            'land_area': 'float32', 'soil_type': 'category', 'water_availability': 'category',
+            'irrigation_type': 'category', 'rainfall_mm': 'float32', 'temperature_celsius': 'float32',
+            'humidity_percent': 'float32', 'season': 'category', 'previous_crop': 'category',
+            'market_demand_level': 'category', 'district': 'category', 'recommended_crop': 'category'
+        },
+        'targets': {None: ('recommended_crop', RandomForestClassifier)}
+    },
+    'demand': {
+        'csv': 'market_demand.csv',
+        'files': ('demand_model.pkl', 'demand_encoders.pkl'),
+        'columns': {
+            'vegetable_name': 'category', 'month': 'int8', 'year': 'int16', 'prev_demand_kg': 'float32',
+            'prev_price_rs': 'float32', 'festival_week': 'int8', 'school_holiday': 'int8', 'season': 'category',
+            'city': 'category', 'rainfall_mm': 'float32', 'temperature': 'float32', 'supply_volume_kg': 'float32',
+            'predicted_demand_kg': 'float32', 'predicted_price_rs': 'float32'
+        },
+        'targets': {
+            'model_demand': ('predicted_demand_kg', RandomForestRegressor),
+            'model_price': ('predicted_price_rs', RandomForestRegressor)
+        }
+    },
+    'price_crash': {
+        'csv': 'price_crash.csv',
+        'files': ('price_crash_model.pkl', 'crash_encoders.pkl'),
+        'columns': {
+            'vegetable_name': 'category', 'current_price_rs': 'float32', 'prev_week_price_rs': 'float32',
+            'current_supply_kg': 'float32', 'current_demand_kg': 'float32', 'supply_demand_ratio': 'float32',
+            'month': 'int8', 'festival_next_week': 'int8', 'rainfall_mm': 'float32',
+            'num_farmers_producing': 'int32', 'cold_storage_available': 'int8', 'district': 'category',
+            'crash_alert': 'int8', 'crash_severity': 'category', 'predicted_price': 'float32'
+        },
+        'targets': {
+            'model_crash': ('crash_alert', RandomForestClassifier),
+            'model_sev': ('crash_severity', RandomForestClassifier),
+            'model_price': ('predicted_price', RandomForestRegressor)
+        }
+    },
+    'spoilage': {
+        'csv': 'spoilage_data.csv',
+        'files': ('spoilage_model.pkl', 'spoilage_encoders.pkl'),
+        'columns': {
+            'vegetable_type': 'category', 'storage_temperature': 'float32', 'humidity_percent': 'float32',
+            'transport_time_hours': 'float32', 'days_since_harvest': 'int16', 'storage_type': 'category',
+            'packaging_type': 'category', 'bruising_level': 'int8', 'initial_quality_score': 'float32',
+            'season': 'category', 'district': 'category', 'spoilage_risk_level': 'category',
+            'estimated_days_remaining': 'float32'
+        },
+        'targets': {
+            'model_risk': ('spoilage_risk_level', RandomForestClassifier),
+            'model_days': ('estimated_days_remaining', RandomForestRegressor)
+        }
+    }
+}
+
+def peak_memory_mb():
+    """Peak resident set size of this process so far (None where unavailable)"""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _read_chunks(path, spec, chunksize):
+    # keep_default_na=False keeps labels like crash_severity 'None' as strings
+    return pd.read_csv(path, usecols=list(spec['columns']), dtype=spec['columns'], chunksize=chunksize,
+                       keep_default_na=False, na_values=[''])
+
+def load_dataset(path, spec, chunksize=CHUNK_SIZE):
+    """
+    Reads a training CSV in two chunked passes: the first collects row count and the
+    classes of every categorical column, the second encodes each chunk straight into a
+    preallocated float32 matrix. Peak memory is the matrix plus one chunk.
+    Returns: (X float32 [rows, features], {target column: array}, feature names, {column: LabelEncoder})
+    """
+    columns = spec['columns']
+    categorical = [col for col, dtype in columns.items() if dtype == 'category']
+    target_cols = {target for target, _ in spec['targets'].values()}
+    features = [col for col in columns if col not in target_cols]
+
+    rows, seen = 0, {col: set() for col in categorical}
+    for chunk in _read_chunks(path, spec, chunksize):
+        rows += len(chunk)
+        for col in categorical:
+            seen[col].update(chunk[col].cat.categories)
+
+    # Fitting on the distinct values gives the same sorted classes_ as fitting on the full column
+    encoders = {col: LabelEncoder().fit(np.array(sorted(seen[col]), dtype=object)) for col in categorical}
+
+    X = np.empty((rows, len(features)), dtype=np.float32)
+    y = {col: np.empty(rows, dtype=np.int32 if col in encoders else np.float32) for col in target_cols}
+    offset = 0
+    for chunk in _read_chunks(path, spec, chunksize):
+        end = offset + len(chunk)
+        encoded = {}
+        for col in categorical:
+            # Map this chunk's categories to global codes once, then gather by the chunk's codes
+            global_codes = np.searchsorted(encoders[col].classes_, np.asarray(chunk[col].cat.categories, dtype=object))
+            encoded[col] = global_codes[chunk[col].cat.codes.to_numpy()]
+        for j, col in enumerate(features):
+            X[offset:end, j] = encoded[col] if col in encoded else chunk[col].to_numpy()
+        for col in target_cols:
+            y[col][offset:end] = encoded[col] if col in encoded else chunk[col].to_numpy()
+        offset = end
+    return X, y, features, encoders
+
+def _data_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+def train_model(name, data_dir=DATA_DIR, n_jobs=-1, n_estimators=100, max_samples=None, chunksize=CHUNK_SIZE,
+                seed=42):
+    """
+    Trains one model from its CSV.
+    Returns: (pickled model object, encoders, manifest entry)
+    """
+    spec = TRAINING_SPECS[name]
+    path = os.path.join(data_dir, spec['csv'])
+    started = time.perf_counter()
+    X, y, features, encoders = load_dataset(path, spec, chunksize)
+    load_seconds = time.perf_counter() - started
+
+    model, metrics, fit_seconds = {}, {}, {}
+    for key, (target, estimator) in spec['targets'].items():
+        step = time.perf_counter()
+        # Out-of-bag scores need no held-out copy of X: accuracy for classifiers, R^2 for regressors
+        fitted = estimator(n_estimators=n_estimators, n_jobs=n_jobs, random_state=seed, oob_score=True,
+                           max_samples=max_samples).fit(X, y[target])
+        fit_seconds[key or 'model'] = round(time.perf_counter() - step, 2)
+        metrics[key or 'model'] = {
+            'target': target,
+            'oob_accuracy' if estimator is RandomForestClassifier else 'oob_r2': round(float(fitted.oob_score_), 4)
+        }
+        if key is None:
+            model = fitted
+        else:
+            model[key] = fitted
+
+    entry = {
+        'files': list(spec['files']),
+        'data': {'csv': spec['csv'], 'sha1': _data_hash(path), 'rows': int(len(X))},
+        'features': features,
+        'encoders': {col: encoder.classes_.tolist() for col, encoder in encoders.items()},
+        'metrics': metrics,
+        'params': {'n_estimators': n_estimators, 'max_samples': max_samples, 'random_state': seed},
+        'load_seconds': round(load_seconds, 2),
+        'fit_seconds': fit_seconds,
+        'train_seconds': round(time.perf_counter() - started, 2),
+        'peak_memory_mb': peak_memory_mb()
+    }
+    return model, encoders, entry
+
+def new_version():
+    return datetime.utcnow().strftime('v%Y%m%d-%H%M%S')
+
+def train_bundle(out_dir=MODELS_DIR, names=None, version=None, **options):
+    """
+    Trains the models into a new versioned bundle, out_dir/<version>/, holding the same
+    pickle names MLService loads plus manifest.json. The bundle is written under a
+    temporary name and renamed into place, so a watcher never sees a partial bundle.
+    Returns: the manifest
+    """
+    version = version or new_version()
+    names = names or list(TRAINING_SPECS)
+    staging = os.path.join(out_dir, f".{version}.tmp")
+    os.makedirs(staging, exist_ok=True)
+    started = time.perf_counter()
+    manifest = {'version': version, 'created_at': datetime.utcnow().isoformat(),
+                'sklearn_version': sklearn.__version__, 'n_jobs': options.get('n_jobs', -1), 'models': {}}
+    try:
+        for name in names:
+            model, encoders, entry = train_model(name, **options)
+            model_file, encoders_file = TRAINING_SPECS[name]['files']
+            joblib.dump(model, os.path.join(staging, model_file))
+            joblib.dump(encoders, os.path.join(staging, encoders_file))
+            manifest['models'][name] = entry
+            logger.info(f"{name}: {entry['data']['rows']} rows in {entry['train_seconds']}s, {entry['metrics']}")
+        manifest['wall_seconds'] = round(time.perf_counter() - started, 2)
+        manifest['peak_memory_mb'] = peak_memory_mb()
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, os.path.join(out_dir, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+def install_bundle(bundle_dir, models_dir=MODELS_DIR):
+    """Copies a bundle's pickles over the flat files in models_dir (for services loaded at startup)"""
+    with open(os.path.join(bundle_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    for entry in manifest['models'].values():
+        for filename in entry['files']:
+            # Copy then rename, so a loading process never reads a half-written pickle
+            shutil.copyfile(os.path.join(bundle_dir, filename), os.path.join(models_dir, f".{filename}.tmp"))
+            os.replace(os.path.join(models_dir, f".{filename}.tmp"), os.path.join(models_dir, filename))
+    return manifest['version']
+
+if __name__ == '__main__':
+    # Usage: python -m backend.train_models [--models crop demand] [--n-jobs -1] [--install]
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='Train the four HarvestLink models into a versioned bundle')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='directory holding the training CSVs')
+    parser.add_argument('--out', default=MODELS_DIR, help='directory the bundle is written under')
+    parser.add_argument('--models', nargs='+', choices=list(TRAINING_SPECS), help='default: all four')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='trees fitted in parallel (-1: all cores)')
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--max-samples', type=float, help='bootstrap sample fraction per tree, for very large data')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='CSV rows read per chunk')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--install', action='store_true', help='also copy the pickles over the flat files in --out')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = train_bundle(args.out, args.models, data_dir=args.data_dir, n_jobs=args.n_jobs,
+                            n_estimators=args.n_estimators, max_samples=args.max_samples,
+                            chunksize=args.chunksize, seed=args.seed)
+    print(f"Bundle {manifest['version']} written to {os.path.join(args.out, manifest['version'])}")
+    print(f"Wall time {manifest['wall_seconds']}s, peak memory {manifest['peak_memory_mb']} MB")
+    if args.install:
+        install_bundle(os.path.join(args.out, manifest['version']), args.out)
+        print(f"Installed {manifest['version']} into {args.out}")
@@ -0,0 +1,175 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from backend.config import Config
+from backend.services.weather_service import weather_service
+from backend.weather_client import weather_client
+
+logger = logging.getLogger(__name__)
+
+class _Fetch:
+    """One in-flight upstream fetch that concurrent callers wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class WeatherCache:
+    """
+    Bounded TTL + LRU cache in front of a weather provider, keyed by district.
+    - Fresh entries (younger than ttl_seconds) are served directly.
+    - Stale entries (younger than stale_ttl_seconds) are served while one background refresh runs.
+    - Concurrent misses for the same district share a single upstream fetch.
+    - get_many() fetches the misses of a batch in parallel, up to max_parallel at a time.
+    """
+
+    def __init__(self, fetch, ttl_seconds=600, stale_ttl_seconds=3600, max_entries=64, clock=time.monotonic,
+                 max_parallel=8):
+        self.fetch = fetch
+        self.max_parallel = max_parallel
+        self._executor = None  # created on the first batch with more than one district
+        self.ttl_seconds = ttl_seconds
+        self.stale_ttl_seconds = max(stale_ttl_seconds, ttl_seconds)
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # district -> (weather, fetched_at)
+        self._inflight = {}            # district -> _Fetch
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ['hits', 'stale_hits', 'misses', 'coalesced', 'refreshes', 'errors', 'evictions', 'fetches'], 0)
+        self._fetch_seconds_total = 0.0
+        self._fetch_seconds_max = 0.0
+
+    def get_weather(self, district):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(district)
+            if entry is not None:
+                weather, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl_seconds:
+                    self._entries.move_to_end(district)
+                    self._counters['hits'] += 1
+                    return weather
+                if age < self.stale_ttl_seconds:
+                    self._entries.move_to_end(district)
+                    self._counters['stale_hits'] += 1
+                    if district not in self._inflight:
+                        self._inflight[district] = _Fetch()
+                        self._counters['refreshes'] += 1
+                        threading.Thread(target=self._refresh, args=(district,), daemon=True).start()
+                    return weather
+
+            pending = self._inflight.get(district)
+            if pending is None:
+                pending = self._inflight[district] = _Fetch()
+                leader = True
+                self._counters['misses'] += 1
+            else:
+                leader = False
+                self._counters['coalesced'] += 1
+
+        if leader:
+            self._refresh(district)
+        else:
+            pending.done.wait()
+
+        if pending.error is not None:
+            # Fall back to whatever we last saw rather than failing the prediction
+            with self._lock:
+                entry = self._entries.get(district)
+            if entry is not None:
+                return entry[0]
+            raise pending.error
+        return pending.value
+
+    def get_many(self, districts):
+        """
+        Takes: district names
+        Returns: {district: weather, or the exception get_weather raised}, fetched concurrently
+        """
+        districts = list(dict.fromkeys(districts))
+        if len(districts) < 2:
+            return {district: self._get_or_error(district) for district in districts}
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='weather')
+        return dict(zip(districts, self._executor.map(self._get_or_error, districts)))
+
+    def _get_or_error(self, district):
+        try:
+            return self.get_weather(district)
+        except Exception as e:
+            return e
+
+    def refresh(self, district):
+        """
+        Fetches one district now, whatever the age of its entry (used by the prefetcher).
+        Returns: True if the entry was refreshed, False if the fetch failed or one was already running
+        """
+        with self._lock:
+            if district in self._inflight:
+                return False
+            pending = self._inflight[district] = _Fetch()
+            self._counters['refreshes'] += 1
+        self._refresh(district)
+        return pending.error is None
+
+    def _refresh(self, district):
+        """Fetches one district upstream and wakes every caller waiting on it"""
+        with self._lock:
+            pending = self._inflight[district]
+
+        started = time.perf_counter()
+        try:
+            weather = self.fetch(district)
+        except Exception as e:
+            logger.warning(f"Weather fetch failed for {district}: {e}")
+            pending.error = e
+        else:
+            pending.value = weather
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._counters['fetches'] += 1
+            self._fetch_seconds_total += elapsed
+            self._fetch_seconds_max = max(self._fetch_seconds_max, elapsed)
+            if pending.error is not None:
+                self._counters['errors'] += 1
+            else:
+                self._entries[district] = (pending.value, self.clock())
+                self._entries.move_to_end(district)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters['evictions'] += 1
+            del self._inflight[district]
+        pending.done.set()
+
+    def invalidate(self, district=None):
+        with self._lock:
+            if district is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(district, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['coalesced']
+            stats['size'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+            stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+            stats['fetch_latency_ms_avg'] = round(self._fetch_seconds_total / stats['fetches'] * 1000, 2) if stats['fetches'] else 0.0
+            stats['fetch_latency_ms_max'] = round(self._fetch_seconds_max * 1000, 2)
+        return stats
+
+weather_cache = WeatherCache(
+    weather_client.get_weather if Config.WEATHER_CLIENT_ENABLED else weather_service.get_weather,
+    ttl_seconds=Config.WEATHER_CACHE_TTL_SECONDS,
+    stale_ttl_seconds=Config.WEATHER_CACHE_STALE_SECONDS,
+    max_entries=Config.WEATHER_CACHE_MAX_ENTRIES,
+    max_parallel=Config.WEATHER_POOL_SIZE
+)
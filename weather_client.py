@@ -0,0 +1,232 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+class WeatherUnavailable(Exception):
+    """The provider failed or its circuit is open; callers fall back to the request's own weather values"""
+
+class _Rejected(Exception):
+    """The provider answered but refused this district (4xx): retrying won't help and the provider is healthy"""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. After failure_threshold failed calls it opens and every
+    call fails fast for reset_seconds; then one trial call is let through (half-open),
+    which closes it on success or reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.counters = {'opened': 0, 'short_circuited': 0}
+        self._trial = False  # a half-open trial call is in flight
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and self.clock() - self.opened_at >= self.reset_seconds:
+                self.state, self._trial = 'half_open', False
+            if self.state == 'closed' or (self.state == 'half_open' and not self._trial):
+                self._trial = self.state == 'half_open'
+                return True
+            self.counters['short_circuited'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self._trial = 'closed', 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.counters['opened'] += 1
+                    logger.warning(f"Weather circuit opened after {self.failures} failures")
+                self.state, self.opened_at = 'open', self.clock()
+
+    def stats(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures, **self.counters}
+
+def parse_weather(payload):
+    """
+    Takes: an OpenWeatherMap current-weather response
+    Returns: {temp, humidity, rainfall, district} like weather_service; rainfall is the provider's
+             last hour (or, failing that, last three hours) in mm, 0 when no rain is reported
+    """
+    main = payload['main']
+    rain = payload.get('rain') or {}
+    return {'temp': float(main['temp']), 'humidity': float(main['humidity']),
+            'rainfall': float(rain.get('1h', rain.get('3h', 0.0))), 'district': payload.get('name')}
+
+class WeatherClient:
+    """
+    Pooled HTTP client for the weather provider: one keep-alive session shared by all
+    threads, (connect, read) timeouts on every call, retries with full-jitter exponential
+    backoff for timeouts, connection errors, 429 and 5xx, and a circuit breaker so an
+    outage costs callers nothing once it has been detected.
+    """
+
+    def __init__(self, base_url=None, api_key=None, connect_timeout=None, read_timeout=None, retries=None,
+                 backoff_seconds=0.2, pool_size=None, breaker=None):
+        self.base_url = base_url or Config.WEATHER_API_URL
+        self.api_key = api_key or Config.WEATHER_API_KEY
+        self.timeout = (connect_timeout or Config.WEATHER_CONNECT_TIMEOUT_SECONDS,
+                        read_timeout or Config.WEATHER_READ_TIMEOUT_SECONDS)
+        self.retries = Config.WEATHER_RETRIES if retries is None else retries
+        self.backoff_seconds = backoff_seconds
+        self.pool_size = pool_size or Config.WEATHER_POOL_SIZE
+        self.breaker = breaker or CircuitBreaker(Config.WEATHER_BREAKER_FAILURES, Config.WEATHER_BREAKER_RESET_SECONDS)
+        self.session = requests.Session()
+        # Retries are ours (with jitter and breaker accounting), not urllib3's
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0))
+        self.counters = {'calls': 0, 'requests': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+        self._latency_total = 0.0
+        self._lock = threading.Lock()
+
+    def get_weather(self, district):
+        """
+        Takes: a district name
+        Returns: {temp, humidity, rainfall, district}; raises WeatherUnavailable on failure or while the circuit is open
+        """
+        with self._lock:
+            self.counters['calls'] += 1
+        if not self.breaker.allow():
+            raise WeatherUnavailable(f"Weather circuit open, not fetching {district}")
+        try:
+            weather = self._fetch(district)
+        except _Rejected as e:
+            self.breaker.record_success()
+            with self._lock:
+                self.counters['rejected'] += 1
+            raise WeatherUnavailable(str(e))
+        except Exception as e:
+            self.breaker.record_failure()
+            with self._lock:
+                self.counters['failures'] += 1
+            raise WeatherUnavailable(f"Weather fetch failed for {district}: {e}") from e
+        self.breaker.record_success()
+        return weather
+
+    def _fetch(self, district):
+        params = {'q': f"{district},IN", 'appid': self.api_key, 'units': 'metric'}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self.counters['retries'] += 1
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+            started = time.perf_counter()
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                continue
+            finally:
+                with self._lock:
+                    self.counters['requests'] += 1
+                    self._latency_total += time.perf_counter() - started
+            if response.status_code == 429 or response.status_code >= 500:
+                error = requests.HTTPError(f"HTTP {response.status_code}")
+                continue
+            if response.status_code >= 400:
+                raise _Rejected(f"Weather provider refused {district}: HTTP {response.status_code}")
+            return parse_weather(response.json())
+        raise error
+
+    def close(self):
+        self.session.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['request_latency_ms_avg'] = round(self._latency_total / stats['requests'] * 1000, 2) if stats['requests'] else 0.0
+        stats['pool_size'] = self.pool_size
+        stats['breaker'] = self.breaker.stats()
+        return stats
+
+class WeatherPrefetcher:
+    """
+    Refreshes the weather of every district the models know, in parallel, on a schedule,
+    so predictions read fresh cache entries instead of waiting on the provider.
+    `districts` is a callable returning the district names (e.g. the encoders' classes).
+    """
+
+    def __init__(self, cache, districts, interval=480.0, workers=8):
+        self.cache = cache
+        self.districts = districts
+        self.interval = interval
+        self.workers = workers
+        self.last_run = None
+        self.counters = {'runs': 0, 'errors': 0}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather-prefetch')
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """Returns: {districts, refreshed, failed, seconds} of this run"""
+        started = time.perf_counter()
+        districts = sorted(set(self.districts()))
+        if len(districts) > self.cache.max_entries:
+            logger.warning(f"Prefetching {len(districts)} districts into a cache of {self.cache.max_entries}, "
+                           f"raise WEATHER_CACHE_MAX_ENTRIES")
+        outcomes = list(self._executor.map(self.cache.refresh, districts))
+        self.counters['runs'] += 1
+        self.last_run = {
+            'districts': len(districts),
+            'refreshed': outcomes.count(True),
+            'failed': outcomes.count(False),
+            'seconds': round(time.perf_counter() - started, 3),
+            'at': time.time()
+        }
+        return self.last_run
+
+    def start(self):
+        def loop():
+            while True:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    self.counters['errors'] += 1
+                    logger.error(f"Weather prefetch failed: {e}")
+                if self._stopped.wait(self.interval):
+                    return
+
+        self._thread = threading.Thread(target=loop, name='weather-prefetcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {'interval_seconds': self.interval, 'workers': self.workers, 'last_run': self.last_run, **self.counters}
+
+weather_client = WeatherClient()
+
+if __name__ == '__main__':
+    # Usage: python -m backend.weather_client get <district>
+    logging.basicConfig(level=logging.ERROR)
+    parser = argparse.ArgumentParser(description='Pooled weather provider client')
+    parser.add_argument('command', choices=['get'])
+    parser.add_argument('district', nargs='?', default='Salem')
+    args = parser.parse_args()
+    print(json.dumps(weather_client.get_weather(args.district), indent=2))
@@ -0,0 +1,333 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """
+    Holds append-only rows (activity logs) in memory and inserts them
+    in one transaction per batch, so requests don't queue on SQLite's write lock for them.
+    A batch is written once `batch_size` rows are waiting or the oldest has waited
+    `flush_interval` seconds. At most `max_pending` rows are held; past that, callers
+    write synchronously (enqueue returns False), which caps what a crash can lose.
+    """
+
+    def __init__(self, engine, batch_size=500, flush_interval=1.0, max_pending=10000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = deque()  # (table, row) in arrival order
+        self.counters = {'enqueued': 0, 'rejected': 0, 'flushed': 0, 'batches': 0, 'errors': 0,
+                         'dropped': 0, 'last_batch_ms': 0.0}
+        self._oldest = None  # monotonic time the oldest pending row arrived
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()  # one insert transaction at a time
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopped.is_set()
+
+    def enqueue(self, table, row):
+        """
+        Takes: SQLAlchemy Table and a {column: value} dict with every column to insert
+        Returns: False when the buffer is full or stopped, and the caller must write the row itself
+        """
+        with self._condition:
+            if self._stopped.is_set() or len(self.pending) >= self.max_pending:
+                self.counters['rejected'] += 1
+                return False
+            first = not self.pending
+            if first:
+                self._oldest = time.monotonic()
+            self.pending.append((table, row))
+            self.counters['enqueued'] += 1
+            # The first row starts the flush timer, a full batch is written right away
+            if first or len(self.pending) >= self.batch_size:
+                self._condition.notify()
+        return True
+
+    def flush(self):
+        """
+        Inserts everything pending, one executemany per table in a single transaction.
+        Rows of a failed batch go back to the front of the queue while there is room.
+        Returns: number of rows written
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch = list(self.pending)
+                self.pending.clear()
+                self._oldest = None
+            if not batch:
+                return 0
+
+            by_table = {}
+            for table, row in batch:
+                by_table.setdefault(table, []).append(row)
+            started = time.perf_counter()
+            try:
+                with self.engine.begin() as connection:
+                    for table, rows in by_table.items():
+                        connection.execute(table.insert(), rows)
+            except Exception as e:
+                with self._condition:
+                    room = max(0, self.max_pending - len(self.pending))
+                    kept = batch[:room]
+                    self.pending.extendleft(reversed(kept))
+                    if self.pending:
+                        self._oldest = time.monotonic()
+                    self.counters['errors'] += 1
+                    self.counters['dropped'] += len(batch) - len(kept)
+                logger.error(f"Write-behind flush of {len(batch)} rows failed: {e}")
+                return 0
+
+            self.counters['flushed'] += len(batch)
+            self.counters['batches'] += 1
+            self.counters['last_batch_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            return len(batch)
+
+    def _due(self):
+        if len(self.pending) >= self.batch_size:
+            return 0.0
+        if self._oldest is None:
+            return None
+        return max(0.0, self._oldest + self.flush_interval - time.monotonic())
+
+    def start(self):
+        def loop():
+            while not self._stopped.is_set():
+                with self._condition:
+                    wait = self._due()
+                    if wait is None or wait > 0:
+                        self._condition.wait(wait)
+                        wait = self._due()
+                if wait == 0.0 and not self._stopped.is_set():
+                    errors = self.counters['errors']
+                    try:
+                        self.flush()
+                    except Exception as e:
+                        self.counters['errors'] += 1
+                        logger.error(f"Write-behind flush failed: {e}")
+                    if self.counters['errors'] > errors:
+                        # Requeued rows would make a full batch again at once; give the database a moment
+                        self._stopped.wait(self.flush_interval)
+
+        self._thread = threading.Thread(target=loop, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, retries=3):
+        """Stops taking rows and writes what is pending; rows still failing after `retries` attempts are dropped"""
+        with self._condition:
+            if self._stopped.is_set() and not self.pending:
+                return
+            self._stopped.set()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        for _ in range(retries):
+            self.flush()
+            if not self.pending:
+                return
+        with self._condition:
+            self.counters['dropped'] += len(self.pending)
+            logger.error(f"Write-behind dropped {len(self.pending)} rows at shutdown")
+            self.pending.clear()
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'pending': len(self.pending),
+            'batch_size': self.batch_size,
+            'flush_interval_seconds': self.flush_interval,
+            'max_pending': self.max_pending,
+            **self.counters
+        }
+
+def _row(obj):
+    """Column values of a new ORM object, with Python-side defaults applied as the flush would"""
+    from sqlalchemy import inspect
+    row = {}
+    for prop in inspect(type(obj)).column_attrs:
+        column = prop.columns[0]
+        value = getattr(obj, prop.key)
+        if value is None and column.primary_key:
+            continue
+        if value is None and column.default is not None:
+            default = column.default
+            if default.is_callable:
+                value = default.arg(None)
+            elif default.is_scalar:
+                value = default.arg
+            # Set it on the object too, so to_dict() works on the caller's side
+            setattr(obj, prop.key, value)
+        row[column.name] = value
+    return row
+
+_HELD = 'write_behind_rows'  # session.info key: (transaction, table, row) taken out of flushes
+
+def _inside(transaction, ancestor):
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+def install_write_behind(session_class=None, buffer=None, models=None):
+    """
+    Keeps new ActivityLog objects out of each flush and hands their rows to the buffer once
+    the session commits; a rollback (or a rolled back savepoint) discards them with the rest
+    of its transaction. The caller's object is expunged and keeps id None, so only models that
+    nobody reads back by id belong in `models`. Rows the buffer won't take are inserted right
+    after the commit.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from backend.models import ActivityLog
+    session_class = session_class or Session
+    models = tuple(models or (ActivityLog,))
+
+    @event.listens_for(session_class, 'before_flush')
+    def _before_flush(session, flush_context, instances):
+        target = buffer or write_behind
+        if target is None or not target.running:
+            return
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        for obj in list(session.new):
+            if isinstance(obj, models):
+                session.info.setdefault(_HELD, []).append((transaction, obj.__table__, _row(obj)))
+                session.expunge(obj)
+
+    @event.listens_for(session_class, 'after_commit')
+    def _after_commit(session):
+        held = session.info.pop(_HELD, None)
+        if not held:
+            return
+        target = buffer or write_behind
+        late = [(table, row) for _, table, row in held if target is None or not target.enqueue(table, row)]
+        if late:
+            engine = target.engine if target is not None else session.get_bind()
+            with engine.begin() as connection:
+                for table, row in late:
+                    connection.execute(table.insert(), row)
+
+    @event.listens_for(session_class, 'after_soft_rollback')
+    def _after_soft_rollback(session, previous_transaction):
+        held = session.info.get(_HELD)
+        if held:
+            held[:] = [entry for entry in held if not _inside(entry[0], previous_transaction)]
+
+    @event.listens_for(session_class, 'after_transaction_end')
+    def _after_transaction_end(session, transaction):
+        # Whatever is still held when the outer transaction ends without a commit (close()) never happened
+        if transaction.parent is None:
+            session.info.pop(_HELD, None)
+
+write_behind = None
+
+def create_write_behind(engine, start=True):
+    global write_behind
+    write_behind = WriteBehindBuffer(engine, Config.WRITE_BEHIND_BATCH_SIZE, Config.WRITE_BEHIND_FLUSH_SECONDS,
+                                     Config.WRITE_BEHIND_MAX_PENDING)
+    if start:
+        write_behind.start()
+    return write_behind
+
+def benchmark(requests=5000, threads=4, batch_size=500, flush_interval=1.0):
+    """
+    Simulated requests that each add one ActivityLog and one AIRecommendation and commit,
+    from `threads` threads, against a fresh tuned SQLite file: once with a commit per
+    request, once through the buffer (timed until the last batch is on disk).
+    Returns: rows per second and per-request latency for both modes
+    """
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import Session, sessionmaker
+    from backend.db_tuning import install_sqlite_pragmas
+    from backend.models import ActivityLog, AIRecommendation
+    install_sqlite_pragmas()
+
+    class BufferedSession(Session):
+        pass
+
+    def run(engine, session_class):
+        factory = sessionmaker(bind=engine, class_=session_class)
+        latencies = []
+        lock = threading.Lock()
+
+        def client(index):
+            session = factory()
+            mine = []
+            for i in range(index, requests, threads):
+                started = time.perf_counter()
+                session.add(ActivityLog(user_id=i % 500, feature='Crop Advisor', action='recommendation'))
+                session.add(AIRecommendation(farmer_id=i % 500, recommendation_type='crop', crop_suggested='Tomato',
+                                             confidence_score=0.8, reasoning='benchmark', action_taken='pending'))
+                session.commit()
+                mine.append(time.perf_counter() - started)
+            session.close()
+            with lock:
+                latencies.extend(mine)
+
+        workers = [threading.Thread(target=client, args=(index,)) for index in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return started, sorted(latencies)
+
+    results = {}
+    for mode in ('per_request', 'write_behind'):
+        path = os.path.join(tempfile.mkdtemp(prefix='write-behind-'), 'bench.db')
+        engine = create_engine(f"sqlite:///{path}", pool_size=threads + 2)
+        for model in (ActivityLog, AIRecommendation):
+            model.__table__.create(engine)
+
+        buffer = None
+        session_class = Session
+        if mode == 'write_behind':
+            buffer = WriteBehindBuffer(engine, batch_size, flush_interval, max_pending=requests * 2).start()
+            session_class = BufferedSession
+            install_write_behind(BufferedSession, buffer, models=(ActivityLog, AIRecommendation))
+        started, latencies = run(engine, session_class)
+        if buffer is not None:
+            buffer.stop()
+        seconds = time.perf_counter() - started
+
+        with engine.connect() as connection:
+            written = sum(connection.execute(select(func.count()).select_from(model.__table__)).scalar()
+                          for model in (ActivityLog, AIRecommendation))
+        engine.dispose()
+        results[mode] = {
+            'rows': written,
+            'seconds': round(seconds, 2),
+            'rows_per_second': round(written / seconds),
+            'request_p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+            'request_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+            **({'batches': buffer.counters['batches']} if buffer is not None else {})
+        }
+    results['speedup'] = round(results['write_behind']['rows_per_second'] / results['per_request']['rows_per_second'], 1)
+    return results
+
+if __name__ == '__main__':
+    # Usage: python -m backend.write_behind benchmark [--requests 5000] [--threads 4] [--batch-size 500]
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description='Measure write-behind inserts against a commit per request')
+    parser.add_argument('command', choices=['benchmark'])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--flush-seconds', type=float, default=1.0)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.requests, args.threads, args.batch_size, args.flush_seconds), indent=2))